@@ -0,0 +1,199 @@
+"""
+Offline batch renderer for animated light paths.
+
+Renders a scene headlessly while the first light follows a trajectory,
+one frame per step, and writes every frame to disk:
+
+    raycast-batch --grid 200x140 --path 10,10:190,10:190,130 --frames 240 --output frames/
+
+Frames are rendered on a process pool and written in order as they
+finish. At most a few frames per worker are in flight at once, so
+memory stays bounded however long the sequence is.
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+
+import FrameSequence
+import RenderCore
+import SceneFile
+
+FORMATS = ("ppm", "intensity", "shade-sequence", "intensity-sequence")
+# Formats written as one FrameSequence file instead of a file per frame
+SEQUENCE_DTYPES = {"shade-sequence": FrameSequence.SHADE, "intensity-sequence": FrameSequence.INTENSITY}
+SEQUENCE_FILE = "frames.rcfs"
+
+# One Renderer per worker process, reused for every frame it renders
+_renderer = None
+
+
+def parse_point(text):
+    """Parse "X,Y" into a tuple of floats"""
+    x, y = text.split(",")
+    return float(x), float(y)
+
+
+def trajectory(waypoints, frames, loop=False):
+    """
+    Light positions for each frame, moving at constant speed along a polyline.
+
+    Positions are rounded to grid cells. With loop the path returns to the
+    first waypoint and the last frame stops just short of it.
+    """
+    points = list(waypoints)
+    if not points:
+        raise ValueError("A trajectory needs at least one waypoint")
+    if loop and len(points) > 1:
+        points.append(points[0])
+
+    lengths = [math.dist(a, b) for a, b in zip(points, points[1:])]
+    total = sum(lengths)
+    positions = []
+    for frame in range(frames):
+        if total == 0:
+            x, y = points[0]
+        else:
+            # Fraction of the path covered by this frame
+            steps = frames if loop else max(frames - 1, 1)
+            travelled = total * frame / steps
+            segment = 0
+            while segment < len(lengths) - 1 and travelled > lengths[segment]:
+                travelled -= lengths[segment]
+                segment += 1
+            (x0, y0), (x1, y1) = points[segment], points[segment + 1]
+            t = travelled / lengths[segment] if lengths[segment] else 0
+            x, y = x0 + (x1 - x0) * t, y0 + (y1 - y0) * t
+        positions.append((int(round(x)), int(round(y))))
+    return positions
+
+
+def scene_for(settings, light_pos):
+    """Scene from keyword settings with the first light moved to light_pos"""
+    settings = dict(settings)
+    lights = settings.pop("lights", None)
+    if lights:
+        # Keep the first light's intensity, color and any radius
+        lights = [(light_pos,) + tuple(lights[0][1:])] + [tuple(light) for light in lights[1:]]
+    return RenderCore.Scene(light_pos=light_pos, lights=lights, **settings)
+
+
+def encode_frame(scene, frame, fmt):
+    """Bytes written for one frame"""
+    if fmt == "ppm":
+        header = f"P6\n{scene.grid_width} {scene.grid_height}\n255\n".encode("ascii")
+        return header + RenderCore.shade_rgb(scene, frame)
+    if fmt == "intensity":
+        from array import array
+        # Row-major float32 intensities, native byte order
+        return array('f', [value for row in frame.intensity for value in row]).tobytes()
+    if fmt == "shade-sequence":
+        return FrameSequence.shade_plane(scene, frame)
+    if fmt == "intensity-sequence":
+        return FrameSequence.intensity_plane(frame)
+    raise ValueError(f"Unknown format: {fmt!r}")
+
+
+def render_frame(settings, light_pos, fmt):
+    """Worker task: render one frame and return its encoded bytes"""
+    global _renderer
+    if _renderer is None:
+        _renderer = RenderCore.Renderer()
+    scene = scene_for(settings, light_pos)
+    return encode_frame(scene, _renderer.render(scene), fmt)
+
+
+def frame_path(output, index, fmt):
+    """File name of one frame"""
+    extension = "ppm" if fmt == "ppm" else "f32"
+    return os.path.join(output, f"frame_{index:05d}.{extension}")
+
+
+def render_sequence(settings, positions, output, fmt="ppm", workers=None, in_flight=None, progress=None):
+    """
+    Render one frame per light position into output, in order.
+
+    Returns the number of frames written and the elapsed seconds. At
+    most in_flight frames (default: two per worker) are rendered or
+    waiting to be written at any time.
+    """
+    os.makedirs(output, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    in_flight = in_flight or 2 * workers
+
+    sequence = None
+    if fmt in SEQUENCE_DTYPES:
+        scene = scene_for(settings, (0, 0))
+        sequence = FrameSequence.FrameWriter(os.path.join(output, SEQUENCE_FILE), scene.grid_width,
+                                             scene.grid_height, SEQUENCE_DTYPES[fmt])
+
+    def write(index, data):
+        if sequence is not None:
+            # Frames arrive in order, so appending keeps index k at frame k
+            sequence.write(data)
+        else:
+            with open(frame_path(output, index, fmt), "wb") as fh:
+                fh.write(data)
+        if progress:
+            progress(index)
+
+    start = time.perf_counter()
+    try:
+        _render_frames(settings, positions, fmt, workers, in_flight, write)
+    finally:
+        if sequence is not None:
+            sequence.close()
+    return len(positions), time.perf_counter() - start
+
+
+def _render_frames(settings, positions, fmt, workers, in_flight, write):
+    """Render every frame and pass it to write in order"""
+    if workers == 1:
+        for index, light_pos in enumerate(positions):
+            write(index, render_frame(settings, light_pos, fmt))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            pending = deque()
+            for index, light_pos in enumerate(positions):
+                pending.append(pool.apply_async(render_frame, (settings, light_pos, fmt)))
+                if len(pending) >= in_flight:
+                    write(index - len(pending) + 1, pending.popleft().get())
+            first = len(positions) - len(pending)
+            for offset, result in enumerate(pending):
+                write(first + offset, result.get())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a light path to a sequence of frames without a display")
+    parser.add_argument("--scene", help="JSON scene file (grid, lights, shapes and other Scene settings)")
+    parser.add_argument("--grid", help="grid size as WIDTHxHEIGHT cells, overriding the scene")
+    parser.add_argument("--path", required=True,
+                        help="light waypoints as X,Y:X,Y:...; the light moves along them at constant speed")
+    parser.add_argument("--loop", action="store_true", help="return to the first waypoint")
+    parser.add_argument("--frames", type=int, default=60, help="number of frames to render")
+    parser.add_argument("--format", choices=FORMATS, default="ppm",
+                        help="ppm images or raw float32 intensity buffers per frame, "
+                             "or one memory-mapped FrameSequence file of shade or float16 intensity planes")
+    parser.add_argument("--output", default="frames", help="directory for the frame files")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    settings = {}
+    if args.scene:
+        settings = SceneFile.load_settings(args.scene)
+    if args.grid:
+        settings["grid_width"], settings["grid_height"] = (int(v) for v in args.grid.lower().split("x"))
+    settings.pop("light_pos", None)
+    # Frames are independent and the light moves every frame
+    settings["incremental_shadows"] = False
+
+    positions = trajectory([parse_point(point) for point in args.path.split(":")], args.frames, args.loop)
+    count, elapsed = render_sequence(settings, positions, args.output, args.format, args.workers)
+    fps = count / elapsed if elapsed > 0 else float("inf")
+    print(f"Rendered {count} frames to {args.output} in {elapsed:.2f} s ({fps:.1f} frames/sec)")
+
+
+if __name__ == "__main__":
+    main()
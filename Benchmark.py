@@ -0,0 +1,302 @@
+"""
+Benchmarks for the ray casting engines.
+
+Run with: python Benchmark.py (or raycast-bench, or make bench)
+
+The suite times RayCastTest.cast, Main.createMatrix and the canvas
+renderer's lighting pass (RenderCore.Renderer.render, which is what
+RaycastRenderer.calculate_lighting runs) across grid sizes, light
+positions and the reflections setting. Each case reports the median and
+p95 wall time and the peak memory allocated, and --output writes the
+results as JSON so runs can be compared.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from OccupancyGrid import OccupancyGrid
+
+DEFAULT_SIZES = ((40, 100), (100, 250), (250, 250))
+FULL_SIZES = DEFAULT_SIZES + ((500, 500), (1000, 1000))
+CASTERS = ("cast", "createMatrix", "calculate_lighting")
+LIGHTS = ("corner", "center", "edge")
+
+
+def set_footprint(objects):
+    """Bytes held by a set of (x, y) tuples, including the tuples and ints"""
+    size = sys.getsizeof(objects)
+    for cell in objects:
+        size += sys.getsizeof(cell) + sum(sys.getsizeof(v) for v in cell if v > 256)
+    return size
+
+
+def scene_cells(rows, cols):
+    """Occupied cells of the default circle and square scene, scaled to the grid"""
+    cx, cy = cols * 2 // 5, rows * 3 // 8
+    radius = max(2, rows // 6)
+    sx, sy, size = cols * 7 // 10, rows // 4, max(2, rows // 8)
+    cells = set()
+    for y in range(rows):
+        for x in range(cols):
+            if math.sqrt(((x - cx) / 2.0) ** 2 + (y - cy) ** 2) <= radius:
+                cells.add((x, y))
+    for y in range(sy, min(rows, sy + size)):
+        for x in range(sx, min(cols, sx + size * 2)):
+            cells.add((x, y))
+    return cells
+
+
+def shadow_pass_set(objects, rows, cols, light_pos):
+    """
+    Reference shadow march over a set of (x, y) tuples.
+
+    Returns the shadowed cell count and the number of (x, y) tuples
+    built as set keys, one per cell test and ray sample.
+    """
+    lx, ly = light_pos
+    shadowed = 0
+    keys = 0
+    for y in range(rows):
+        for x in range(cols):
+            keys += 1
+            if (x, y) in objects:
+                continue
+            dx, dy = x - lx, y - ly
+            distance = math.sqrt(dx * dx + dy * dy)
+            if distance > 0:
+                dx, dy = dx / distance, dy / distance
+                for t in range(1, int(distance)):
+                    keys += 1
+                    if (int(lx + dx * t), int(ly + dy * t)) in objects:
+                        shadowed += 1
+                        break
+    return shadowed, keys
+
+
+def shadow_pass_grid(occupied, rows, cols, light_pos):
+    """The same march over a flat occupancy bitmap"""
+    lx, ly = light_pos
+    light_inside = 0 <= lx < cols and 0 <= ly < rows
+    shadowed = 0
+    for y in range(rows):
+        for x in range(cols):
+            if occupied[y * cols + x]:
+                continue
+            dx, dy = x - lx, y - ly
+            distance = math.sqrt(dx * dx + dy * dy)
+            if distance > 0:
+                dx, dy = dx / distance, dy / distance
+                for t in range(1, int(distance)):
+                    rx = int(lx + dx * t)
+                    ry = int(ly + dy * t)
+                    if (light_inside or (0 <= rx < cols and 0 <= ry < rows)) and occupied[ry * cols + rx]:
+                        shadowed += 1
+                        break
+    return shadowed, 0
+
+
+def best_time(fn, repeat=3):
+    """Fastest of several runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare_occupancy(rows=40, cols=100, light_pos=(1, 1)):
+    """Memory per cell, tuple keys and time per frame: set of tuples vs OccupancyGrid"""
+    objects = scene_cells(rows, cols)
+    grid = OccupancyGrid(cols, rows)
+    for x, y in objects:
+        grid.fill(x, y)
+
+    results = {}
+    for name, fn in (
+        ("set", lambda: shadow_pass_set(objects, rows, cols, light_pos)),
+        ("grid", lambda: shadow_pass_grid(grid.cells, rows, cols, light_pos)),
+    ):
+        shadowed, keys = fn()
+        results[name] = {"seconds": best_time(fn), "tuple_keys": keys, "shadowed": shadowed}
+
+    results["set"]["bytes_per_cell"] = set_footprint(objects) / (rows * cols)
+    results["grid"]["bytes_per_cell"] = grid.nbytes / (rows * cols)
+    return results
+
+
+def timings(fn, repeat=5):
+    """Wall time of each of several runs, in seconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def peak_allocation(fn):
+    """Peak bytes allocated while fn runs, measured in a separate traced run"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def light_position(name, rows, cols):
+    """Grid cell for a named light placement"""
+    if name == "corner":
+        return (1, 1)
+    if name == "center":
+        return (cols // 2, rows // 2)
+    if name == "edge":
+        return (cols - 1, rows // 3)
+    raise ValueError(f"Unknown light position: {name!r}")
+
+
+@contextlib.contextmanager
+def quiet():
+    """Discard anything printed to stdout"""
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        yield
+
+
+def caster_call(caster, rows, cols, light_pos, reflections, engine):
+    """Zero-argument callable running one caster on the default scene scaled to the grid"""
+    circle_center = (cols * 2 // 5, rows * 3 // 8)
+    circle_radius = max(2, rows // 6)
+    square_pos = (cols * 7 // 10, rows // 4)
+    square_size = max(2, rows // 8)
+
+    if caster == "cast":
+        # cast prints its occluder set (also once on import); keep it out of the report
+        with quiet():
+            from RayCastTest import cast
+
+        def run():
+            with quiet():
+                cast(rows, cols, square_pos=list(square_pos), square_size=square_size, light_pos=list(light_pos),
+                     engine="table" if engine == "table" else "python")
+        return run
+
+    if caster == "createMatrix":
+        from Main import createMatrix
+        return lambda: createMatrix(rows, cols, circle_center, circle_radius, square_pos, square_size, light_pos,
+                                    engine=engine)
+
+    if caster == "calculate_lighting":
+        import RenderCore
+        scene = RenderCore.Scene(grid_width=cols, grid_height=rows, circle_center=circle_center,
+                                 circle_radius=circle_radius, square_pos=square_pos, square_size=square_size,
+                                 light_pos=light_pos, enable_reflections=reflections, lighting_engine=engine)
+        # A fresh Renderer per run, so every frame is a full recompute
+        return lambda: RenderCore.Renderer().render(scene)
+
+    raise ValueError(f"Unknown caster: {caster!r}")
+
+
+def run_suite(sizes=DEFAULT_SIZES, casters=CASTERS, lights=LIGHTS, reflections=(False, True), engine="python",
+              repeat=5, progress=None):
+    """Time every caster over the sweep and return a list of result dicts"""
+    results = []
+    for rows, cols in sizes:
+        for light in lights:
+            light_pos = light_position(light, rows, cols)
+            for caster in casters:
+                # Only the canvas lighting pass has reflections
+                for reflect in (reflections if caster == "calculate_lighting" else (False,)):
+                    fn = caster_call(caster, rows, cols, light_pos, reflect, engine)
+                    samples = timings(fn, repeat)
+                    result = {
+                        "caster": caster,
+                        "rows": rows,
+                        "cols": cols,
+                        "light": light,
+                        "light_pos": list(light_pos),
+                        "reflections": reflect,
+                        "engine": engine,
+                        "repeat": repeat,
+                        "median_ms": statistics.median(samples) * 1000,
+                        "p95_ms": percentile(samples, 0.95) * 1000,
+                        "peak_bytes": peak_allocation(fn),
+                    }
+                    results.append(result)
+                    if progress:
+                        progress(result)
+    return results
+
+
+def format_result(result):
+    """One report line for a result dict"""
+    reflect = "refl" if result["reflections"] else ""
+    return (f"{result['caster']:<19} {result['rows']:>4}x{result['cols']:<4} {result['light']:<6} {reflect:<4} "
+            f"median {result['median_ms']:9.1f} ms  p95 {result['p95_ms']:9.1f} ms  "
+            f"peak {result['peak_bytes'] / 1024:9.1f} KiB")
+
+
+def parse_sizes(text):
+    """Parse "ROWSxCOLS,ROWSxCOLS" into a tuple of (rows, cols)"""
+    return tuple(tuple(int(v) for v in size.lower().split("x")) for size in text.split(","))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ray casters")
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES,
+                        help="grid sizes as ROWSxCOLS,ROWSxCOLS (default: 40x100,100x250,250x250)")
+    parser.add_argument("--full", action="store_true", help="sweep grid sizes up to 1000x1000")
+    parser.add_argument("--casters", default=",".join(CASTERS), help="comma-separated casters to time")
+    parser.add_argument("--lights", default=",".join(LIGHTS), help="comma-separated light positions")
+    parser.add_argument("--engine", default="python", choices=["python", "numpy", "table", "sdf", "analytic", "auto"],
+                        help="engine passed to createMatrix and the lighting pass")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--occupancy", action="store_true", help="compare occluder stores instead")
+    args = parser.parse_args(argv)
+
+    if args.occupancy:
+        for rows, cols in ((40, 100), (100, 250)):
+            results = compare_occupancy(rows, cols)
+            print(f"Occluder store, {rows}x{cols} grid")
+            for name, stats in results.items():
+                print(f"  {name:<5} {stats['bytes_per_cell']:8.2f} bytes/cell  "
+                      f"{stats['tuple_keys']:>9} tuple keys/frame  {stats['seconds'] * 1000:8.1f} ms/frame")
+        return
+
+    results = run_suite(
+        sizes=FULL_SIZES if args.full else args.sizes,
+        casters=args.casters.split(","),
+        lights=args.lights.split(","),
+        engine=args.engine,
+        repeat=args.repeat,
+        progress=lambda result: print(format_result(result), flush=True),
+    )
+
+    if args.output:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,27 @@
 import tkinter as tk
+import argparse
 import time
-import math
-import random
+
+import FrameTiming
+from FrameCache import FrameCache
+import RenderCore
+from ColorPalette import ColorPalette
+from RenderThread import RenderThread
+
+MAX_LIGHT_RADIUS = 8  # Largest disc light, in cells
 
 
 class RaycastRenderer:
-    def __init__(self, root, width=1000, height=800):
+    def __init__(self, root, width=1000, height=800, grid_width=100, grid_height=70, backend="rectangles",
+                 light_workers=1, threaded=True, progressive=False, timings_csv=None,
+                 frame_cache_mb=64):
+        if backend not in ("rectangles", "image"):
+            raise ValueError(f"Unknown backend: {backend!r}")
+
         self.root = root
         self.width = width
         self.height = height
+        self.backend = backend  # "rectangles" (one item per cell) or "image" (one PhotoImage)
 
         # Set the window background color
         self.root.configure(bg="black")
@@ -19,17 +32,27 @@ class RaycastRenderer:
         self.canvas.pack(padx=10, pady=10)
 
         # Grid dimensions (cells)
-        self.grid_width = 100
-        self.grid_height = 70
+        self.grid_width = grid_width
+        self.grid_height = grid_height
 
         # Calculate cell size
         self.cell_width = width / self.grid_width
         self.cell_height = height / self.grid_height
+        if backend == "image":
+            # The frame image is zoomed by whole pixels, so cells are integer sized
+            self.cell_width = max(1, int(self.cell_width))
+            self.cell_height = max(1, int(self.cell_height))
+
+        # Framebuffer images for the image backend
+        self.frame_image = None
+        self.display_image = None
+        self.last_frame_data = None
 
         # Setup objects
         self.circle_center = [40, 15]  # Initial position for circle
         self.square_pos = [70, 10]  # Initial position for square
         self.light_pos = [20, 15]  # Light source position
+        self.extra_lights = []  # Fixed lights dropped with L, as (pos, intensity, color)
 
         # Current mouse position for light tracking
         self.mouse_x = 0
@@ -38,17 +61,58 @@ class RaycastRenderer:
         # Settings
         self.enable_reflections = True
         self.light_intensity = 100
+        self.light_radius = 0  # Disc light radius in cells; above 0 shadows get soft penumbrae
         self.diffusion_amount = 0.1
         self.follow_mouse = False  # Toggle for light following mouse
+        self.lighting_engine = "auto"  # "numpy", "python", "table", "sdf", "analytic" or "auto"
+        self.continuous_diffusion = False  # Re-render every tick while diffuse reflections are on
+        self.reflection_seed = 0  # Diffusion jitter seed; only advances per frame while animating diffusion
+        self.incremental_shadows = True  # Only recompute the shadow wedge of moved occluders
+
+        # Progressive mode answers each change with a coarse preview, then refines one level per tick
+        self.progressive = progressive
+        self.preview_levels = RenderCore.PREVIEW_LEVELS  # Downsample factors shown first, coarsest first
+        self.refine_levels = []  # Downsample factors still to render for the current revision, ending with 1
+
+        # Per-stage frame timings, only collected while the overlay is shown or a CSV file is written
+        self.timer = FrameTiming.FrameTimer()
+        if timings_csv:
+            self.timer.open_csv(timings_csv)
+            self.timer.enabled = True
+        self.show_timings = False
+        self.timing_overlay = None  # Canvas text item of the overlay
+
+        # Headless lighting core; keeps rasterized occluders and the last direct pass between frames,
+        # computes per-light fields on light_workers processes (None = every CPU), and hands back
+        # frames of recurring scenes from a cache of frame_cache_mb megabytes (0 = no cache)
+        frame_cache = FrameCache(frame_cache_mb * 1024 * 1024) if frame_cache_mb else None
+        self.core = RenderCore.Renderer(workers=light_workers, frame_cache=frame_cache)
+
+        # Frames are lit on a worker thread from scene snapshots so input stays responsive;
+        # the Tk thread only paints finished frames. None lights frames on the Tk thread.
+        self.render_thread = RenderThread(self.core.render, name="canvas-render").start() if threaded else None
+
+        # Scene revision: bumped by every input that changes the scene, so
+        # update_display only recomputes when something actually changed
+        self.scene_revision = 0
+        self.rendered_revision = None
 
         # Object colors
         self.circle_color = "#00B000"  # Green circle
         self.square_color = "#B00000"  # Red square
         self.light_color = "#FFF0C8"  # Warm white light
 
+        # Lighting works on packed 0xRRGGBB ints; Tk strings come from this palette at paint time
+        self.color_palette = ColorPalette()
+
         # Cell references (for updating)
         self.cells = {}
 
+        # Last fill sent to Tk per cell, so unchanged cells are not repainted
+        self.painted_colors = {}
+        self.cells_repainted = 0  # Cells repainted in the last frame
+        self.total_repainted = 0
+
         # Status bar
         self.status_frame = tk.Frame(root, bg="black")
         self.status_frame.pack(fill=tk.X, side=tk.BOTTOM, padx=10, pady=5)
@@ -138,9 +202,19 @@ class RaycastRenderer:
         self.root.bind("<equal>", lambda e: self.adjust_light_intensity(10))
         self.root.bind("<r>", lambda e: self.toggle_reflections())
         self.root.bind("<f>", lambda e: self.toggle_follow_mouse())
+        self.root.bind("<l>", lambda e: self.add_light())
+        self.root.bind("<c>", lambda e: self.clear_lights())
+        self.root.bind("<bracketleft>", lambda e: self.adjust_light_radius(-1))
+        self.root.bind("<bracketright>", lambda e: self.adjust_light_radius(1))
+        self.root.bind("<p>", lambda e: self.toggle_progressive())
+        self.root.bind("<t>", lambda e: self.toggle_timings())
 
     def create_grid(self):
         """Create the initial grid of rectangles for the cells"""
+        if self.backend == "image":
+            self.create_framebuffer()
+            return
+
         for y in range(self.grid_height):
             for x in range(self.grid_width):
                 x1 = x * self.cell_width
@@ -157,6 +231,16 @@ class RaycastRenderer:
                 )
 
                 self.cells[(x, y)] = rect_id
+                self.painted_colors[(x, y)] = "black"
+
+    def create_framebuffer(self):
+        """Create one grid-sized PhotoImage and a zoomed copy shown on the canvas"""
+        self.frame_image = tk.PhotoImage(width=self.grid_width, height=self.grid_height)
+        self.display_image = tk.PhotoImage(
+            width=self.grid_width * self.cell_width,
+            height=self.grid_height * self.cell_height
+        )
+        self.canvas.create_image(0, 0, image=self.display_image, anchor=tk.NW)
 
     def hex_to_rgb(self, hex_color):
         """Convert hex color string to RGB tuple"""
@@ -203,8 +287,9 @@ class RaycastRenderer:
         self.mouse_pos_label.config(text=f"Mouse: ({x}, {y})")
 
         # Update light position if following mouse
-        if self.follow_mouse:
+        if self.follow_mouse and (self.light_pos[0], self.light_pos[1]) != (x, y):
             self.light_pos[0], self.light_pos[1] = x, y
+            self.invalidate()
 
         return x, y
 
@@ -225,6 +310,7 @@ class RaycastRenderer:
             self.light_pos = [x, y]
             self.current_object = "circle"
             self.selection_label.config(text="Click to move: Circle")
+        self.invalidate()
 
     def move_light_key(self, direction):
         """Handle WASD key presses to move light - simplified to prevent freezing"""
@@ -236,8 +322,7 @@ class RaycastRenderer:
             self.light_pos[0] -= 1
         elif direction == "right" and self.light_pos[0] < self.grid_width - 1:
             self.light_pos[0] += 1
-
-
+        self.invalidate()
 
         # Update light position label
         self.mouse_pos_label.config(text=f"Light: ({self.light_pos[0]}, {self.light_pos[1]})")
@@ -245,283 +330,292 @@ class RaycastRenderer:
     def adjust_light_intensity(self, amount):
         """Adjust light intensity by amount"""
         self.light_intensity = min(200, max(10, self.light_intensity + amount))
-        self.light_label.config(text=f"Light: {self.light_intensity}")
+        self.invalidate()
+        self.update_light_label()
+
+    def adjust_light_radius(self, amount):
+        """Grow or shrink the movable light's disc; 0 is a point light"""
+        self.light_radius = min(MAX_LIGHT_RADIUS, max(0, self.light_radius + amount))
+        self.invalidate()
+        self.update_light_label()
 
     def toggle_reflections(self):
         """Toggle reflections on/off"""
         self.enable_reflections = not self.enable_reflections
+        self.invalidate()
         self.reflection_label.config(text=f"Reflections: {'ON' if self.enable_reflections else 'OFF'}")
 
+    def toggle_progressive(self):
+        """Toggle coarse previews while the scene changes"""
+        self.progressive = not self.progressive
+        if not self.progressive:
+            self.refine_levels = []
+        self.invalidate()
+
+    def toggle_timings(self):
+        """Show or hide the per-stage timing overlay"""
+        self.show_timings = not self.show_timings
+        self.timer.enabled = self.show_timings or self.timer.writing_csv
+        if self.show_timings:
+            self.timing_overlay = self.canvas.create_text(8, 8, anchor="nw", fill="white", font=("Courier", 10),
+                                                          text=self.timer.summary())
+        elif self.timing_overlay is not None:
+            self.canvas.delete(self.timing_overlay)
+            self.timing_overlay = None
+
     def toggle_follow_mouse(self):
         """Toggle whether light follows the mouse cursor"""
         self.follow_mouse = not self.follow_mouse
         self.follow_label.config(text=f"Follow Mouse: {'ON' if self.follow_mouse else 'OFF'}")
 
-    def calculate_lighting(self):
-        """Calculate lighting and shadows for the scene"""
-        # Create intensity and color matrices
-        intensity_matrix = [[0 for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        color_matrix = [["#000000" for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-
-        # Track objects and reflective surfaces
-        objects = set()
-        reflective_objects = set()
-        object_colors = {}
-
-        # Add circle with proper aspect ratio
-        cx, cy = self.circle_center
-        radius = 6
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                # Skip if far from circle center for performance
-                if abs(x - cx) > radius * 2 or abs(y - cy) > radius * 2:
-                    continue
-
-                # Calculate distance with aspect ratio correction
-                # We use cell_width/cell_height ratio to correct the aspect ratio
-                aspect_ratio = self.cell_width / self.cell_height
-                dx = x - cx
-                dy = (y - cy) / aspect_ratio
-                distance = math.sqrt(dx * dx + dy * dy)
-
-                if distance <= radius:
-                    objects.add((x, y))
-                    object_colors[(x, y)] = self.circle_color
-
-                    # Mark circle edge as reflective
-                    if radius - 0.5 <= distance <= radius:
-                        # Calculate normal vector (pointing outward from center)
-                        nx = dx / distance if distance > 0 else 0
-                        ny = dy / distance if distance > 0 else 0
-                        reflective_objects.add((x, y, nx, ny))
-
-        # Add square with corrected aspect ratio
-        sx, sy = self.square_pos
-        size_x = 5  # Horizontal size
-        size_y = int(5 * self.cell_height / self.cell_width)  # Adjusted vertical size
-
-        for y in range(max(0, sy), min(self.grid_height, sy + size_y)):
-            for x in range(max(0, sx), min(self.grid_width, sx + size_x)):
-                objects.add((x, y))
-                object_colors[(x, y)] = self.square_color
-
-                # Mark square edges as reflective
-                if self.enable_reflections:
-                    # Left edge
-                    if x == sx:
-                        reflective_objects.add((x, y, -1, 0))
-                    # Right edge
-                    elif x == sx + size_x - 1:
-                        reflective_objects.add((x, y, 1, 0))
-                    # Top edge
-                    elif y == sy:
-                        reflective_objects.add((x, y, 0, -1))
-                    # Bottom edge
-                    elif y == sy + size_y - 1:
-                        reflective_objects.add((x, y, 0, 1))
-
-        # Light position
-        lx, ly = self.light_pos
-
-        # Direct lighting
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                # Skip objects
-                if (x, y) in objects:
-                    continue
-
-                # Mark light source
-                if x == lx and y == ly:
-                    intensity_matrix[y][x] = self.light_intensity * 2
-                    color_matrix[y][x] = self.light_color
-                    continue
-
-                # Calculate direction to point
-                dx = x - lx
-                dy = y - ly
-                distance = math.sqrt(dx * dx + dy * dy)
-
-                # Check for shadows
-                in_shadow = False
-                if distance > 0:
-                    dx /= distance
-                    dy /= distance
-
-                    # Cast ray from light to current position
-                    for t in range(1, int(distance)):
-                        rx = int(lx + dx * t)
-                        ry = int(ly + dy * t)
-
-                        if 0 <= rx < self.grid_width and 0 <= ry < self.grid_height:
-                            if (rx, ry) in objects:
-                                in_shadow = True
-                                break
-
-                # Calculate light intensity with falloff
-                if not in_shadow:
-                    if distance < 1:
-                        distance = 1
-
-                    # Inverse square law
-                    falloff_intensity = min(self.light_intensity / (distance * 0.5), self.light_intensity)
-                    intensity_matrix[y][x] += falloff_intensity
-                    color_matrix[y][x] = self.light_color
-
-        # Calculate reflections
-        if self.enable_reflections:
-            for ref_x, ref_y, normal_x, normal_y in reflective_objects:
-                # Check if surface receives direct light
-                receives_direct_light = False
-
-                # Vector from light to reflective surface
-                ldx = ref_x - lx
-                ldy = ref_y - ly
-                light_distance = math.sqrt(ldx * ldx + ldy * ldy)
-
-                if light_distance > 0:
-                    # Normalize
-                    ldx /= light_distance
-                    ldy /= light_distance
-
-                    # Cast ray from light to reflective surface
-                    blocked = False
-                    for t in range(1, int(light_distance)):
-                        rx = int(lx + ldx * t)
-                        ry = int(ly + ldy * t)
-
-                        if 0 <= rx < self.grid_width and 0 <= ry < self.grid_height:
-                            if (rx, ry) in objects and (rx != ref_x or ry != ref_y):
-                                blocked = True
-                                break
-
-                    if not blocked:
-                        receives_direct_light = True
-
-                # Calculate reflected light
-                if receives_direct_light:
-                    # Get color of reflective object
-                    if (ref_x, ref_y) in object_colors:
-                        reflection_color = object_colors[(ref_x, ref_y)]
-                    else:
-                        reflection_color = "#FFFFFF"
-
-                    # Calculate reflection vector (from surface to light)
-                    incoming_x = lx - ref_x
-                    incoming_y = ly - ref_y
-
-                    # Normalize incoming vector
-                    incoming_len = math.sqrt(incoming_x ** 2 + incoming_y ** 2)
-                    if incoming_len > 0:
-                        incoming_x /= incoming_len
-                        incoming_y /= incoming_len
-
-                    # Calculate reflection
-                    dot_product = normal_x * incoming_x + normal_y * incoming_y
-                    reflected_x = 2 * dot_product * normal_x - incoming_x
-                    reflected_y = 2 * dot_product * normal_y - incoming_y
-
-                    # Add diffusion
-                    reflected_x += (random.random() - 0.5) * self.diffusion_amount
-                    reflected_y += (random.random() - 0.5) * self.diffusion_amount
-
-                    # Normalize
-                    ref_len = math.sqrt(reflected_x ** 2 + reflected_y ** 2)
-                    if ref_len > 0:
-                        reflected_x /= ref_len
-                        reflected_y /= ref_len
-
-                    # Cast reflected ray
-                    max_reflection_distance = 40
-                    reflection_intensity = self.light_intensity * 0.4
-                    reflection_intensity /= (light_distance * 0.1)
-
-                    # Mix colors for reflection
-                    mixed_color = self.mix_colors(self.light_color, reflection_color, 0.7)
-
-                    for t in range(1, max_reflection_distance):
-                        rx = int(ref_x + reflected_x * t)
-                        ry = int(ref_y + reflected_y * t)
-
-                        if 0 <= rx < self.grid_width and 0 <= ry < self.grid_height:
-                            if (rx, ry) in objects:
-                                break
-
-                            # Attenuate with distance
-                            reflection_falloff = reflection_intensity / (t * 0.5)
-
-                            # Add to intensity matrix
-                            intensity_matrix[ry][rx] += reflection_falloff
-
-                            # Blend colors
-                            if intensity_matrix[ry][rx] > 0:
-                                existing = intensity_matrix[ry][rx] - reflection_falloff
-                                if existing <= 0:
-                                    color_matrix[ry][rx] = mixed_color
-                                else:
-                                    blend_factor = reflection_falloff / intensity_matrix[ry][rx]
-                                    color_matrix[ry][rx] = self.blend_colors(color_matrix[ry][rx], mixed_color,
-                                                                             blend_factor)
-
-        return objects, object_colors, intensity_matrix, color_matrix
-
-    def update_display(self):
-        """Update the canvas rendering based on current state"""
-        # Update light position if following mouse
+        # Snap the light to the cursor straight away
         if self.follow_mouse:
             self.light_pos[0], self.light_pos[1] = self.mouse_x, self.mouse_y
+            self.invalidate()
+
+    def add_light(self):
+        """Drop a fixed light at the mouse position"""
+        self.extra_lights.append(((self.mouse_x, self.mouse_y), self.light_intensity, self.light_color,
+                                  self.light_radius))
+        self.invalidate()
+        self.update_light_label()
+
+    def clear_lights(self):
+        """Remove every fixed light, keeping the movable one"""
+        if self.extra_lights:
+            self.extra_lights = []
+            self.invalidate()
+        self.update_light_label()
+
+    def update_light_label(self):
+        """Show the light intensity, the light count once there are several, and soft-shadow sampling"""
+        text = f"Light: {self.light_intensity}"
+        if self.extra_lights:
+            text += f" x{1 + len(self.extra_lights)}"
+        if self.light_radius:
+            text += f" r{self.light_radius}"
+        stats = self.core.soft_shadow_stats
+        if stats.cells:
+            text += f" ({stats.samples_per_cell:.1f} rays/cell)"
+        self.light_label.config(text=text)
+
+    def invalidate(self):
+        """Mark the scene as changed so the next tick recomputes it"""
+        self.scene_revision += 1
+
+    def needs_render(self):
+        """Whether the next tick has to recompute the frame"""
+        if self.rendered_revision != self.scene_revision:
+            return True
+        # Diffuse reflections jitter each frame, but only if asked to animate
+        return self.continuous_diffusion and self.enable_reflections and self.diffusion_amount != 0
+
+    def next_scene(self):
+        """
+        Snapshot to light next and mark it as rendered.
+
+        After a change this is a coarse preview in progressive mode, and
+        each later call refines it until the full-resolution frame.
+        """
+        if self.rendered_revision != self.scene_revision:
+            self.rendered_revision = self.scene_revision
+            if self.progressive:
+                # Start over from the coarsest preview on every change
+                self.refine_levels = list(self.preview_levels[1:]) + [1]
+                return self.snapshot_scene(self.preview_levels[0])
+            self.refine_levels = []
+        elif self.refine_levels:
+            return self.snapshot_scene(self.refine_levels.pop(0))
+        return self.snapshot_scene()
+
+    def snapshot_scene(self, downsample=1):
+        """Copy of the current scene state for the headless core; downsample > 1 makes a preview"""
+        if self.continuous_diffusion:
+            self.reflection_seed += 1
+        return RenderCore.Scene(
+            grid_width=self.grid_width,
+            grid_height=self.grid_height,
+            cell_width=self.cell_width,
+            cell_height=self.cell_height,
+            circle_center=self.circle_center,
+            circle_color=self.circle_color,
+            square_pos=self.square_pos,
+            square_color=self.square_color,
+            lights=[(self.light_pos, self.light_intensity, self.light_color, self.light_radius)] + self.extra_lights,
+            enable_reflections=self.enable_reflections,
+            diffusion_amount=self.diffusion_amount,
+            reflection_seed=self.reflection_seed,
+            lighting_engine=self.lighting_engine,
+            incremental_shadows=self.incremental_shadows,
+            downsample=downsample,
+            timing=self.timer.frame(),
+        )
 
-        objects, object_colors, intensity_matrix, color_matrix = self.calculate_lighting()
+    def calculate_lighting(self):
+        """Calculate lighting and shadows for the scene"""
+        return self.core.render(self.snapshot_scene())
+
+    def frame_colors(self, occupancy, intensity_matrix, color_matrix, scene=None):
+        """Resolve the Tk fill color of every cell, as a list of rows"""
+        # Paint the light as it was in the frame's scene, not as it is now
+        light = self if scene is None else scene
 
         # Light source location
-        lx, ly = self.light_pos
+        lx, ly = light.light_pos
+        width = self.grid_width
+        occupied = occupancy.cells
+
+        # Brightness is quantized and looked up in the palette, so no
+        # color strings are formatted per cell
+        lookup = self.color_palette.lookup
+        scale = (self.color_palette.levels - 1) / light.light_intensity
+        top = self.color_palette.levels - 1
+        rows = []
 
-        # Update all cells
         for y in range(self.grid_height):
-            for x in range(self.grid_width):
+            row = []
+            intensity_row = intensity_matrix[y]
+            color_row = color_matrix[y]
+            for x in range(width):
+                if occupied[y * width + x]:
+                    # Handle objects
+                    color = occupancy.color_at(x, y, "#FFFFFF")
+                elif x == lx and y == ly:
+                    # Handle light source
+                    color = light.light_color
+                else:
+                    # Scale color by intensity
+                    intensity = intensity_row[x]
+                    if intensity <= 0.1:
+                        color = "#000000"  # Complete shadow
+                    else:
+                        level = int(intensity * scale + 0.5)
+                        color = lookup(color_row[x], level if level < top else top)
+                row.append(color)
+            rows.append(row)
+        return rows
+
+    def paint_frame(self, occupancy, intensity_matrix, color_matrix, scene=None):
+        """Paint a lit frame with the selected backend and return the cells repainted"""
+        timing = None if scene is None else scene.timing
+        if timing is not None:
+            # Leave out the time the frame waited to be painted
+            timing.restart()
+        colors = self.frame_colors(occupancy, intensity_matrix, color_matrix, scene)
+        if timing is not None:
+            timing.lap("colors")
+        if self.backend == "image":
+            repainted = self.paint_image(colors)
+        else:
+            repainted = self.paint_rectangles(colors)
+
+        self.cells_repainted = repainted
+        self.total_repainted += repainted
+        if timing is not None:
+            timing.lap("paint")
+            self.timer.record(timing)
+            if self.timing_overlay is not None:
+                self.canvas.itemconfig(self.timing_overlay, text=self.timer.summary())
+        return repainted
+
+    def paint_rectangles(self, colors):
+        """Call itemconfig only for cells whose fill changed"""
+        painted = self.painted_colors
+        repainted = 0
+
+        for y, row in enumerate(colors):
+            for x, color in enumerate(row):
                 cell_id = self.cells.get((x, y))
                 if not cell_id:
                     continue  # Skip if cell doesn't exist
 
-                # Handle objects
-                if (x, y) in objects:
-                    color = object_colors.get((x, y), "#FFFFFF")
+                # Skip the Tk round-trip when the fill is unchanged
+                if painted.get((x, y)) != color:
                     self.canvas.itemconfig(cell_id, fill=color)
-                    continue
-
-                # Handle light source
-                if x == lx and y == ly:
-                    self.canvas.itemconfig(cell_id, fill=self.light_color)
-                    continue
-
-                # Handle regular lighting
-                intensity = intensity_matrix[y][x]
-                base_color = color_matrix[y][x]
-
-                # Scale color by intensity
-                if intensity <= 0.1:
-                    color = "#000000"  # Complete shadow
-                else:
-                    brightness = min(intensity / self.light_intensity, 1.0)
-                    color = self.adjust_color_brightness(base_color, brightness)
-
-                self.canvas.itemconfig(cell_id, fill=color)
+                    painted[(x, y)] = color
+                    repainted += 1
+        return repainted
+
+    def paint_image(self, colors):
+        """Write the whole frame with one put and zoom it onto the canvas"""
+        data = " ".join("{" + " ".join(row) + "}" for row in colors)
+        if data == self.last_frame_data:
+            return 0
+
+        self.frame_image.put(data, to=(0, 0))
+        # Tk's photo copy can zoom into an existing image, avoiding a new image per frame
+        self.display_image.tk.call(
+            self.display_image.name, "copy", self.frame_image.name,
+            "-zoom", self.cell_width, self.cell_height
+        )
+        self.last_frame_data = data
+        return self.grid_width * self.grid_height
 
-        # Update FPS counter
-        self.frame_count += 1
+    def update_display(self):
+        """Update the canvas rendering based on current state"""
+        # Only recompute when the scene changed since the last frame, or a preview is still being refined
+        if self.render_thread is not None:
+            # Hand the worker a snapshot, then paint the newest frame it finished; refinement
+            # passes wait for the worker to be free, so a change never queues behind them
+            if self.needs_render() or (self.refine_levels and self.render_thread.idle):
+                self.render_thread.submit(self.scene_revision, self.next_scene())
+            finished = self.render_thread.take()
+            if finished is not None:
+                _, scene, frame = finished
+                self.paint_frame(*frame, scene=scene)
+                self.frame_count += 1
+                self.update_light_label()
+        elif self.needs_render() or self.refine_levels:
+            scene = self.next_scene()
+            self.paint_frame(*self.core.render(scene), scene=scene)
+            self.frame_count += 1
+            self.update_light_label()
+
+        # Update FPS counter (frames actually rendered)
         current_time = time.time()
         if current_time - self.last_time >= 1.0:
             fps = self.frame_count / (current_time - self.last_time)
-            self.fps_label.config(text=f"FPS: {fps:.1f}")
+            text = f"FPS: {fps:.1f}  Repainted: {self.cells_repainted}"
+            if self.core.frame_cache is not None:
+                stats = self.core.frame_cache.stats
+                text += f"  Cache: {stats['hits']}/{stats['hits'] + stats['misses']} hits"
+            self.fps_label.config(text=text)
             self.frame_count = 0
             self.last_time = current_time
 
         # Schedule next update
         self.root.after(16, self.update_display)
 
+    def close(self):
+        """Stop the render thread and any light workers"""
+        if self.render_thread is not None:
+            self.render_thread.stop()
+        self.core.close()
+        self.timer.close()
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Canvas raycast renderer")
+    parser.add_argument("--backend", choices=["rectangles", "image"], default="rectangles",
+                        help="one canvas rectangle per cell, or a single PhotoImage framebuffer")
+    parser.add_argument("--grid", default="100x70", help="grid size as WIDTHxHEIGHT cells")
+    parser.add_argument("--no-thread", action="store_true",
+                        help="light frames on the Tk thread instead of a background render thread")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes computing per-light fields with several lights (default: one per CPU)")
+    parser.add_argument("--progressive", action="store_true",
+                        help="show a coarse preview after each change, then refine it to full resolution")
+    parser.add_argument("--frame-cache", type=int, default=64, metavar="MB",
+                        help="memory for frames of recurring scenes, evicting the least recently used (0 = off)")
+    parser.add_argument("--timings-csv", metavar="PATH",
+                        help="write the per-stage timings of every painted frame to a CSV file, in milliseconds")
+    args = parser.parse_args()
+    grid_width, grid_height = (int(v) for v in args.grid.lower().split("x"))
+
     root = tk.Tk()
-    app = RaycastRenderer(root)
+    app = RaycastRenderer(root, grid_width=grid_width, grid_height=grid_height, backend=args.backend,
+                          light_workers=args.workers, threaded=not args.no_thread, progressive=args.progressive,
+                          timings_csv=args.timings_csv, frame_cache_mb=args.frame_cache)
 
     # Display help
     help_text = """
@@ -531,10 +625,17 @@ def main():
     - F to toggle light following mouse cursor
     - +/- to adjust light intensity
     - R to toggle reflections
+    - L to drop a fixed light at the mouse, C to clear them
+    - [ / ] to shrink or grow the light into a disc with soft shadows
+    - P to toggle progressive previews while the scene changes
+    - T to toggle the per-stage frame timing overlay
     """
     print(help_text)
 
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        app.close()
 
 
 if __name__ == "__main__":
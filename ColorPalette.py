@@ -0,0 +1,73 @@
+"""
+Integer RGB colors and a palette of Tk color strings.
+
+The lighting pipeline keeps colors as packed 0xRRGGBB ints so mixing
+and blending is plain arithmetic. Hex strings for Tk are only produced
+at paint time, through a palette keyed by (base color, quantized
+brightness) with a size limit and LRU eviction.
+"""
+from functools import lru_cache
+
+BRIGHTNESS_LEVELS = 256
+DEFAULT_PALETTE_SIZE = 4096
+
+
+def hex_to_int(hex_color):
+    """Convert a hex color string to a packed 0xRRGGBB int"""
+    return int(hex_color.lstrip('#'), 16)
+
+
+def int_to_hex(rgb):
+    """Convert a packed 0xRRGGBB int to a hex color string"""
+    return f"#{rgb:06x}"
+
+
+def mix_rgb(rgb1, rgb2, weight2=0.5):
+    """Mix two packed colors with the given weight for the second color"""
+    weight1 = 1 - weight2
+    r = int((rgb1 >> 16) * weight1 + (rgb2 >> 16) * weight2)
+    g = int((rgb1 >> 8 & 0xFF) * weight1 + (rgb2 >> 8 & 0xFF) * weight2)
+    b = int((rgb1 & 0xFF) * weight1 + (rgb2 & 0xFF) * weight2)
+    return r << 16 | g << 8 | b
+
+
+def scale_rgb(rgb, factor):
+    """Scale a packed color by factor (0.0 to 1.0), with the renderer's 10% boost"""
+    factor = factor * 1.1
+    r = int(min((rgb >> 16) * factor, 255))
+    g = int(min((rgb >> 8 & 0xFF) * factor, 255))
+    b = int(min((rgb & 0xFF) * factor, 255))
+    return r << 16 | g << 8 | b
+
+
+class ColorPalette:
+    def __init__(self, max_size=DEFAULT_PALETTE_SIZE, levels=BRIGHTNESS_LEVELS):
+        self.max_size = max_size
+        self.levels = levels
+        step = 1 / (levels - 1)
+
+        # Call lookup(rgb, level) directly in hot loops; level is the
+        # brightness quantized to 0 .. levels - 1
+        @lru_cache(maxsize=max_size)
+        def lookup(rgb, level):
+            return int_to_hex(scale_rgb(rgb, level * step))
+
+        self.lookup = lookup
+
+    def level(self, brightness):
+        """Quantize a brightness in 0.0 .. 1.0 to a palette level"""
+        return int(brightness * (self.levels - 1) + 0.5)
+
+    def color(self, rgb, brightness):
+        """Tk color string for a packed color at the given brightness"""
+        return self.lookup(rgb, self.level(brightness))
+
+    @property
+    def stats(self):
+        """Hits, misses and current size of the palette"""
+        info = self.lookup.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
+    def clear(self):
+        """Drop every cached color"""
+        self.lookup.cache_clear()
@@ -0,0 +1,148 @@
+"""
+Distance-to-nearest-occluder fields for sphere-traced shadow rays.
+
+The per-cell march samples a shadow ray at every t = 1 .. int(distance) - 1,
+even through large empty regions. Here a chessboard (Chebyshev)
+distance field is built once per occupancy with a two-pass distance
+transform: field[y * cols + x] is max(|dx|, |dy|) to the nearest
+occupied cell, 0 on occupied cells.
+
+Because the ray direction is a unit vector, the sample k steps further
+along lands at most k + 1 cells away on either axis (after truncation).
+A sample whose cell has field value d therefore guarantees the next
+d - 2 samples are free, and the trace jumps over them. It visits a
+subset of the march's samples and stops at the same first hit, so the
+results match the "python" engine cell for cell.
+"""
+import math
+from array import array
+
+import ShadowKernels
+
+MAX_CACHED_FIELDS = 4
+
+_fields = {}
+
+
+def distance_field(occupied, cols, rows):
+    """Chebyshev distance of every cell to the nearest occupied cell, as a flat array('i')"""
+    # Farther than any cell on the grid when nothing is occupied
+    far = cols + rows
+    if ShadowKernels.HAS_NUMPY:
+        return _distance_field_numpy(occupied, cols, rows, far)
+
+    field = array('i', [0 if cell else far for cell in occupied[:cols * rows]])
+    # Forward pass: neighbors above and to the left
+    for y in range(rows):
+        base = y * cols
+        for x in range(cols):
+            index = base + x
+            d = field[index]
+            if d == 0:
+                continue
+            if x > 0 and field[index - 1] + 1 < d:
+                d = field[index - 1] + 1
+            if y > 0:
+                for up in range(max(x - 1, 0), min(x + 2, cols)):
+                    if field[up + base - cols] + 1 < d:
+                        d = field[up + base - cols] + 1
+            field[index] = d
+    # Backward pass: neighbors below and to the right
+    for y in range(rows - 1, -1, -1):
+        base = y * cols
+        for x in range(cols - 1, -1, -1):
+            index = base + x
+            d = field[index]
+            if d == 0:
+                continue
+            if x < cols - 1 and field[index + 1] + 1 < d:
+                d = field[index + 1] + 1
+            if y < rows - 1:
+                for down in range(max(x - 1, 0), min(x + 2, cols)):
+                    if field[down + base + cols] + 1 < d:
+                        d = field[down + base + cols] + 1
+            field[index] = d
+    return field
+
+
+def _distance_field_numpy(occupied, cols, rows, far):
+    """distance_field with each row's scan done as a vectorized running minimum"""
+    np = ShadowKernels.np
+    cells = np.frombuffer(bytes(occupied[:cols * rows]), dtype=np.uint8).reshape(rows, cols)
+    field = np.where(cells != 0, 0, far).astype(np.int64)
+    offsets = np.arange(cols)
+
+    def relax(row, neighbor):
+        # Neighbor row's diagonal and straight cells, then a running minimum along the row:
+        # row[x] = min over k <= x of row[k] + (x - k)
+        if neighbor is not None:
+            row = np.minimum(row, neighbor + 1)
+            row[1:] = np.minimum(row[1:], neighbor[:-1] + 1)
+            row[:-1] = np.minimum(row[:-1], neighbor[1:] + 1)
+        return np.minimum.accumulate(row - offsets) + offsets
+
+    for y in range(rows):
+        field[y] = relax(field[y], field[y - 1] if y > 0 else None)
+    for y in range(rows - 1, -1, -1):
+        # Mirror the row so the running minimum goes right to left
+        below = field[y + 1][::-1] if y < rows - 1 else None
+        field[y] = relax(field[y][::-1], below)[::-1]
+    return array('i', field.astype(np.int32).tobytes())
+
+
+def get_field(occupied, cols, rows):
+    """Shared distance field of an occupancy, rebuilt only when the occupancy changes"""
+    key = (cols, rows, bytes(occupied[:cols * rows]))
+    field = _fields.get(key)
+    if field is None:
+        # Keep only the most recently built occupancies
+        while len(_fields) >= MAX_CACHED_FIELDS:
+            del _fields[next(iter(_fields))]
+        field = _fields[key] = distance_field(occupied, cols, rows)
+    return field
+
+
+def clear_fields():
+    """Drop all cached fields"""
+    _fields.clear()
+
+
+def traced_blocked(field, rows, cols, lx, ly, x, y):
+    """Whether the shadow ray from the light to (x, y) hits an occupied cell, skipping free space"""
+    dx = x - lx
+    dy = y - ly
+    distance = math.sqrt(dx * dx + dy * dy)
+    if distance > 0:
+        dx, dy = dx / distance, dy / distance
+        steps = int(distance)
+        t = 1
+        while t < steps:
+            rx = int(lx + dx * t)
+            ry = int(ly + dy * t)
+            if 0 <= rx < cols and 0 <= ry < rows:
+                d = field[ry * cols + rx]
+                if d == 0:
+                    return True
+                # Samples t + 1 .. t + d - 2 are at most d - 1 cells away, so all free
+                t += d - 1 if d > 2 else 1
+            else:
+                t += 1
+    return False
+
+
+def lit_flags(occupied, cols, rows, light_pos):
+    """
+    Return a bytearray of rows*cols flags (index y*cols + x), 1 where lit.
+
+    occupied is a flat per-cell sequence of 0/1 flags; occupied cells
+    are left at 0, as in RayTable.lit_flags.
+    """
+    field = get_field(occupied, cols, rows)
+    lx, ly = light_pos
+    lit = bytearray(rows * cols)
+    for y in range(rows):
+        for x in range(cols):
+            index = y * cols + x
+            if field[index] and not traced_blocked(field, rows, cols, lx, ly, x, y):
+                lit[index] = 1
+    return lit
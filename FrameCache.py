@@ -0,0 +1,94 @@
+"""
+Frames cached by scene state.
+
+Sweeping the light back and forth or toggling objects between a few
+positions brings back the same scenes over and over. A FrameCache keeps
+finished frames keyed by everything that affects their pixels (see
+scene_key), so a Renderer can hand a recurring scene's frame back
+without lighting it again.
+
+Entries are stored compactly: the intensities as one array('d') and the
+packed colors as one array('I'), 12 bytes per cell instead of two lists
+of Python objects, plus the frame's OccupancyGrid and the Renderer's
+SoftShadowStats for it, so a hit reports the rays the frame took. The
+cache holds at most max_bytes of entries and evicts the least recently
+used first.
+"""
+from array import array
+from collections import OrderedDict
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def scene_key(scene):
+    """Hashable key of everything in a scene that changes its frame"""
+    return (
+        scene.grid_width, scene.grid_height, scene.cell_width, scene.cell_height,
+        scene.circle_center, scene.circle_radius, scene.circle_color,
+        scene.square_pos, scene.square_size, scene.square_color,
+        scene.shapes, scene.lights, scene.shadow_samples,
+        scene.enable_reflections, scene.diffusion_amount, scene.reflection_seed,
+        scene.lighting_engine, scene.downsample,
+    )
+
+
+class FrameCache:
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key: (occupancy, width, intensity, color, stats, nbytes), oldest first
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """(occupancy, intensity rows, color rows, stats) cached under key, or None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        occupancy, width, intensity, color, stats, _ = entry
+        # Fresh rows each time, since callers may write into them
+        return (occupancy,
+                [intensity[start:start + width].tolist() for start in range(0, len(intensity), width)],
+                [color[start:start + width].tolist() for start in range(0, len(color), width)],
+                stats)
+
+    def put(self, key, occupancy, intensity_matrix, color_matrix, stats=None):
+        """
+        Cache a frame under key, evicting the least recently used frames to stay within max_bytes.
+
+        stats is handed back with the frame, for the Renderer's soft-shadow statistics.
+        """
+        intensity = array('d', [value for row in intensity_matrix for value in row])
+        color = array('I', [value for row in color_matrix for value in row])
+        nbytes = (intensity.itemsize * len(intensity) + color.itemsize * len(color)
+                  + len(occupancy.cells) + len(occupancy.materials))
+        if nbytes > self.max_bytes:
+            return  # Would evict everything and still not fit
+
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[5]
+        while self.entries and self.nbytes + nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted[5]
+            self.evictions += 1
+        self.entries[key] = (occupancy, occupancy.width, intensity, color, stats, nbytes)
+        self.nbytes += nbytes
+
+    @property
+    def stats(self):
+        """Hits, misses, evictions and current size of the cache"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.entries),
+                "bytes": self.nbytes, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        """Drop every cached frame"""
+        self.entries.clear()
+        self.nbytes = 0
@@ -0,0 +1,207 @@
+"""
+Binary frame-sequence files with memory-mapped random access.
+
+Layout (all integers little-endian):
+
+    offset  size  field
+    0       4     magic b"RCFS"
+    4       2     format version (1)
+    6       1     dtype: 0 = uint8 shade, 1 = float16 intensity
+    7       1     reserved (0)
+    8       4     grid width (cells)
+    12      4     grid height (cells)
+    16      4     frame count
+    20      12    reserved (0)
+    32      ...   frames, each width * height * itemsize bytes, row-major
+
+Every frame has the same stride, so frame k starts at
+HEADER_SIZE + k * stride and FrameReader can hand out a view of it
+straight from the memory map without reading the rest of the file.
+
+A shade plane stores one brightness level (0-255) per cell; intensity
+planes store the lighting intensity as IEEE half floats.
+"""
+import mmap
+import struct
+
+import ShadowKernels
+
+MAGIC = b"RCFS"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBIII12x")
+HEADER_SIZE = HEADER.size
+
+SHADE = "shade"
+INTENSITY = "intensity"
+DTYPES = {SHADE: (0, 1), INTENSITY: (1, 2)}  # name: (code, bytes per cell)
+DTYPE_NAMES = {code: name for name, (code, _) in DTYPES.items()}
+
+# Shade of each createMatrix character, for storing ASCII frames
+MATRIX_SHADES = {' ': 0, '▒': 64, '.': 128, '█': 192, '*': 255}
+SHADE_CHARS = {shade: char for char, shade in MATRIX_SHADES.items()}
+
+
+def shade_plane(scene, frame):
+    """Brightness level 0-255 of every cell of a lit frame, as bytes"""
+    scale = 255 / scene.light_intensity
+    plane = bytearray()
+    for row in frame.intensity:
+        plane.extend(0 if value <= 0.1 else min(int(value * scale + 0.5), 255) for value in row)
+    return plane
+
+
+def intensity_plane(frame):
+    """Intensity of every cell of a lit frame as little-endian float16 bytes"""
+    values = [value for row in frame.intensity for value in row]
+    # float16 tops out at 65504; clamp rather than overflow
+    return struct.pack(f"<{len(values)}e", *(min(value, 65504.0) for value in values))
+
+
+def matrix_shades(matrix_str):
+    """Shade plane of a createMatrix string"""
+    return bytes(MATRIX_SHADES[char] for char in matrix_str if char != '\n')
+
+
+def shades_to_matrix(plane, width):
+    """createMatrix string of a shade plane written with matrix_shades"""
+    chars = ''.join(SHADE_CHARS[shade] for shade in plane)
+    return '\n'.join(chars[start:start + width] for start in range(0, len(chars), width))
+
+
+class FrameWriter:
+    """Appends equally sized frame planes to a new sequence file"""
+
+    def __init__(self, path, width, height, dtype=SHADE):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype: {dtype!r}")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.dtype = dtype
+        self.stride = width * height * DTYPES[dtype][1]
+        self.frame_count = 0
+        self.file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, DTYPES[self.dtype][0], 0, self.width, self.height,
+                                    self.frame_count))
+
+    def write(self, plane):
+        """Append one frame; plane is a bytes-like object of exactly one stride"""
+        plane = memoryview(plane).cast('B')
+        if len(plane) != self.stride:
+            raise ValueError(f"Frame is {len(plane)} bytes, expected {self.stride}")
+        self.file.seek(HEADER_SIZE + self.frame_count * self.stride)
+        self.file.write(plane)
+        self.frame_count += 1
+
+    def close(self):
+        """Record the frame count and close the file"""
+        if not self.file.closed:
+            self._write_header()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameReader:
+    """Random access to the frames of a sequence file through a read-only memory map"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is empty, not a frame sequence") from None
+        self._buffer = memoryview(self.map)
+
+        if len(self.map) < HEADER_SIZE:
+            self.close()
+            raise ValueError(f"{path} is too short to be a frame sequence")
+        magic, version, code, _, self.width, self.height, self.frame_count = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or code not in DTYPE_NAMES:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} frame sequence")
+        self.dtype = DTYPE_NAMES[code]
+        self.stride = self.width * self.height * DTYPES[self.dtype][1]
+        if len(self.map) < HEADER_SIZE + self.frame_count * self.stride:
+            self.close()
+            raise ValueError(f"{path} is truncated")
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, index):
+        return self.frame(index)
+
+    def __iter__(self):
+        for index in range(self.frame_count):
+            yield self.frame(index)
+
+    def _offset(self, index):
+        if index < 0:
+            index += self.frame_count
+        if not 0 <= index < self.frame_count:
+            raise IndexError("frame index out of range")
+        return HEADER_SIZE + index * self.stride
+
+    def frame_bytes(self, index):
+        """Zero-copy memoryview of frame index's raw plane bytes"""
+        start = self._offset(index)
+        return self._buffer[start:start + self.stride]
+
+    def frame(self, index):
+        """
+        Frame index as a height x width view.
+
+        With NumPy this is a zero-copy uint8 or float16 array over the
+        memory map. Without it, shade frames are a zero-copy 2-D
+        memoryview and intensity frames are decoded into lists of rows.
+        """
+        start = self._offset(index)
+        if ShadowKernels.HAS_NUMPY:
+            np = ShadowKernels.np
+            dtype = np.uint8 if self.dtype == SHADE else np.dtype("<f2")
+            return np.frombuffer(self.map, dtype=dtype, count=self.width * self.height,
+                                 offset=start).reshape(self.height, self.width)
+        if self.dtype == SHADE:
+            return self.frame_bytes(index).cast('B', shape=[self.height, self.width])
+        values = struct.unpack_from(f"<{self.width * self.height}e", self.map, start)
+        return [list(values[y * self.width:(y + 1) * self.width]) for y in range(self.height)]
+
+    def close(self):
+        """
+        Release the memory map and close the file.
+
+        Frames and frame_bytes views still alive keep the mapping readable;
+        it is unmapped once the last of them is garbage collected.
+        """
+        try:
+            if self._buffer is not None:
+                try:
+                    self._buffer.release()
+                except BufferError:
+                    pass  # Exported further; dropped below like the map
+                self._buffer = None
+            if self.map is not None and not self.map.closed:
+                try:
+                    self.map.close()
+                except BufferError:
+                    pass  # Live views; the map goes with the last of them
+            self.map = None
+        finally:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,104 @@
+"""
+Per-stage frame timing.
+
+A FrameTiming record times the stages of one frame with lap(): the
+Renderer fills in the frame cache lookup, rasterization, the shadow
+pass and reflections, and the canvas adds color conversion and the Tk
+paint. A frame served from the cache is marked cached and has no
+lighting stages; averages leave it out of those. Finished records go
+into a FrameTimer's ring buffer, which keeps the last few hundred
+frames for the overlay and can stream every frame to a CSV file.
+
+Records are only made while a FrameTimer is enabled. Otherwise
+Scene.timing stays None and each stage costs one None check per frame.
+"""
+import csv
+import time
+from collections import deque
+
+STAGES = ("cache", "rasterize", "shadows", "reflections", "colors", "paint")
+# Stages skipped by frames served from a FrameCache
+LIGHTING_STAGES = ("rasterize", "shadows", "reflections")
+DEFAULT_CAPACITY = 240  # Frames kept in the ring buffer
+
+
+class FrameTiming:
+    """Seconds spent in each stage of one frame"""
+    __slots__ = ("stages", "mark", "cached")
+
+    def __init__(self):
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.mark = time.perf_counter()
+        self.cached = False  # Served from a FrameCache, so not lit
+
+    def restart(self):
+        """Start timing the next stage from now, skipping time spent waiting"""
+        self.mark = time.perf_counter()
+
+    def lap(self, stage):
+        """Add the time since the last lap to stage"""
+        now = time.perf_counter()
+        self.stages[stage] += now - self.mark
+        self.mark = now
+
+    @property
+    def total(self):
+        return sum(self.stages.values())
+
+
+class FrameTimer:
+    def __init__(self, capacity=DEFAULT_CAPACITY, enabled=False):
+        self.enabled = enabled
+        self.frames = deque(maxlen=capacity)  # Finished FrameTiming records, oldest first
+        self.frames_recorded = 0
+        self._csv_file = None
+        self._csv = None
+
+    def frame(self):
+        """New FrameTiming record, or None while disabled"""
+        return FrameTiming() if self.enabled else None
+
+    def record(self, timing):
+        """Keep a finished record, and write it to the CSV file if one is open"""
+        self.frames.append(timing)
+        self.frames_recorded += 1
+        if self._csv is not None:
+            self._csv.writerow([self.frames_recorded, int(timing.cached)]
+                               + [f"{timing.stages[stage] * 1000:.3f}" for stage in STAGES]
+                               + [f"{timing.total * 1000:.3f}"])
+
+    def averages(self):
+        """Mean seconds per stage over the ring buffer; lighting stages only over frames that were lit"""
+        lit = [timing for timing in self.frames if not timing.cached]
+        averages = {}
+        for stage in STAGES:
+            frames = lit if stage in LIGHTING_STAGES else self.frames
+            averages[stage] = sum(timing.stages[stage] for timing in frames) / (len(frames) or 1)
+        return averages
+
+    def summary(self):
+        """Overlay text: mean milliseconds per stage and per frame over the ring buffer"""
+        lines = [f"{stage:<12}{seconds * 1000:7.2f} ms" for stage, seconds in self.averages().items()]
+        count = len(self.frames)
+        total = sum(timing.total for timing in self.frames) / (count or 1)
+        cached = sum(timing.cached for timing in self.frames)
+        lines.append(f"{'total':<12}{total * 1000:7.2f} ms  ({count} frames, {cached} cached)")
+        return "\n".join(lines)
+
+    @property
+    def writing_csv(self):
+        """Whether records are being written to a CSV file"""
+        return self._csv is not None
+
+    def open_csv(self, path):
+        """Write every frame recorded from now on to a CSV file, in milliseconds"""
+        self.close()
+        self._csv_file = open(path, "w", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._csv_file)
+        self._csv.writerow(["frame", "cached"] + [f"{stage}_ms" for stage in STAGES] + ["total_ms"])
+
+    def close(self):
+        """Close the CSV file, if any"""
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = self._csv = None
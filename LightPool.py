@@ -0,0 +1,139 @@
+"""
+Per-light direct lighting fields, optionally computed in a process pool.
+
+With several lights, each light's shadow and falloff field depends only
+on the occupancy grid and that light, so the fields can be computed
+independently and summed. LightPool farms them out to worker processes.
+The occupancy bitmap is copied once per frame into a shared memory
+block that every worker maps at startup, so tasks only carry the light
+and grid size instead of a pickled grid.
+
+Workers are started with the "spawn" method so they never inherit a
+Tk connection from the front end.
+"""
+import math
+import multiprocessing
+import os
+from array import array
+from multiprocessing import shared_memory
+
+import ShadowKernels
+import RayTable
+import DistanceField
+from ShapeIndex import ShapeIndex
+
+# Shared occupancy block, attached once per worker process
+_shared = None
+
+
+def light_field(occupied, width, height, light_pos, intensity, engine="python", shapes=None):
+    """
+    Direct intensity of every cell from one light, as a flat array('d').
+
+    occupied is a flat per-cell sequence of 0/1 flags (index y*width + x).
+    Shadowed and occupied cells are 0; the light's own cell gets twice
+    the intensity, matching the single-light pass. The analytic engine
+    tests shadows against shapes, the scene's occluders as ShapeIndex
+    shapes.
+    """
+    lx, ly = light_pos
+    if engine == "numpy":
+        np = ShadowKernels.np
+        mask = np.frombuffer(occupied, dtype=np.uint8, count=width * height).reshape(height, width).astype(bool)
+        field, _ = ShadowKernels.direct_lighting(mask, (lx, ly), intensity)
+        return array('d', field.astype(np.float64).tobytes())
+
+    if engine == "table":
+        lit = RayTable.get_table(height, width).lit_flags(occupied, (lx, ly))
+    elif engine == "sdf":
+        lit = DistanceField.lit_flags(occupied, width, height, (lx, ly))
+    elif engine == "analytic":
+        lit = ShapeIndex(shapes or ()).lit_flags(occupied, width, height, (lx, ly))
+    else:
+        lit = bytearray(width * height)
+        for y in range(height):
+            for x in range(width):
+                index = y * width + x
+                if not occupied[index] and not RayTable.march_blocked(occupied, height, width, lx, ly, x, y):
+                    lit[index] = 1
+
+    field = array('d', bytes(8 * width * height))
+    for y in range(height):
+        for x in range(width):
+            if not lit[y * width + x]:
+                continue
+            # Mark light source
+            if x == lx and y == ly:
+                field[y * width + x] = intensity * 2
+                continue
+            distance = max(math.sqrt((x - lx) ** 2 + (y - ly) ** 2), 1)
+            field[y * width + x] = min(intensity / (distance * 0.5), intensity)
+    return field
+
+
+def _attach(name):
+    """Pool initializer: map the shared occupancy block"""
+    global _shared
+    try:
+        _shared = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block again with the
+        # resource tracker workers share with the parent, which is harmless
+        _shared = shared_memory.SharedMemory(name=name)
+
+
+def _shared_field(width, height, light_pos, intensity, engine, shapes):
+    """Worker task: one light's field over the shared occupancy"""
+    return light_field(_shared.buf[:width * height], width, height, light_pos, intensity, engine, shapes)
+
+
+class LightPool:
+    def __init__(self, workers=None):
+        # None means one worker per CPU; 1 computes every field in-process
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        if self.workers < 1:
+            raise ValueError("LightPool needs at least one worker")
+        self._pool = None
+        self._shared = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self, size):
+        """Start the workers around a shared block of at least size bytes"""
+        self.close()
+        self._shared = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(self.workers, initializer=_attach, initargs=(self._shared.name,))
+
+    def fields(self, occupied, width, height, lights, engine="python", shapes=None):
+        """
+        Return one light_field per light, in order.
+
+        lights is a sequence of (pos, intensity, ...) tuples. Runs in-process
+        for a single worker or a single light.
+        """
+        if self.workers == 1 or len(lights) < 2:
+            return [light_field(occupied, width, height, light[0], light[1], engine, shapes) for light in lights]
+
+        size = width * height
+        # Grids can shrink in place; a larger grid needs a new block (and pool)
+        if self._shared is None or self._shared.size < size:
+            self._start(size)
+        self._shared.buf[:size] = occupied
+        tasks = [(width, height, tuple(light[0]), light[1], engine, shapes) for light in lights]
+        return self._pool.starmap(_shared_field, tasks)
+
+    def close(self):
+        """Stop the workers and free the shared block"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self._shared is not None:
+            self._shared.close()
+            self._shared.unlink()
+            self._shared = None
@@ -1,83 +1,14 @@
-import tkinter as tk
 import time
-import math
 
-def createMatrix(r, c, circle_center=None, circle_radius=6, square_pos=None, square_size=5, light_pos=(1, 1)):
-    # Create an r×c matrix and fill it with '█' 
-    rows, cols = r, c
-    matrix = [[' ' for _ in range(cols)] for _ in range(rows)]
-    
-    # Track occupied points for shadow calculation
-    objects = set()
-    
-    # Add a circle if center is provided
-    if circle_center:
-        cx, cy = circle_center
-        h_stretch = 2.0  # Horizontal stretch factor
-        for y in range(rows):
-            for x in range(cols):
-                # Calculate distance with horizontal stretching
-                distance = math.sqrt(((x - cx)/h_stretch)**2 + (y - cy)**2)
-                if distance <= circle_radius:
-                    matrix[y][x] = '.'
-                    objects.add((x, y))
-    
-    # Add a square if position is provided
-    if square_pos:
-        sx, sy = square_pos
-        h_stretch = 2  # Make the square wider
-        for y in range(max(0, sy), min(rows, sy + square_size)):
-            for x in range(max(0, sx), min(cols, sx + square_size * h_stretch)):
-                matrix[y][x] = '.'
-                objects.add((x, y))
-    
-    # Calculate shadows using simple ray casting
-    lx, ly = light_pos
-    for y in range(rows):
-        for x in range(cols):
-            # Skip if this is already an object
-            if (x, y) in objects:
-                continue
-                
-            # Skip the light source
-            if x == lx and y == ly:
-                matrix[y][x] = '*'  # Mark light source with *
-                continue
-                
-            # Calculate direction from light to current point
-            dx = x - lx
-            dy = y - ly
-            
-            # Check if this point is in shadow
-            in_shadow = False
-            
-            # Normalize direction for ray casting
-            distance = math.sqrt(dx*dx + dy*dy)
-            if distance > 0:
-                dx, dy = dx/distance, dy/distance
-                
-                # Cast ray from light to current position
-                for t in range(1, int(distance)):
-                    rx = int(lx + dx * t)
-                    ry = int(ly + dy * t)
-                    
-                    # Check if ray hit an object
-                    if (rx, ry) in objects:
-                        in_shadow = True
-                        break
-            
-            # Mark shadow points
-            if in_shadow:
-                matrix[y][x] = '▒'  # Medium shade for shadows
-            else:
-                matrix[y][x] = '█'  # Solid block for background
-    
-    # Convert matrix to a string
-    matrix_str = '\n'.join(''.join(row) for row in matrix)
-    
-    return matrix_str
+# The lighting itself lives in the headless core; this module is the Tk front end
+from RenderCore import createMatrix, createMatrixNumpy  # noqa: F401
+from RenderThread import RenderThread
+
+
+def displayOut(rows=40, cols=100):
+    # Imported here so headless users of createMatrix never load tkinter
+    import tkinter as tk
 
-def displayOut():
     root = tk.Tk()
     root.title("Interactive Matrix Display with Shadows")
     
@@ -140,20 +71,31 @@ def displayOut():
     # Track FPS
     last_time = time.time()
     frame_count = 0
+
+    # Scene revision: bumped by input that changes the scene, so frames
+    # are only recomputed when something actually changed
+    scene_revision = 0
+    rendered_revision = None
+
+    # Frames are rendered on a worker thread from copies of the positions,
+    # so input handlers never race with a half-updated scene
+    render_thread = RenderThread(lambda job: createMatrix(rows, cols, **job), name="matrix-render").start()
     
     # Function to update mouse position
     def motion(event):
+        nonlocal scene_revision
         mouse_x, mouse_y = event.x, event.y
         # Convert screen coordinates to matrix coordinates
         char_width = 10 
         char_height = 18
-        matrix_x = max(0, min(99, int((event.x - 10) / char_width)))
-        matrix_y = max(0, min(39, int((event.y - 10) / char_height)))
+        matrix_x = max(0, min(cols - 1, int((event.x - 10) / char_width)))
+        matrix_y = max(0, min(rows - 1, int((event.y - 10) / char_height)))
         mouse_pos_label.config(text=f"Matrix pos: ({matrix_x}, {matrix_y})")
 
-        light_pos[0], light_pos[1] = matrix_x, matrix_y
+        if (light_pos[0], light_pos[1]) != (matrix_x, matrix_y):
+            light_pos[0], light_pos[1] = matrix_x, matrix_y
+            scene_revision += 1
 
-        
         return matrix_x, matrix_y
     
     # Bind motion event to track mouse
@@ -162,7 +104,7 @@ def displayOut():
     # Handle clicking to move objects
     def on_click(event):
         matrix_x, matrix_y = motion(event)
-        nonlocal current_object
+        nonlocal current_object, scene_revision
         
         # Move the selected object
         if current_object == "circle":
@@ -173,27 +115,35 @@ def displayOut():
             square_pos[0], square_pos[1] = matrix_x, matrix_y
             current_object = "circle"
             selection_label.config(text="Click to move: Circle")
+        scene_revision += 1
     
     # Bind left mouse button click
     root.bind("<Button-1>", on_click)
     
     def update_display():
-        nonlocal last_time, frame_count
+        nonlocal last_time, frame_count, rendered_revision
         
-        # Generate matrix with objects and shadows
-        matrix_str = createMatrix(
-            40, 100,
-            circle_center=circle_center,
-            circle_radius=6,
-            square_pos=square_pos,
-            square_size=5,
-            light_pos=light_pos
-        )
-        label.config(text=matrix_str)
+        # Only recompute when the scene changed since the last frame
+        if rendered_revision != scene_revision:
+            rendered_revision = scene_revision
+
+            # Generate matrix with objects and shadows from a snapshot of the scene
+            render_thread.submit(scene_revision, dict(
+                circle_center=tuple(circle_center),
+                circle_radius=6,
+                square_pos=tuple(square_pos),
+                square_size=5,
+                light_pos=tuple(light_pos)
+            ))
+
+        # Show the newest finished frame
+        finished = render_thread.take()
+        if finished is not None:
+            label.config(text=finished[2])
+            frame_count += 1
         
-        # Calculate FPS
+        # Calculate FPS (frames actually rendered)
         current_time = time.time()
-        frame_count += 1
         
         if current_time - last_time >= 1.0:
             fps = frame_count / (current_time - last_time)
@@ -206,8 +156,11 @@ def displayOut():
     
     # Start the update loop
     update_display()
-    
-    root.mainloop()
+
+    try:
+        root.mainloop()
+    finally:
+        render_thread.stop()
     
 if __name__ == "__main__":
     displayOut()
@@ -0,0 +1,100 @@
+"""
+Flat occupancy bitmap for occluders.
+
+Cells are stored row-major in a bytearray indexed y * width + x, so the
+shadow march tests one byte instead of hashing an (x, y) tuple into a
+set. A parallel bytearray holds each cell's material: an index into
+palette, which stores the object colors.
+"""
+
+
+class OccupancyGrid:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)  # 1 where occupied
+        self.materials = bytearray(width * height)  # Index into palette, 0 = none
+        self.palette = [None]
+
+    def __repr__(self):
+        return f"OccupancyGrid({self.width}x{self.height}, {len(self)} occupied)"
+
+    def __eq__(self, other):
+        if not isinstance(other, OccupancyGrid):
+            return NotImplemented
+        return (self.width, self.height, self.cells, self.materials, self.palette) == \
+            (other.width, other.height, other.cells, other.materials, other.palette)
+
+    def __len__(self):
+        return self.width * self.height - self.cells.count(0)
+
+    def __contains__(self, cell):
+        x, y = cell
+        return 0 <= x < self.width and 0 <= y < self.height and self.cells[y * self.width + x] == 1
+
+    def __iter__(self):
+        """Yield the occupied (x, y) cells in row-major order"""
+        width = self.width
+        index = self.cells.find(1)
+        while index != -1:
+            yield index % width, index // width
+            index = self.cells.find(1, index + 1)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the occupancy and material arrays"""
+        return len(self.cells) + len(self.materials)
+
+    def material(self, color):
+        """Palette index for color, adding it if needed"""
+        if color in self.palette:
+            return self.palette.index(color)
+        if len(self.palette) == 256:
+            raise ValueError("OccupancyGrid supports at most 255 materials")
+        self.palette.append(color)
+        return len(self.palette) - 1
+
+    def fill(self, x, y, material=0):
+        """Mark one cell occupied, ignoring cells off the grid"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            index = y * self.width + x
+            self.cells[index] = 1
+            self.materials[index] = material
+
+    def fill_indices(self, indices, material=0):
+        """Mark flat cell indices occupied"""
+        cells = self.cells
+        materials = self.materials
+        for index in indices:
+            cells[index] = 1
+            materials[index] = material
+
+    def fill_rect(self, x, y, width, height, material=0):
+        """Mark an axis-aligned rectangle occupied, clipped to the grid"""
+        x0, x1 = max(0, x), min(self.width, x + width)
+        if x1 <= x0:
+            return
+        ones = b'\x01' * (x1 - x0)
+        fill = bytes([material]) * (x1 - x0)
+        for row in range(max(0, y), min(self.height, y + height)):
+            start = row * self.width
+            self.cells[start + x0:start + x1] = ones
+            self.materials[start + x0:start + x1] = fill
+
+    def color_at(self, x, y, default=None):
+        """Object color of a cell, or default when it has none"""
+        color = self.palette[self.materials[y * self.width + x]]
+        return default if color is None else color
+
+    def changed_cells(self, previous):
+        """(x, y) cells whose occupancy differs from a previous cells snapshot"""
+        width = self.width
+        changed = set()
+        for y in range(self.height):
+            start = y * width
+            # Compare whole rows first; most rows are untouched
+            if previous[start:start + width] != self.cells[start:start + width]:
+                for x in range(width):
+                    if previous[start + x] != self.cells[start + x]:
+                        changed.add((x, y))
+        return changed
@@ -1,10 +1,20 @@
 import math
 
-def cast(r=5, c=5, square_pos=[3,3], square_size=1, light_pos=[1, 1]):
-    
+import Shadowcasting
+import RayTable
+from OccupancyGrid import OccupancyGrid
+
+def cast(r=5, c=5, square_pos=[3,3], square_size=1, light_pos=[1, 1], method="raycast", engine="python"):
+    # method: "raycast" (one ray per cell) or "shadowcast" (octant sweep)
+    # engine: "python" (march every ray) or "table" (precomputed ray paths)
+    Shadowcasting.check_method(method)
+    if engine not in ("python", "table"):
+        raise ValueError(f"Unknown engine: {engine!r}")
+
     rows, cols = r, c
     # Track occupied points for shadow calculation
-    objects = set()
+    objects = OccupancyGrid(cols, rows)
+    occupied = objects.cells
     matrix = [[' ' for _ in range(cols)] for _ in range(rows)]
 
     
@@ -16,18 +26,29 @@ def cast(r=5, c=5, square_pos=[3,3], square_size=1, light_pos=[1, 1]):
         for y in range(max(0, sy), min(rows, sy + square_size)):
             for x in range(max(0, sx), min(cols, sx + square_size * h_stretch)):
                 matrix[y][x] = '.'
-                objects.add((x, y))
+                objects.fill(x, y)
+
+
+    print(set(objects))
 
 
-    print(objects)
+    # Shadowcasting visits each cell about once instead of one ray per cell
+    if method == "shadowcast":
+        return Shadowcasting.shade_matrix(matrix, Shadowcasting.lit_cells(rows, cols, occupied, light_pos), light_pos)
 
+    # Walk the precomputed ray paths for this grid size
+    if engine == "table":
+        lit = RayTable.get_table(rows, cols).lit_flags(occupied, light_pos)
+        return Shadowcasting.shade_matrix(matrix, lit, light_pos)
 
     # Calculate shadows using simple ray casting
     lx, ly = light_pos
+    # With the light on the grid every ray sample is too, so skip the bounds check
+    light_inside = 0 <= lx < cols and 0 <= ly < rows
     for y in range(rows):
         for x in range(cols):
             # Skip if this is already an object
-            if (x, y) in objects:
+            if occupied[y * cols + x]:
                 continue
                 
             # Skip the light source
@@ -55,7 +76,7 @@ def cast(r=5, c=5, square_pos=[3,3], square_size=1, light_pos=[1, 1]):
                     ry = int(ly + dy * t)
                     
                     # Check if ray hit an object
-                    if (rx, ry) in objects:
+                    if (light_inside or (0 <= rx < cols and 0 <= ry < rows)) and occupied[ry * cols + rx]:
                         in_shadow = True
                         break
             
@@ -0,0 +1,168 @@
+"""
+Precomputed shadow-ray paths keyed by light-to-target offset.
+
+The cells a shadow ray samples depend only on the offset (dx, dy)
+between the light and the target, so they can be computed once per
+grid size and reused every frame. Each path is stored as flat cell
+index deltas relative to the light (dy * cols + dx), which turns the
+shadow test into a table walk with no sqrt, division or int().
+
+Offsets farther than max_radius from the light are not stored; those
+targets fall back to the regular per-cell march. This bounds memory.
+
+The march samples int(lx + ux * t), which equals lx + floor(ux * t)
+unless ux * t lies within rounding error of an integer without being
+one (e.g. -7.000000000000001 along a 7-24-25 direction): then the float
+sum may round onto the integer, depending on lx. That only happens at
+whole-number distances. Offsets with such a sample are not stored
+either and always use the march, so the table gives exactly the
+march's results.
+"""
+import math
+from array import array
+
+DEFAULT_MAX_RADIUS = 128
+MAX_CACHED_TABLES = 4
+# ux * t this close to an integer, but not on it, may truncate either way once added to lx
+NEAR_INTEGER = 1e-9
+
+_tables = {}
+
+
+class RayPathTable:
+    def __init__(self, rows, cols, max_radius=DEFAULT_MAX_RADIUS):
+        self.rows = rows
+        self.cols = cols
+
+        # No offset inside the grid is longer than the diagonal
+        diagonal = int(math.ceil(math.sqrt((rows - 1) ** 2 + (cols - 1) ** 2)))
+        self.max_radius = diagonal if max_radius is None else min(max_radius, diagonal)
+
+        radius = self.max_radius
+        # Offsets between two cells never exceed the grid extent on either axis
+        self.radius_x = min(radius, cols - 1)
+        self.radius_y = min(radius, rows - 1)
+        self.span = 2 * self.radius_x + 1
+        # starts[k]..starts[k + 1] is the path for offset k; deltas holds every path
+        self.starts = array('I', [0])
+        self.deltas = array('i')
+        # 1 for offsets left to the march because a sample's truncation depends on the light
+        self.marched = bytearray(self.span * (2 * self.radius_y + 1))
+
+        radius_squared = radius * radius
+        k = 0
+        for dy in range(-self.radius_y, self.radius_y + 1):
+            for dx in range(-self.radius_x, self.radius_x + 1):
+                distance_squared = dx * dx + dy * dy
+                if 0 < distance_squared <= radius_squared:
+                    distance = math.sqrt(distance_squared)
+                    ux, uy = dx / distance, dy / distance
+                    steps = range(1, int(distance))
+                    # ux * t can only land on an integer when the distance is a whole number;
+                    # otherwise it stays far from integers compared with rounding error
+                    if math.isqrt(distance_squared) ** 2 == distance_squared and any(
+                            _near_integer(ux * t) or _near_integer(uy * t) for t in steps):
+                        self.marched[k] = 1
+                    else:
+                        # Samples stay inside the grid, so truncation equals floor
+                        self.deltas.extend(math.floor(uy * t) * cols + math.floor(ux * t) for t in steps)
+                self.starts.append(len(self.deltas))
+                k += 1
+
+        self._deltas_view = memoryview(self.deltas)
+
+    @property
+    def nbytes(self):
+        """Memory held by the path arrays in bytes"""
+        return self.starts.itemsize * len(self.starts) + self.deltas.itemsize * len(self.deltas)
+
+    def path(self, dx, dy):
+        """Cell index deltas sampled for offset (dx, dy), or None if not stored"""
+        radius = self.max_radius
+        if abs(dx) > self.radius_x or abs(dy) > self.radius_y or dx * dx + dy * dy > radius * radius:
+            return None
+        k = (dy + self.radius_y) * self.span + (dx + self.radius_x)
+        if self.marched[k]:
+            return None
+        return self._deltas_view[self.starts[k]:self.starts[k + 1]]
+
+    def lit_flags(self, occupied, light_pos):
+        """
+        Return a bytearray of rows*cols flags (index y*cols + x), 1 where lit.
+
+        occupied is a flat per-cell sequence of 0/1 flags. Occupied cells
+        are left at 0. A light off the grid uses the fallback march.
+        """
+        rows, cols = self.rows, self.cols
+        lx, ly = light_pos
+        lit = bytearray(rows * cols)
+        light_inside = 0 <= lx < cols and 0 <= ly < rows
+        light_index = ly * cols + lx
+
+        radius = self.max_radius
+        radius_squared = radius * radius
+        span = self.span
+        starts = self.starts
+        deltas = self._deltas_view
+        marched = self.marched
+
+        for y in range(rows):
+            dy = y - ly
+            row_key = (dy + self.radius_y) * span + self.radius_x
+            for x in range(cols):
+                index = y * cols + x
+                if occupied[index]:
+                    continue
+                dx = x - lx
+
+                k = row_key + dx
+                if light_inside and dx * dx + dy * dy <= radius_squared and not marched[k]:
+                    blocked = False
+                    for delta in deltas[starts[k]:starts[k + 1]]:
+                        if occupied[light_index + delta]:
+                            blocked = True
+                            break
+                else:
+                    blocked = march_blocked(occupied, rows, cols, lx, ly, x, y)
+
+                if not blocked:
+                    lit[index] = 1
+        return lit
+
+
+def _near_integer(value):
+    """Whether value is within rounding error of an integer without being one"""
+    nearest = round(value)
+    return value != nearest and abs(value - nearest) < NEAR_INTEGER
+
+
+def march_blocked(occupied, rows, cols, lx, ly, x, y):
+    """Per-cell shadow march used for offsets the table does not cover"""
+    dx = x - lx
+    dy = y - ly
+    distance = math.sqrt(dx * dx + dy * dy)
+    if distance > 0:
+        dx, dy = dx / distance, dy / distance
+        for t in range(1, int(distance)):
+            rx = int(lx + dx * t)
+            ry = int(ly + dy * t)
+            if 0 <= rx < cols and 0 <= ry < rows and occupied[ry * cols + rx]:
+                return True
+    return False
+
+
+def get_table(rows, cols, max_radius=DEFAULT_MAX_RADIUS):
+    """Shared table for a grid size, built on first use"""
+    key = (rows, cols, max_radius)
+    table = _tables.get(key)
+    if table is None:
+        # Keep only the most recently built grid sizes
+        while len(_tables) >= MAX_CACHED_TABLES:
+            del _tables[next(iter(_tables))]
+        table = _tables[key] = RayPathTable(rows, cols, max_radius)
+    return table
+
+
+def clear_tables():
+    """Drop all cached tables"""
+    _tables.clear()
@@ -0,0 +1,991 @@
+"""
+Headless rendering core.
+
+Everything here runs without tkinter. A Scene holds what one frame
+needs (grid size, occluders, the lights and the lighting settings) and
+render(scene) returns the occupancy grid plus the per-cell intensity
+and packed 0xRRGGBB color buffers. With several lights each light's
+field is computed separately (see LightPool) and summed. The Tk front
+ends in Main and CanvasRayTracer only turn those buffers into pixels,
+so the same code can run on display-less render workers, in benchmarks
+and in batches.
+
+The "analytic" engine tests shadow rays exactly against the occluder
+shapes through a ShapeIndex instead of marching the occupancy grid. The
+"sdf" engine gives the march's results but sphere-traces each ray
+through a distance field (see DistanceField).
+
+A Scene with downsample > 1 is a preview: it is lit on a grid that many
+times coarser (coarse_scene) and scaled back up, with the occluders
+still drawn at full resolution. Front ends show previews while the
+scene is changing and refine to the full-resolution frame once it
+settles.
+
+createMatrix and createMatrixNumpy render the ASCII shadow view used by
+Main.
+"""
+import math
+import random
+from collections import namedtuple
+
+import ShadowKernels
+import Shadowcasting
+import RayTable
+import ShadowWedge
+import DistanceField
+from ShapeIndex import Ellipse, Polygon, Rect, ShapeIndex, shape_cells
+from OccupancyGrid import OccupancyGrid
+from ColorPalette import BRIGHTNESS_LEVELS, hex_to_int, mix_rgb, scale_rgb
+from LightPool import LightPool
+import SoftShadows
+from FrameCache import scene_key
+
+# Rasterized occluders kept per Renderer; cleared when full
+MAX_CACHED_RASTERS = 16
+# Steps along each reflected ray
+MAX_REFLECTION_DISTANCE = 40
+# Downsample factors of the preview passes shown before a full-resolution frame, coarsest first
+PREVIEW_LEVELS = (4, 2)
+
+Frame = namedtuple("Frame", ["occupancy", "intensity", "color"])
+# radius > 0 makes a disc light with soft shadows (see SoftShadows)
+Light = namedtuple("Light", ["pos", "intensity", "color", "radius"], defaults=(0,))
+
+
+class Scene:
+    def __init__(self, grid_width=100, grid_height=70, cell_width=10.0, cell_height=800 / 70,
+                 circle_center=(40, 15), circle_radius=6, circle_color="#00B000",
+                 square_pos=(70, 10), square_size=5, square_color="#B00000",
+                 light_pos=(20, 15), light_intensity=100, light_color="#FFF0C8", light_radius=0,
+                 enable_reflections=True, diffusion_amount=0.1,
+                 lighting_engine="auto", incremental_shadows=True, lights=None, shapes=(), reflection_seed=0,
+                 shadow_samples=SoftShadows.DEFAULT_SAMPLES, downsample=1, timing=None):
+        # Grid dimensions (cells); the cell size only sets the aspect ratio
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+
+        # Occluders; a None circle_center or square_pos leaves that object out
+        self.circle_center = None if circle_center is None else tuple(circle_center)
+        self.circle_radius = circle_radius
+        self.circle_color = circle_color
+        self.square_pos = None if square_pos is None else tuple(square_pos)
+        self.square_size = square_size  # Horizontal size; the height follows the aspect ratio
+        self.square_color = square_color
+        self.shapes = tuple(shapes)  # Extra ShapeIndex occluders (Ellipse, Rect); not reflective
+
+        # Lights as (pos, intensity, color) or (pos, intensity, color, radius);
+        # light_pos, light_intensity, light_color and light_radius describe the first one
+        if lights:
+            self.lights = tuple(Light(tuple(light[0]), *light[1:]) for light in lights)
+        else:
+            self.lights = (Light(tuple(light_pos), light_intensity, light_color, light_radius),)
+        self.light_pos, self.light_intensity, self.light_color, self.light_radius = self.lights[0]
+        self.shadow_samples = shadow_samples  # Shadow rays per penumbra cell of a disc light
+
+        # Settings
+        self.enable_reflections = enable_reflections
+        self.diffusion_amount = diffusion_amount
+        self.reflection_seed = reflection_seed  # Seeds the frame's diffusion jitter, so frames are reproducible
+        self.lighting_engine = lighting_engine  # "numpy", "python", "table", "sdf", "analytic" or "auto"
+        self.incremental_shadows = incremental_shadows  # Only recompute the shadow wedge of moved occluders
+        self.downsample = downsample  # Above 1, light a grid this many times coarser as a quick preview
+        self.timing = timing  # FrameTiming.FrameTiming the Renderer fills in per stage, or None
+
+    def __repr__(self):
+        return (f"Scene({self.grid_width}x{self.grid_height}, circle={self.circle_center}, "
+                f"square={self.square_pos}, shapes={len(self.shapes)}, lights={len(self.lights)})")
+
+
+def scene_shapes(scene):
+    """The circle, square and extra occluders of a scene as analytic shapes"""
+    shapes = []
+    if scene.circle_center is not None:
+        cx, cy = scene.circle_center
+        aspect_ratio = scene.cell_width / scene.cell_height
+        shapes.append(Ellipse(cx, cy, scene.circle_radius, scene.circle_radius * aspect_ratio, scene.circle_color))
+    if scene.square_pos is not None:
+        # The square covers whole cells, so its edges sit half a cell beyond the outer centers
+        sx, sy = scene.square_pos
+        shapes.append(Rect(sx - 0.5, sy - 0.5, sx + scene.square_size - 0.5, sy + square_height(scene) - 0.5,
+                           scene.square_color))
+    return shapes + list(scene.shapes)
+
+
+def direct_light_at(scene, occupancy, x, y, light_rgb):
+    """Direct intensity and packed color of one cell, marching its shadow ray"""
+    width, height = scene.grid_width, scene.grid_height
+    lx, ly = scene.light_pos
+    occupied = occupancy.cells
+
+    # Skip objects
+    if occupied[y * width + x]:
+        return 0, 0
+
+    # Mark light source
+    if x == lx and y == ly:
+        return scene.light_intensity * 2, light_rgb
+
+    # Calculate direction to point
+    dx = x - lx
+    dy = y - ly
+    distance = math.sqrt(dx * dx + dy * dy)
+
+    # Check for shadows
+    if distance > 0:
+        dx /= distance
+        dy /= distance
+        # With the light on the grid every ray sample is too
+        light_inside = 0 <= lx < width and 0 <= ly < height
+
+        # Cast ray from light to current position
+        for t in range(1, int(distance)):
+            rx = int(lx + dx * t)
+            ry = int(ly + dy * t)
+
+            if (light_inside or (0 <= rx < width and 0 <= ry < height)) and occupied[ry * width + rx]:
+                return 0, 0
+
+    # Calculate light intensity with falloff
+    if distance < 1:
+        distance = 1
+
+    # Inverse square law
+    falloff_intensity = min(scene.light_intensity / (distance * 0.5), scene.light_intensity)
+    return falloff_intensity, light_rgb
+
+
+def direct_lighting_python(scene, occupancy):
+    """Direct lighting pass with a per-cell shadow march"""
+    light_rgb = hex_to_int(scene.light_color)
+    intensity_matrix = []
+    color_matrix = []
+    for y in range(scene.grid_height):
+        intensity_row = []
+        color_row = []
+        for x in range(scene.grid_width):
+            intensity, color = direct_light_at(scene, occupancy, x, y, light_rgb)
+            intensity_row.append(intensity)
+            color_row.append(color)
+        intensity_matrix.append(intensity_row)
+        color_matrix.append(color_row)
+
+    return intensity_matrix, color_matrix
+
+
+def direct_lighting_numpy(scene, occupancy):
+    """Direct lighting pass computed on float32 arrays"""
+    np = ShadowKernels.np
+    occupied = ShadowKernels.occupancy_mask(occupancy)
+    field, lit = ShadowKernels.direct_lighting(occupied, scene.light_pos, scene.light_intensity)
+
+    # The reflection pass and painters still work on nested lists
+    intensity_matrix = field.tolist()
+    color_matrix = np.where(lit, hex_to_int(scene.light_color), 0).tolist()
+    return intensity_matrix, color_matrix
+
+
+def direct_lighting_lit(scene, lit):
+    """Direct lighting pass from per-cell lit flags (index y*width + x)"""
+    width, height = scene.grid_width, scene.grid_height
+    lx, ly = scene.light_pos
+    light_rgb = hex_to_int(scene.light_color)
+
+    intensity_matrix = []
+    color_matrix = []
+    for y in range(height):
+        intensity_row = [0] * width
+        color_row = [0] * width
+        for x in range(width):
+            if not lit[y * width + x]:
+                continue
+            # Mark light source
+            if x == lx and y == ly:
+                intensity_row[x] = scene.light_intensity * 2
+            else:
+                distance = max(math.sqrt((x - lx) ** 2 + (y - ly) ** 2), 1)
+                intensity_row[x] = min(scene.light_intensity / (distance * 0.5), scene.light_intensity)
+            color_row[x] = light_rgb
+        intensity_matrix.append(intensity_row)
+        color_matrix.append(color_row)
+
+    return intensity_matrix, color_matrix
+
+
+def direct_lighting_table(scene, occupancy):
+    """Direct lighting pass using the precomputed ray-path table"""
+    lit = RayTable.get_table(scene.grid_height, scene.grid_width).lit_flags(occupancy.cells, scene.light_pos)
+    return direct_lighting_lit(scene, lit)
+
+
+def direct_lighting_analytic(scene, occupancy, index):
+    """Direct lighting pass with exact shadow tests against a ShapeIndex"""
+    return direct_lighting_lit(scene, index.lit_flags(occupancy.cells, scene.grid_width, scene.grid_height,
+                                                      scene.light_pos))
+
+
+def direct_lighting_sdf(scene, occupancy):
+    """Direct lighting pass with shadow rays sphere-traced through a distance field"""
+    return direct_lighting_lit(scene, DistanceField.lit_flags(occupancy.cells, scene.grid_width, scene.grid_height,
+                                                              scene.light_pos))
+
+
+def rasterize_circle(scene):
+    """Flat cell indices and reflective edge cells of the circle"""
+    if scene.circle_center is None:
+        return (), frozenset()
+    cx, cy = scene.circle_center
+    radius = scene.circle_radius
+    cells = []
+    reflective = set()
+    # Only visit the box of cells near the circle center
+    reach = int(radius * 2) + 1
+    for y in range(max(0, int(cy) - reach), min(scene.grid_height, int(cy) + reach + 1)):
+        for x in range(max(0, int(cx) - reach), min(scene.grid_width, int(cx) + reach + 1)):
+            # Skip if far from circle center for performance
+            if abs(x - cx) > radius * 2 or abs(y - cy) > radius * 2:
+                continue
+
+            # Calculate distance with aspect ratio correction
+            # We use cell_width/cell_height ratio to correct the aspect ratio
+            aspect_ratio = scene.cell_width / scene.cell_height
+            dx = x - cx
+            dy = (y - cy) / aspect_ratio
+            distance = math.sqrt(dx * dx + dy * dy)
+
+            if distance <= radius:
+                cells.append(y * scene.grid_width + x)
+
+                # Mark circle edge as reflective
+                if radius - 0.5 <= distance <= radius:
+                    # Calculate normal vector (pointing outward from center)
+                    nx = dx / distance if distance > 0 else 0
+                    ny = dy / distance if distance > 0 else 0
+                    reflective.add((x, y, nx, ny))
+
+    return tuple(cells), frozenset(reflective)
+
+
+def square_height(scene):
+    """Vertical size of the square in cells, so it looks square on screen"""
+    return int(scene.square_size * scene.cell_height / scene.cell_width)
+
+
+def rasterize_square(scene):
+    """Flat cell indices and reflective edge cells of the square"""
+    if scene.square_pos is None:
+        return (), frozenset()
+    sx, sy = scene.square_pos
+    size_x = scene.square_size  # Horizontal size
+    size_y = square_height(scene)  # Adjusted vertical size
+    cells = []
+    reflective = set()
+    for y in range(max(0, sy), min(scene.grid_height, sy + size_y)):
+        for x in range(max(0, sx), min(scene.grid_width, sx + size_x)):
+            cells.append(y * scene.grid_width + x)
+
+            # Mark square edges as reflective
+            if scene.enable_reflections:
+                # Left edge
+                if x == sx:
+                    reflective.add((x, y, -1, 0))
+                # Right edge
+                elif x == sx + size_x - 1:
+                    reflective.add((x, y, 1, 0))
+                # Top edge
+                elif y == sy:
+                    reflective.add((x, y, 0, -1))
+                # Bottom edge
+                elif y == sy + size_y - 1:
+                    reflective.add((x, y, 0, 1))
+
+    return tuple(cells), frozenset(reflective)
+
+
+def rasterize_shapes(scene):
+    """Flat cell indices of each extra occluder, in order"""
+    return tuple(shape_cells(shape, scene.grid_width, scene.grid_height) for shape in scene.shapes)
+
+
+def edge_lit(occupied, width, height, light_pos, ref_x, ref_y):
+    """Whether the light reaches an edge cell, marching the ray from the light past other occupied cells"""
+    lx, ly = light_pos
+    # Vector from light to reflective surface
+    ldx = ref_x - lx
+    ldy = ref_y - ly
+    light_distance = math.sqrt(ldx * ldx + ldy * ldy)
+    if light_distance == 0:
+        return False
+
+    # Normalize
+    ldx /= light_distance
+    ldy /= light_distance
+
+    # Cast ray from light to reflective surface
+    for t in range(1, int(light_distance)):
+        rx = int(lx + ldx * t)
+        ry = int(ly + ldy * t)
+
+        if 0 <= rx < width and 0 <= ry < height:
+            if occupied[ry * width + rx] and (rx != ref_x or ry != ref_y):
+                return False
+    return True
+
+
+def reflection_samples(scene, occupancy, reflective_objects, light=None, rng=None):
+    """
+    List of (x, y, falloff, packed color) for every cell a reflected ray adds light to.
+
+    All edge cells are processed as one batch: their rays to the light,
+    then their reflected rays, are marched together (with NumPy when it
+    is installed; the results are the same without it). Diffusion draws
+    two numbers per lit edge cell from rng, a random.Random, in sorted
+    edge order, so the same seed always gives the same samples; without
+    rng one is seeded from scene.reflection_seed.
+    """
+    width, height = scene.grid_width, scene.grid_height
+    occupied = occupancy.cells
+    (lx, ly), light_intensity, light_color = (light or scene.lights[0])[:3]
+    light_rgb = hex_to_int(light_color)
+    if rng is None:
+        rng = random.Random(scene.reflection_seed)
+
+    edges = sorted(reflective_objects)
+    if not edges:
+        return []
+    use_numpy = ShadowKernels.HAS_NUMPY
+    if use_numpy:
+        np = ShadowKernels.np
+        mask = ShadowKernels.occupancy_mask(occupancy)
+        lit = ShadowKernels.edges_lit(mask, (lx, ly), np.array([edge[0] for edge in edges]),
+                                      np.array([edge[1] for edge in edges])).tolist()
+    else:
+        lit = [edge_lit(occupied, width, height, (lx, ly), edge[0], edge[1]) for edge in edges]
+
+    # Direction, strength and color of the ray reflected off each lit edge cell
+    rays = []
+    mixed_colors = {}
+    for (ref_x, ref_y, normal_x, normal_y), receives_direct_light in zip(edges, lit):
+        if not receives_direct_light:
+            continue
+
+        # Mix the light with the color of the reflective object
+        reflection_color = occupancy.color_at(ref_x, ref_y, "#FFFFFF")
+        mixed_color = mixed_colors.get(reflection_color)
+        if mixed_color is None:
+            mixed_color = mixed_colors[reflection_color] = mix_rgb(light_rgb, hex_to_int(reflection_color), 0.7)
+
+        # Calculate reflection vector (from surface to light)
+        incoming_x = lx - ref_x
+        incoming_y = ly - ref_y
+
+        # Normalize incoming vector
+        light_distance = math.sqrt(incoming_x ** 2 + incoming_y ** 2)
+        incoming_x /= light_distance
+        incoming_y /= light_distance
+
+        # Calculate reflection
+        dot_product = normal_x * incoming_x + normal_y * incoming_y
+        reflected_x = 2 * dot_product * normal_x - incoming_x
+        reflected_y = 2 * dot_product * normal_y - incoming_y
+
+        # Add diffusion
+        reflected_x += (rng.random() - 0.5) * scene.diffusion_amount
+        reflected_y += (rng.random() - 0.5) * scene.diffusion_amount
+
+        # Normalize
+        ref_len = math.sqrt(reflected_x ** 2 + reflected_y ** 2)
+        if ref_len > 0:
+            reflected_x /= ref_len
+            reflected_y /= ref_len
+
+        reflection_intensity = light_intensity * 0.4
+        reflection_intensity /= (light_distance * 0.1)
+        rays.append((ref_x, ref_y, reflected_x, reflected_y, reflection_intensity, mixed_color))
+
+    # Cast the reflected rays, attenuating with distance
+    samples = []
+    if use_numpy and rays:
+        columns = list(zip(*rays))
+        rx, ry, valid = ShadowKernels.reflected_runs(mask, np.array(columns[0]), np.array(columns[1]),
+                                                     np.array(columns[2]), np.array(columns[3]),
+                                                     MAX_REFLECTION_DISTANCE)
+        ray_index, step = np.nonzero(valid)
+        for k, t, x, y in zip(ray_index.tolist(), (step + 1).tolist(), rx[valid].tolist(), ry[valid].tolist()):
+            samples.append((x, y, rays[k][4] / (t * 0.5), rays[k][5]))
+    else:
+        for ref_x, ref_y, reflected_x, reflected_y, reflection_intensity, mixed_color in rays:
+            for t in range(1, MAX_REFLECTION_DISTANCE):
+                rx = int(ref_x + reflected_x * t)
+                ry = int(ref_y + reflected_y * t)
+
+                if 0 <= rx < width and 0 <= ry < height:
+                    if occupied[ry * width + rx]:
+                        break
+                    samples.append((rx, ry, reflection_intensity / (t * 0.5), mixed_color))
+    return samples
+
+
+def blend_reflections(intensity_matrix, color_matrix, samples, x0=0, y0=0):
+    """
+    Add reflection samples into the buffers in place; the buffers start at cell (x0, y0).
+
+    Each cell's color becomes the intensity-weighted average of its
+    direct color and every reflected color reaching it, summed per
+    channel and rounded once, so the result does not depend on how the
+    samples are grouped.
+    """
+    totals = {}
+    for x, y, falloff, rgb in samples:
+        total = totals.get((x, y))
+        if total is None:
+            total = totals[(x, y)] = [0.0, 0.0, 0.0, 0.0]
+        total[0] += falloff
+        total[1] += falloff * (rgb >> 16)
+        total[2] += falloff * (rgb >> 8 & 0xFF)
+        total[3] += falloff * (rgb & 0xFF)
+
+    for (x, y), (added, red, green, blue) in totals.items():
+        intensity_row = intensity_matrix[y - y0]
+        color_row = color_matrix[y - y0]
+        existing = intensity_row[x - x0]
+        intensity = existing + added
+        intensity_row[x - x0] = intensity
+        if intensity > 0:
+            weight = existing if existing > 0 else 0
+            rgb = color_row[x - x0]
+            r = int((weight * (rgb >> 16) + red) / intensity + 0.5)
+            g = int((weight * (rgb >> 8 & 0xFF) + green) / intensity + 0.5)
+            b = int((weight * (rgb & 0xFF) + blue) / intensity + 0.5)
+            color_row[x - x0] = r << 16 | g << 8 | b
+
+
+def add_reflections(scene, occupancy, reflective_objects, intensity_matrix, color_matrix, light=None, rng=None):
+    """Add light bounced off reflective edge cells into the buffers, in place"""
+    samples = reflection_samples(scene, occupancy, reflective_objects, light, rng)
+    blend_reflections(intensity_matrix, color_matrix, samples)
+
+
+def accumulate_lights(scene, fields):
+    """Sum per-light fields into intensity and color buffers, weighting colors by intensity"""
+    width = scene.grid_width
+    size = width * scene.grid_height
+    total = [0.0] * size
+    red = [0.0] * size
+    green = [0.0] * size
+    blue = [0.0] * size
+
+    for light, field in zip(scene.lights, fields):
+        rgb = hex_to_int(light.color)
+        r, g, b = rgb >> 16, rgb >> 8 & 0xFF, rgb & 0xFF
+        for index, value in enumerate(field):
+            if value > 0:
+                total[index] += value
+                red[index] += value * r
+                green[index] += value * g
+                blue[index] += value * b
+
+    intensity_matrix = []
+    color_matrix = []
+    for start in range(0, size, width):
+        intensity_matrix.append(total[start:start + width])
+        color_row = []
+        for index in range(start, start + width):
+            value = total[index]
+            if value > 0:
+                r = int(red[index] / value + 0.5)
+                g = int(green[index] / value + 0.5)
+                b = int(blue[index] / value + 0.5)
+                color_row.append(r << 16 | g << 8 | b)
+            else:
+                color_row.append(0)
+        color_matrix.append(color_row)
+    return intensity_matrix, color_matrix
+
+
+def coarse_scene(scene, factor):
+    """
+    The scene on a grid factor times coarser, for previews.
+
+    Coarse cell (X, Y) stands for the full cells X*factor .. X*factor +
+    factor - 1 on each axis. Light intensities are divided by factor, so
+    the direct falloff over coarse distances equals the full grid's
+    beyond the light's own block and its neighbors, where the falloff
+    is capped.
+    """
+    def coarse(value):
+        # Full-grid coordinate in coarse cells, matching block centers
+        return (value - (factor - 1) / 2) / factor
+
+    def coarse_cell(point):
+        return int(point[0]) // factor, int(point[1]) // factor
+
+    shapes = []
+    for shape in scene.shapes:
+        if isinstance(shape, Ellipse):
+            shape = Ellipse(coarse(shape.cx), coarse(shape.cy), shape.rx / factor, shape.ry / factor, shape.color)
+        elif isinstance(shape, Rect):
+            shape = Rect(coarse(shape.x0), coarse(shape.y0), coarse(shape.x1), coarse(shape.y1), shape.color)
+        elif isinstance(shape, Polygon):
+            shape = Polygon([(coarse(x), coarse(y)) for x, y in shape.points], shape.color)
+        shapes.append(shape)
+
+    return Scene(
+        grid_width=-(-scene.grid_width // factor),
+        grid_height=-(-scene.grid_height // factor),
+        cell_width=scene.cell_width * factor,
+        cell_height=scene.cell_height * factor,
+        circle_center=None if scene.circle_center is None else (coarse(scene.circle_center[0]),
+                                                                coarse(scene.circle_center[1])),
+        circle_radius=scene.circle_radius / factor,
+        circle_color=scene.circle_color,
+        square_pos=None if scene.square_pos is None else coarse_cell(scene.square_pos),
+        square_size=max(1, round(scene.square_size / factor)),
+        square_color=scene.square_color,
+        lights=[(coarse_cell(light.pos), light.intensity / factor, light.color, light.radius / factor)
+                for light in scene.lights],
+        shapes=shapes,
+        enable_reflections=scene.enable_reflections,
+        diffusion_amount=scene.diffusion_amount,
+        reflection_seed=scene.reflection_seed,
+        lighting_engine=scene.lighting_engine,
+        incremental_shadows=scene.incremental_shadows,
+        shadow_samples=scene.shadow_samples,
+        timing=scene.timing,
+    )
+
+
+def upsample_rows(rows, factor, width, height):
+    """Repeat every value of coarse rows over a factor x factor block, cropped to width x height"""
+    upsampled = []
+    for y in range(height):
+        if y % factor == 0:
+            row = [value for value in rows[y // factor] for _ in range(factor)][:width]
+            upsampled.append(row)
+        else:
+            upsampled.append(row[:])
+    return upsampled
+
+
+class Renderer:
+    def __init__(self, workers=1, frame_cache=None):
+        # Rasterized occluders and the last direct-lighting pass, reused across frames
+        self.raster_cache = {}
+        self.direct_cache = None
+        self.direct_update = ("full", 0)  # How the last direct pass ran, and cells recomputed
+
+        # Per-light fields of multi-light scenes; workers=None uses every CPU
+        self.light_pool = LightPool(workers)
+        # Shadow rays cast for disc lights in the last frame
+        self.soft_shadow_stats = SoftShadows.NO_STATS
+        # One Renderer per preview factor, so previews keep their own caches
+        self.preview_renderers = {}
+        # Finished frames by scene state (a FrameCache.FrameCache), or None to light every scene
+        self.frame_cache = frame_cache
+
+    def close(self):
+        """Stop any light workers"""
+        self.light_pool.close()
+        for renderer in self.preview_renderers.values():
+            renderer.close()
+
+    def rasterize(self, kind, scene):
+        """Rasterized circle, square or extra shapes of a scene, cached by position"""
+        if kind == "circle":
+            key = ("circle", scene.circle_center, scene.circle_radius, scene.cell_width, scene.cell_height,
+                   scene.grid_width, scene.grid_height)
+            rasterize = rasterize_circle
+        elif kind == "square":
+            key = ("square", scene.square_pos, scene.square_size, square_height(scene), scene.enable_reflections,
+                   scene.grid_width, scene.grid_height)
+            rasterize = rasterize_square
+        else:
+            # All extra occluders share one entry, so hundreds of them cannot flush the cache
+            key = ("shapes", scene.shapes, scene.grid_width, scene.grid_height)
+            rasterize = rasterize_shapes
+
+        raster = self.raster_cache.get(key)
+        if raster is None:
+            if len(self.raster_cache) >= MAX_CACHED_RASTERS:
+                self.raster_cache.clear()
+            raster = self.raster_cache[key] = rasterize(scene)
+        return raster
+
+    def direct_lighting(self, scene, occupancy):
+        """
+        Direct lighting pass with the scene's engine.
+
+        When only occluders changed since the last frame, just the shadow
+        wedge behind the changed cells is recomputed; everything else is
+        reused from the previous frame. The analytic engine always runs a
+        full pass, since its shadows do not follow the cell wedge.
+        """
+        engine = ShadowKernels.resolve_engine(scene.lighting_engine)
+        lx, ly = scene.light_pos
+        key = (engine, lx, ly, scene.light_intensity, scene.light_color, scene.grid_width, scene.grid_height)
+
+        cells = None
+        if (engine != "analytic" and scene.incremental_shadows and self.direct_cache is not None
+                and self.direct_cache[0] == key):
+            changed = occupancy.changed_cells(self.direct_cache[1])
+            cells = ShadowWedge.affected_cells(changed, (lx, ly), scene.grid_width, scene.grid_height)
+
+        if cells is not None:
+            intensity_matrix, color_matrix = self.direct_cache[2], self.direct_cache[3]
+            light_rgb = hex_to_int(scene.light_color)
+            for x, y in cells:
+                intensity_matrix[y][x], color_matrix[y][x] = direct_light_at(scene, occupancy, x, y, light_rgb)
+            self.direct_update = ("incremental", len(cells))
+        else:
+            if engine == "numpy":
+                intensity_matrix, color_matrix = direct_lighting_numpy(scene, occupancy)
+            elif engine == "table":
+                intensity_matrix, color_matrix = direct_lighting_table(scene, occupancy)
+            elif engine == "sdf":
+                intensity_matrix, color_matrix = direct_lighting_sdf(scene, occupancy)
+            elif engine == "analytic":
+                intensity_matrix, color_matrix = direct_lighting_analytic(scene, occupancy,
+                                                                          ShapeIndex(scene_shapes(scene)))
+            else:
+                intensity_matrix, color_matrix = direct_lighting_python(scene, occupancy)
+            self.direct_update = ("full", scene.grid_width * scene.grid_height)
+
+        self.direct_cache = (key, bytes(occupancy.cells), intensity_matrix, color_matrix)
+
+        # The reflection pass writes into its matrices, so hand it copies
+        return [row[:] for row in intensity_matrix], [row[:] for row in color_matrix]
+
+    def multi_light_lighting(self, scene, occupancy):
+        """
+        Direct lighting from several lights, one independent field per light.
+
+        Point lights go through the light pool; disc lights get adaptively
+        sampled soft shadows, computed in this process.
+        """
+        engine = ShadowKernels.resolve_engine(scene.lighting_engine)
+        shapes = scene_shapes(scene) if engine == "analytic" else None
+        point_lights = [light for light in scene.lights if not light.radius]
+        point_fields = iter(self.light_pool.fields(occupancy.cells, scene.grid_width, scene.grid_height, point_lights,
+                                                   engine, shapes))
+        fields = []
+        stats = SoftShadows.NO_STATS
+        for light in scene.lights:
+            if light.radius:
+                field, light_stats = SoftShadows.area_light_field(occupancy.cells, scene.grid_width,
+                                                                  scene.grid_height, light, scene.shadow_samples)
+                fields.append(field)
+                stats += light_stats
+            else:
+                fields.append(next(point_fields))
+        self.soft_shadow_stats = stats
+
+        # Nothing to update incrementally from next frame
+        self.direct_cache = None
+        self.direct_update = ("full", scene.grid_width * scene.grid_height * len(scene.lights))
+        return accumulate_lights(scene, fields)
+
+    def occupancy(self, scene):
+        """OccupancyGrid of a scene's occluders and their reflective edge cells"""
+        # Occluders are rasterized once per position and reused
+        circle_cells, circle_reflective = self.rasterize("circle", scene)
+        square_cells, square_reflective = self.rasterize("square", scene)
+
+        # Track objects (with their color as material) and reflective surfaces
+        occupancy = OccupancyGrid(scene.grid_width, scene.grid_height)
+        occupancy.fill_indices(circle_cells, occupancy.material(scene.circle_color))
+        occupancy.fill_indices(square_cells, occupancy.material(scene.square_color))
+        for shape, cells in zip(scene.shapes, self.rasterize("shapes", scene)):
+            occupancy.fill_indices(cells, occupancy.material(shape.color))
+        return occupancy, circle_reflective | square_reflective
+
+    def render_preview(self, scene):
+        """
+        Light a scene on its coarse grid and scale the result up to a full-size Frame.
+
+        The occupancy is rasterized at full resolution, so objects stay
+        sharp; only the light and shadows are blocky.
+        """
+        factor = scene.downsample
+        renderer = self.preview_renderers.get(factor)
+        if renderer is None:
+            renderer = self.preview_renderers[factor] = Renderer()
+        # The coarse render times its own stages into the same record
+        coarse = renderer.render(coarse_scene(scene, factor))
+        self.soft_shadow_stats = renderer.soft_shadow_stats
+
+        timing = scene.timing
+        occupancy, _ = self.occupancy(scene)
+        if timing is not None:
+            timing.lap("rasterize")
+        width, height = scene.grid_width, scene.grid_height
+        frame = Frame(occupancy, upsample_rows(coarse.intensity, factor, width, height),
+                      upsample_rows(coarse.color, factor, width, height))
+        if timing is not None:
+            # Scaling the light up is part of the preview's shadow pass
+            timing.lap("shadows")
+        return frame
+
+    def render(self, scene):
+        """Light a scene and return its Frame, from the frame cache when the same scene was lit before"""
+        if self.frame_cache is None:
+            return self.render_uncached(scene)
+        timing = scene.timing
+        if timing is not None:
+            timing.restart()
+        key = scene_key(scene)
+        cached = self.frame_cache.get(key)
+        if cached is not None:
+            occupancy, intensity_matrix, color_matrix, stats = cached
+            # The rays this frame took when it was lit
+            self.soft_shadow_stats = stats
+            if timing is not None:
+                timing.cached = True
+                timing.lap("cache")
+            return Frame(occupancy, intensity_matrix, color_matrix)
+        if timing is not None:
+            timing.lap("cache")
+        frame = self.render_uncached(scene)
+        self.frame_cache.put(key, *frame, self.soft_shadow_stats)
+        if timing is not None:
+            # Storing the frame counts as cache time too
+            timing.lap("cache")
+        return frame
+
+    def render_uncached(self, scene):
+        """Light a scene and return its Frame"""
+        if scene.downsample > 1:
+            return self.render_preview(scene)
+        timing = scene.timing
+        if timing is not None:
+            timing.restart()
+        occupancy, reflective_objects = self.occupancy(scene)
+        if timing is not None:
+            timing.lap("rasterize")
+
+        # Direct lighting
+        if len(scene.lights) == 1 and not scene.light_radius:
+            self.soft_shadow_stats = SoftShadows.NO_STATS
+            intensity_matrix, color_matrix = self.direct_lighting(scene, occupancy)
+        else:
+            intensity_matrix, color_matrix = self.multi_light_lighting(scene, occupancy)
+        if timing is not None:
+            timing.lap("shadows")
+
+        # Calculate reflections for every light, with one seeded generator per frame
+        if scene.enable_reflections:
+            rng = random.Random(scene.reflection_seed)
+            samples = []
+            for light in scene.lights:
+                samples.extend(reflection_samples(scene, occupancy, reflective_objects, light, rng))
+            blend_reflections(intensity_matrix, color_matrix, samples)
+        if timing is not None:
+            timing.lap("reflections")
+
+        return Frame(occupancy, intensity_matrix, color_matrix)
+
+
+_default_renderer = Renderer()
+
+
+def render(scene):
+    """Light a scene with the shared module Renderer and return its Frame"""
+    return _default_renderer.render(scene)
+
+
+def shade_rgb(scene, frame, levels=BRIGHTNESS_LEVELS):
+    """
+    Shade a frame into RGB bytes (3 per cell, row-major), as the canvas paints it.
+
+    Objects keep their color, the first light's cell its color, cells at
+    or below 0.1 intensity are black, and the rest are scaled by
+    brightness quantized to levels steps.
+    """
+    width = scene.grid_width
+    lx, ly = scene.light_pos
+    light_rgb = hex_to_int(scene.light_color)
+    occupancy = frame.occupancy
+    occupied = occupancy.cells
+    materials = [0 if color is None else hex_to_int(color) for color in occupancy.palette]
+    step = 1 / (levels - 1)
+    scale = (levels - 1) / scene.light_intensity
+    top = levels - 1
+    shaded = {}
+
+    rgb = bytearray(3 * width * scene.grid_height)
+    index = 0
+    for y, (intensity_row, color_row) in enumerate(zip(frame.intensity, frame.color)):
+        for x in range(width):
+            cell = y * width + x
+            if occupied[cell]:
+                color = materials[occupancy.materials[cell]] if occupancy.materials[cell] else 0xFFFFFF
+            elif x == lx and y == ly:
+                color = light_rgb
+            else:
+                intensity = intensity_row[x]
+                if intensity <= 0.1:
+                    color = 0
+                else:
+                    key = (color_row[x], min(int(intensity * scale + 0.5), top))
+                    color = shaded.get(key)
+                    if color is None:
+                        color = shaded[key] = scale_rgb(key[0], key[1] * step)
+            rgb[index] = color >> 16
+            rgb[index + 1] = color >> 8 & 0xFF
+            rgb[index + 2] = color & 0xFF
+            index += 3
+    return rgb
+
+
+def matrix_shapes(circle_center=None, circle_radius=6, square_pos=None, square_size=5, shapes=None):
+    """The occluders of createMatrix as analytic shapes"""
+    matrix_objects = []
+    if circle_center:
+        cx, cy = circle_center
+        # Circles are stretched 2x horizontally
+        matrix_objects.append(Ellipse(cx, cy, circle_radius * 2.0, circle_radius))
+    if square_pos:
+        # The square covers whole cells, so its edges sit half a cell beyond the outer centers
+        sx, sy = square_pos
+        matrix_objects.append(Rect(sx - 0.5, sy - 0.5, sx + square_size * 2 - 0.5, sy + square_size - 0.5))
+    return matrix_objects + list(shapes or ())
+
+
+def createMatrixNumpy(r, c, circle_center=None, circle_radius=6, square_pos=None, square_size=5, light_pos=(1, 1),
+                      shapes=None):
+    # Same scene as createMatrix, computed with whole-array operations
+    np = ShadowKernels.np
+    rows, cols = r, c
+    occupied = np.zeros((rows, cols), dtype=bool)
+
+    if circle_center:
+        occupied |= ShadowKernels.ellipse_mask(rows, cols, circle_center, circle_radius, x_scale=2.0)
+
+    if square_pos:
+        occupied |= ShadowKernels.rect_mask(rows, cols, square_pos, square_size * 2, square_size)
+
+    flat = occupied.reshape(-1)
+    for shape in shapes or ():
+        flat[list(shape_cells(shape, cols, rows))] = True
+
+    shadow = ShadowKernels.shadow_mask(occupied, light_pos)
+    return ShadowKernels.shade_string(occupied, shadow, light_pos)
+
+
+def createMatrix(r, c, circle_center=None, circle_radius=6, square_pos=None, square_size=5, light_pos=(1, 1),
+                 engine="auto", method="raycast", shapes=None):
+    # engine: "numpy", "python", "table" (precomputed ray paths),
+    #         "sdf" (rays sphere-traced through a distance field),
+    #         "analytic" (exact tests against the shapes in a ShapeIndex)
+    #         or "auto" (NumPy when it is installed)
+    # method: "raycast" (one ray per cell) or "shadowcast" (octant sweep)
+    # shapes: extra ShapeIndex occluders (Ellipse, Rect)
+    Shadowcasting.check_method(method)
+    engine = ShadowKernels.resolve_engine(engine)
+    if method == "raycast" and engine == "numpy":
+        return createMatrixNumpy(r, c, circle_center, circle_radius, square_pos, square_size, light_pos, shapes)
+
+    # Create an r×c matrix and fill it with '█'
+    rows, cols = r, c
+    matrix = [[' ' for _ in range(cols)] for _ in range(rows)]
+
+    # Track occupied points for shadow calculation
+    objects = OccupancyGrid(cols, rows)
+    occupied = objects.cells
+
+    # Add a circle if center is provided
+    if circle_center:
+        cx, cy = circle_center
+        h_stretch = 2.0  # Horizontal stretch factor
+        # Only visit the circle's bounding box, clipped to the grid
+        for y in range(max(0, int(cy - circle_radius) - 1), min(rows, int(cy + circle_radius) + 2)):
+            for x in range(max(0, int(cx - circle_radius * h_stretch) - 1),
+                           min(cols, int(cx + circle_radius * h_stretch) + 2)):
+                # Calculate distance with horizontal stretching
+                distance = math.sqrt(((x - cx)/h_stretch)**2 + (y - cy)**2)
+                if distance <= circle_radius:
+                    matrix[y][x] = '.'
+                    objects.fill(x, y)
+
+    # Add a square if position is provided
+    if square_pos:
+        sx, sy = square_pos
+        h_stretch = 2  # Make the square wider
+        for y in range(max(0, sy), min(rows, sy + square_size)):
+            for x in range(max(0, sx), min(cols, sx + square_size * h_stretch)):
+                matrix[y][x] = '.'
+                objects.fill(x, y)
+
+    # Add any extra shapes
+    for shape in shapes or ():
+        for index in shape_cells(shape, cols, rows):
+            matrix[index // cols][index % cols] = '.'
+            occupied[index] = 1
+
+    # Shadowcasting visits each cell about once instead of one ray per cell
+    if method == "shadowcast":
+        return Shadowcasting.shade_matrix(matrix, Shadowcasting.lit_cells(rows, cols, occupied, light_pos), light_pos)
+
+    # Walk the precomputed ray paths for this grid size
+    if engine == "table":
+        lit = RayTable.get_table(rows, cols).lit_flags(occupied, light_pos)
+        return Shadowcasting.shade_matrix(matrix, lit, light_pos)
+
+    # Sphere-trace each shadow ray through a distance field of the occupancy
+    if engine == "sdf":
+        lit = DistanceField.lit_flags(occupied, cols, rows, light_pos)
+        return Shadowcasting.shade_matrix(matrix, lit, light_pos)
+
+    # Intersect each shadow ray with the nearby shapes only
+    if engine == "analytic":
+        index = ShapeIndex(matrix_shapes(circle_center, circle_radius, square_pos, square_size, shapes))
+        lit = index.lit_flags(occupied, cols, rows, light_pos)
+        return Shadowcasting.shade_matrix(matrix, lit, light_pos)
+
+    # Calculate shadows using simple ray casting
+    lx, ly = light_pos
+    # With the light on the grid every ray sample is too, so skip the bounds check
+    light_inside = 0 <= lx < cols and 0 <= ly < rows
+    for y in range(rows):
+        for x in range(cols):
+            # Skip if this is already an object
+            if occupied[y * cols + x]:
+                continue
+
+            # Skip the light source
+            if x == lx and y == ly:
+                matrix[y][x] = '*'  # Mark light source with *
+                continue
+
+            # Calculate direction from light to current point
+            dx = x - lx
+            dy = y - ly
+
+            # Check if this point is in shadow
+            in_shadow = False
+
+            # Normalize direction for ray casting
+            distance = math.sqrt(dx*dx + dy*dy)
+            if distance > 0:
+                dx, dy = dx/distance, dy/distance
+
+                # Cast ray from light to current position
+                for t in range(1, int(distance)):
+                    rx = int(lx + dx * t)
+                    ry = int(ly + dy * t)
+
+                    # Check if ray hit an object
+                    if (light_inside or (0 <= rx < cols and 0 <= ry < rows)) and occupied[ry * cols + rx]:
+                        in_shadow = True
+                        break
+
+            # Mark shadow points
+            if in_shadow:
+                matrix[y][x] = '▒'  # Medium shade for shadows
+            else:
+                matrix[y][x] = '█'  # Solid block for background
+
+    # Convert matrix to a string
+    matrix_str = '\n'.join(''.join(row) for row in matrix)
+
+    return matrix_str
@@ -0,0 +1,106 @@
+"""
+Background frame rendering for the Tk front ends.
+
+The Tk main thread submits an immutable snapshot of the scene and keeps
+handling input; a worker thread renders it into a back buffer. When a
+frame is complete it becomes the front buffer, and the Tk after
+callback takes it and paints it. Only the newest request and the newest
+finished frame are kept: a snapshot replaced before the worker reaches
+it, or a finished frame replaced before Tk paints it, is dropped.
+"""
+import threading
+
+
+class RenderThread:
+    def __init__(self, render, name="render"):
+        self.render = render  # Called on the worker thread as render(job)
+        self.name = name
+        self.frames_rendered = 0
+        self.frames_dropped = 0  # Stale requests skipped plus finished frames never painted
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pending = None  # (revision, job) waiting for the worker
+        self._front = None  # (revision, job, result) newest finished frame
+        self._busy = False
+        self._error = None
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, revision, job):
+        """Queue a job, replacing any job the worker has not started yet"""
+        with self._changed:
+            if self._pending is not None:
+                self.frames_dropped += 1
+            self._pending = (revision, job)
+            self._changed.notify_all()
+
+    def take(self, timeout=0):
+        """
+        Return the newest finished (revision, job, result), or None.
+
+        With a timeout, wait up to that many seconds for a frame while
+        work is queued or in progress; None waits indefinitely. An
+        exception raised by render is raised here.
+        """
+        with self._changed:
+            if timeout != 0:
+                self._changed.wait_for(
+                    lambda: (self._front is not None or self._error is not None or self._stopped
+                             or not (self._busy or self._pending)),
+                    timeout)
+            error, self._error = self._error, None
+            if error is not None:
+                raise error
+            frame, self._front = self._front, None
+            return frame
+
+    @property
+    def idle(self):
+        """Whether nothing is queued or rendering"""
+        with self._lock:
+            return self._pending is None and not self._busy
+
+    def stop(self, timeout=None):
+        """Stop the worker after its current frame"""
+        with self._changed:
+            self._stopped = True
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._pending is not None or self._stopped)
+                if self._stopped:
+                    return
+                revision, job = self._pending
+                self._pending = None
+                self._busy = True
+
+            error = None
+            try:
+                result = self.render(job)
+            except Exception as exc:
+                # Hand the failure to the thread calling take()
+                error, result = exc, None
+
+            with self._changed:
+                self._busy = False
+                if error is not None:
+                    self._error = error
+                else:
+                    if self._front is not None:
+                        self.frames_dropped += 1
+                    self._front = (revision, job, result)
+                    self.frames_rendered += 1
+                self._changed.notify_all()
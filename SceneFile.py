@@ -0,0 +1,83 @@
+"""
+JSON scene files with any number of shapes.
+
+A scene file is a JSON object of RenderCore.Scene settings plus an
+optional "shapes" list; coordinates and sizes are in cells:
+
+    {
+        "grid": [200, 140],
+        "lights": [{"pos": [20, 15], "intensity": 100, "color": "#FFF0C8", "radius": 2}],
+        "shapes": [
+            {"type": "circle", "center": [40, 15], "radius": 6, "color": "#00B000"},
+            {"type": "ellipse", "center": [90, 60], "radii": [8, 3]},
+            {"type": "rect", "pos": [70, 10], "size": [5, 6], "color": "#B00000"},
+            {"type": "polygon", "points": [[120, 20], [150, 35], [125, 50]]}
+        ]
+    }
+
+Each shape becomes a ShapeIndex shape and is rasterized only within its
+bounding box clipped to the grid, so setup cost follows the area the
+shapes cover. A file with "shapes" leaves out the Scene's built-in
+circle and square unless it sets circle_center or square_pos itself.
+"""
+import json
+
+import RenderCore
+from ShapeIndex import DEFAULT_COLOR, Ellipse, Polygon, Rect
+
+SHAPE_TYPES = ("circle", "ellipse", "rect", "polygon")
+
+
+def parse_shape(spec):
+    """ShapeIndex shape described by one entry of a scene file's "shapes" list"""
+    kind = spec.get("type")
+    color = spec.get("color", DEFAULT_COLOR)
+    try:
+        if kind == "circle":
+            (cx, cy), radius = spec["center"], spec["radius"]
+            return Ellipse(cx, cy, radius, radius, color)
+        if kind == "ellipse":
+            (cx, cy), (rx, ry) = spec["center"], spec["radii"]
+            return Ellipse(cx, cy, rx, ry, color)
+        if kind == "rect":
+            (x, y), (width, height) = spec["pos"], spec["size"]
+            # Covers cells x .. x + width - 1, so the edges sit half a cell beyond their centers
+            return Rect(x - 0.5, y - 0.5, x + width - 0.5, y + height - 0.5, color)
+        if kind == "polygon":
+            return Polygon(spec["points"], color)
+    except KeyError as missing:
+        raise ValueError(f"{kind} shape is missing {missing}") from None
+    raise ValueError(f"Unknown shape type: {kind!r} (expected one of {', '.join(SHAPE_TYPES)})")
+
+
+def parse_light(spec):
+    """(pos, intensity, color, radius) of a light given as an object or a list"""
+    if isinstance(spec, dict):
+        return tuple(spec["pos"]), spec.get("intensity", 100), spec.get("color", "#FFF0C8"), spec.get("radius", 0)
+    pos, intensity, color, *radius = spec
+    return (tuple(pos), intensity, color) + tuple(radius[:1])
+
+
+def scene_settings(data):
+    """Scene keyword settings from a parsed scene file"""
+    settings = dict(data)
+    if "grid" in settings:
+        settings["grid_width"], settings["grid_height"] = settings.pop("grid")
+    if "lights" in settings:
+        settings["lights"] = [parse_light(light) for light in settings["lights"]]
+    if "shapes" in settings:
+        settings["shapes"] = tuple(parse_shape(shape) for shape in settings["shapes"])
+        settings.setdefault("circle_center", None)
+        settings.setdefault("square_pos", None)
+    return settings
+
+
+def load_settings(path):
+    """Scene keyword settings from a scene file"""
+    with open(path, encoding="utf-8") as fh:
+        return scene_settings(json.load(fh))
+
+
+def load_scene(path):
+    """Scene described by a scene file"""
+    return RenderCore.Scene(**load_settings(path))
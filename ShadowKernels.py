@@ -0,0 +1,212 @@
+"""
+Array-based shadow kernels shared by the ray casters.
+
+NumPy is optional: when it is missing HAS_NUMPY is False and callers
+fall back to their pure Python loops.
+"""
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without NumPy
+    np = None
+
+HAS_NUMPY = np is not None
+
+# Shade characters used by the ASCII renderers
+LIT_CHAR = '█'
+SHADOW_CHAR = '▒'
+OBJECT_CHAR = '.'
+LIGHT_CHAR = '*'
+
+
+def require_numpy():
+    """Raise ImportError if NumPy is not available"""
+    if not HAS_NUMPY:
+        raise ImportError("NumPy is required for the numpy engine")
+
+
+def resolve_engine(engine):
+    """Map 'auto' to the fastest available engine and validate the name"""
+    if engine == "auto":
+        return "numpy" if HAS_NUMPY else "python"
+    if engine not in ("numpy", "python", "table", "analytic", "sdf"):
+        raise ValueError(f"Unknown engine: {engine!r}")
+    if engine == "numpy":
+        require_numpy()
+    return engine
+
+
+def ellipse_mask(rows, cols, center, radius, x_scale=1.0, y_scale=1.0):
+    """Boolean mask of cells within radius of center after axis scaling"""
+    cx, cy = center
+    ys, xs = np.ogrid[0:rows, 0:cols]
+    dx = (xs - cx) / x_scale
+    dy = (ys - cy) / y_scale
+    return np.sqrt(dx ** 2 + dy ** 2) <= radius
+
+
+def rect_mask(rows, cols, pos, width, height):
+    """Boolean mask of an axis-aligned rectangle clipped to the grid"""
+    mask = np.zeros((rows, cols), dtype=bool)
+    sx, sy = pos
+    mask[max(0, sy):max(0, min(rows, sy + height)), max(0, sx):max(0, min(cols, sx + width))] = True
+    return mask
+
+
+def occupancy_mask(occupancy):
+    """Boolean (height, width) view of an OccupancyGrid"""
+    cells = np.frombuffer(occupancy.cells, dtype=np.uint8)
+    return cells.reshape(occupancy.height, occupancy.width).astype(bool)
+
+
+def shadow_mask(occupied, light_pos):
+    """
+    Mark every cell whose ray from the light hits an occupied cell.
+
+    Reproduces the per-cell march used by the Python loops exactly:
+    the ray is sampled at t = 1 .. int(distance) - 1 and each sample is
+    truncated towards zero, so the results match cell for cell.
+    """
+    rows, cols = occupied.shape
+    lx, ly = light_pos
+    flat_occupied = occupied.ravel()
+
+    ys, xs = np.indices((rows, cols))
+    dx = (xs - lx).ravel()
+    dy = (ys - ly).ravel()
+    distance = np.sqrt(dx * dx + dy * dy)
+    steps = distance.astype(np.int64)
+
+    shadow = np.zeros(rows * cols, dtype=bool)
+
+    # Only cells that need at least one ray sample take part in the march
+    idx = np.flatnonzero(~flat_occupied & (steps > 1))
+    if idx.size == 0:
+        return shadow.reshape(rows, cols)
+    ux = dx[idx] / distance[idx]
+    uy = dy[idx] / distance[idx]
+    steps = steps[idx]
+
+    for t in range(1, int(steps.max())):
+        # Drop rays that have reached their target
+        live = steps > t
+        if not live.all():
+            idx, ux, uy, steps = idx[live], ux[live], uy[live], steps[live]
+            if idx.size == 0:
+                break
+
+        rx = (lx + ux * t).astype(np.intp)
+        ry = (ly + uy * t).astype(np.intp)
+        inside = (rx >= 0) & (rx < cols) & (ry >= 0) & (ry < rows)
+        hit = np.zeros(idx.size, dtype=bool)
+        hit[inside] = flat_occupied[ry[inside] * cols + rx[inside]]
+
+        if hit.any():
+            shadow[idx[hit]] = True
+            miss = ~hit
+            idx, ux, uy, steps = idx[miss], ux[miss], uy[miss], steps[miss]
+
+    return shadow.reshape(rows, cols)
+
+
+def edges_lit(occupied, light_pos, xs, ys):
+    """
+    Whether the light reaches each edge cell (xs[k], ys[k]), marching all their rays at once.
+
+    Reproduces RenderCore.edge_lit exactly: samples on the edge cell
+    itself do not block, and the light's own cell is never lit.
+    """
+    rows, cols = occupied.shape
+    flat_occupied = occupied.ravel()
+    lx, ly = light_pos
+    dx = (xs - lx).astype(np.float64)
+    dy = (ys - ly).astype(np.float64)
+    distance = np.sqrt(dx * dx + dy * dy)
+    lit = distance > 0
+    steps = distance.astype(np.int64)
+
+    idx = np.flatnonzero(lit & (steps > 1))
+    if idx.size == 0:
+        return lit
+    ux = dx[idx] / distance[idx]
+    uy = dy[idx] / distance[idx]
+    steps = steps[idx]
+
+    for t in range(1, int(steps.max())):
+        live = steps > t
+        if not live.all():
+            idx, ux, uy, steps = idx[live], ux[live], uy[live], steps[live]
+            if idx.size == 0:
+                break
+
+        rx = (lx + ux * t).astype(np.intp)
+        ry = (ly + uy * t).astype(np.intp)
+        inside = (rx >= 0) & (rx < cols) & (ry >= 0) & (ry < rows)
+        hit = np.zeros(idx.size, dtype=bool)
+        hit[inside] = flat_occupied[ry[inside] * cols + rx[inside]]
+        hit &= (rx != xs[idx]) | (ry != ys[idx])
+
+        if hit.any():
+            lit[idx[hit]] = False
+            miss = ~hit
+            idx, ux, uy, steps = idx[miss], ux[miss], uy[miss], steps[miss]
+    return lit
+
+
+def reflected_runs(occupied, xs, ys, dir_x, dir_y, steps):
+    """
+    Cells sampled by rays from (xs[k], ys[k]) along (dir_x[k], dir_y[k]) at t = 1 .. steps - 1.
+
+    Returns (rx, ry, valid), each of shape (rays, steps - 1); valid marks
+    samples on the grid before the ray's first occupied cell.
+    """
+    rows, cols = occupied.shape
+    t = np.arange(1, steps)
+    rx = (xs[:, None] + dir_x[:, None] * t).astype(np.intp)
+    ry = (ys[:, None] + dir_y[:, None] * t).astype(np.intp)
+    inside = (rx >= 0) & (rx < cols) & (ry >= 0) & (ry < rows)
+    hit = np.zeros(rx.shape, dtype=bool)
+    hit[inside] = occupied.ravel()[ry[inside] * cols + rx[inside]]
+    # Everything from the first hit on is blocked
+    blocked = np.cumsum(hit, axis=1) > 0
+    return rx, ry, inside & ~blocked
+
+
+def falloff_field(rows, cols, light_pos, intensity):
+    """Inverse-distance falloff from the light, clamped to intensity (float32)"""
+    lx, ly = light_pos
+    ys, xs = np.ogrid[0:rows, 0:cols]
+    distance = np.sqrt(((xs - lx) ** 2 + (ys - ly) ** 2).astype(np.float32))
+    np.maximum(distance, 1, out=distance)
+    peak = np.float32(intensity)
+    return np.minimum(peak / (distance * np.float32(0.5)), peak)
+
+
+def direct_lighting(occupied, light_pos, intensity):
+    """
+    Direct-light intensity field (float32) and lit mask for a point light.
+
+    Occupied and shadowed cells get zero; the light cell itself gets
+    twice the intensity, as in RaycastRenderer.calculate_lighting.
+    """
+    rows, cols = occupied.shape
+    lit = ~(occupied | shadow_mask(occupied, light_pos))
+    field = falloff_field(rows, cols, light_pos, intensity)
+    field[~lit] = 0
+
+    lx, ly = light_pos
+    if 0 <= lx < cols and 0 <= ly < rows and not occupied[ly, lx]:
+        field[ly, lx] = intensity * 2
+    return field, lit
+
+
+def shade_string(occupied, shadow, light_pos):
+    """Convert object and shadow masks into the ASCII matrix string"""
+    rows, cols = occupied.shape
+    codes = np.where(shadow, 1, 0)
+    lx, ly = light_pos
+    if 0 <= lx < cols and 0 <= ly < rows:
+        codes[ly, lx] = 3
+    codes[occupied] = 2
+
+    palette = np.array([LIT_CHAR, SHADOW_CHAR, OBJECT_CHAR, LIGHT_CHAR])
+    return '\n'.join(''.join(row) for row in palette[codes].tolist())
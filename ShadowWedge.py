@@ -0,0 +1,65 @@
+"""
+Shadow wedges: which cells can change when some occluder cells move.
+
+A cell's direct lighting depends only on the cells its shadow ray
+samples. Each sample lies on the segment from the light to the target,
+so a ray can only be affected by changed cells if that segment reaches
+their bounding box. That is the wedge behind the box as seen from the
+light, starting at the box's nearest point.
+"""
+import math
+
+# Slack for floating point samples that land exactly on a box edge
+ANGLE_EPSILON = 1e-9
+
+
+def affected_cells(changed, light_pos, cols, rows):
+    """
+    Return the (x, y) cells whose lighting may differ after changed cells flip.
+
+    changed is a set of (x, y) cells whose occupancy changed. Returns None
+    when the light is next to or inside their bounding box, where the
+    wedge covers nearly everything and a full recompute is simpler.
+    """
+    if not changed:
+        return []
+
+    lx, ly = light_pos
+    x0 = min(x for x, _ in changed)
+    y0 = min(y for _, y in changed)
+    x1 = max(x for x, _ in changed) + 1
+    y1 = max(y for _, y in changed) + 1
+    if x0 - 1 <= lx <= x1 + 1 and y0 - 1 <= ly <= y1 + 1:
+        return None
+
+    # Measure angles around the direction to the box centre, so the
+    # wedge never straddles the atan2 wrap-around
+    base = math.atan2((y0 + y1) / 2 - ly, (x0 + x1) / 2 - lx)
+
+    def relative_angle(dx, dy):
+        angle = math.atan2(dy, dx) - base
+        if angle > math.pi:
+            angle -= 2 * math.pi
+        elif angle < -math.pi:
+            angle += 2 * math.pi
+        return angle
+
+    corners = [relative_angle(x - lx, y - ly) for x in (x0, x1) for y in (y0, y1)]
+    low = min(corners) - ANGLE_EPSILON
+    high = max(corners) + ANGLE_EPSILON
+
+    # Rays shorter than the distance to the box never reach it
+    near_x = max(x0 - lx, 0, lx - x1)
+    near_y = max(y0 - ly, 0, ly - y1)
+    near_squared = near_x * near_x + near_y * near_y
+
+    cells = []
+    for y in range(rows):
+        dy = y - ly
+        for x in range(cols):
+            dx = x - lx
+            if dx * dx + dy * dy < near_squared:
+                continue
+            if low <= relative_angle(dx, dy) <= high:
+                cells.append((x, y))
+    return cells
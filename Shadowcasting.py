@@ -0,0 +1,103 @@
+"""
+Recursive shadowcasting visibility for a point light on a grid.
+
+Instead of marching one ray per target cell, each of the eight octants
+around the light is scanned row by row, and occluders narrow the range
+of slopes that remains visible further out. Every cell is visited about
+once, so the cost is O(cells) rather than O(cells × distance).
+
+A cell counts as lit when any part of it is visible from the centre of
+the light cell. This agrees with the per-cell ray march everywhere
+except along shadow edges, where the two rules can disagree by a cell.
+"""
+
+# Octant transforms (xx, xy, yx, yy) mapping scan coordinates to the grid
+OCTANTS = (
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1),
+)
+
+
+def lit_cells(rows, cols, occupied, light_pos):
+    """
+    Return a bytearray of rows*cols flags (index y*cols + x), 1 where lit.
+
+    occupied is a flat per-cell sequence of 0/1 flags, such as
+    OccupancyGrid.cells. Occupied cells are flagged when their face is
+    visible; callers draw them as objects.
+    """
+    lit = bytearray(rows * cols)
+    lx, ly = light_pos
+    if 0 <= lx < cols and 0 <= ly < rows:
+        lit[ly * cols + lx] = 1
+
+    # Scan far enough to reach every grid corner
+    radius = max(abs(lx), abs(cols - 1 - lx), abs(ly), abs(rows - 1 - ly))
+
+    for xx, xy, yx, yy in OCTANTS:
+        # Each entry is a pending scan: (first row, start slope, end slope)
+        stack = [(1, 1.0, 0.0)]
+        while stack:
+            row, start, end = stack.pop()
+            if start < end:
+                continue
+            for j in range(row, radius + 1):
+                dx, dy = -j - 1, -j
+                blocked = False
+                new_start = start
+                while dx <= 0:
+                    dx += 1
+                    # Slopes of the cell's left and right edges
+                    l_slope = (dx - 0.5) / (dy + 0.5)
+                    r_slope = (dx + 0.5) / (dy - 0.5)
+                    if start < r_slope:
+                        continue
+                    if end > l_slope:
+                        break
+
+                    x = lx + dx * xx + dy * xy
+                    y = ly + dx * yx + dy * yy
+                    opaque = False
+                    if 0 <= x < cols and 0 <= y < rows:
+                        index = y * cols + x
+                        lit[index] = 1
+                        opaque = occupied[index]
+
+                    if blocked:
+                        if opaque:
+                            new_start = r_slope
+                            continue
+                        blocked = False
+                        start = new_start
+                    elif opaque and j < radius:
+                        # Scan the visible part beyond this occluder later
+                        blocked = True
+                        stack.append((j + 1, start, l_slope))
+                        new_start = r_slope
+                if blocked:
+                    break
+    return lit
+
+
+def shade_matrix(matrix, lit, light_pos):
+    """Fill the non-object cells of matrix from lit flags and return the string"""
+    cols = len(matrix[0]) if matrix else 0
+    lx, ly = light_pos
+    for y, row in enumerate(matrix):
+        base = y * cols
+        for x in range(cols):
+            if row[x] == '.':
+                continue
+            if x == lx and y == ly:
+                row[x] = '*'
+            elif lit[base + x]:
+                row[x] = '█'
+            else:
+                row[x] = '▒'
+    return '\n'.join(''.join(row) for row in matrix)
+
+
+def check_method(method):
+    """Validate a visibility method name"""
+    if method not in ("raycast", "shadowcast"):
+        raise ValueError(f"Unknown method: {method!r}")
@@ -0,0 +1,266 @@
+"""
+Analytic occluders and a uniform-grid spatial index over them.
+
+The marching engines test a shadow ray one cell at a time against the
+rasterized occupancy, so their cost grows with the distance to the
+light and the grid resolution. Here the occluders stay exact shapes
+(ellipses, rectangles and polygons, in cell-center coordinates) and each shape is
+filed under every bucket of a coarse uniform grid that its bounding box
+touches. A shadow test walks only the buckets the segment from the
+light to the cell crosses, and runs an exact segment-shape intersection
+against the shapes filed there, each at most once. The cost follows the
+number of nearby shapes, so scenes with hundreds of occluders stay
+cheap.
+
+A cell is occupied when its center lies inside a shape; shape_cells
+rasterizes shapes that way, visiting only the cells of each shape's
+bounding box clipped to the grid. Segments that only graze a boundary are
+not blocked.
+"""
+import math
+from collections import namedtuple
+
+DEFAULT_BUCKET_SIZE = 8  # Bucket edge in cells
+DEFAULT_COLOR = "#808080"
+
+
+class Ellipse(namedtuple("Ellipse", ["cx", "cy", "rx", "ry", "color"])):
+    """Axis-aligned ellipse with semi-axes rx and ry; a circle when they are equal"""
+    __slots__ = ()
+
+    def __new__(cls, cx, cy, rx, ry, color=DEFAULT_COLOR):
+        return super().__new__(cls, cx, cy, rx, ry, color)
+
+    def bounds(self):
+        """(x0, y0, x1, y1) bounding box"""
+        return self.cx - self.rx, self.cy - self.ry, self.cx + self.rx, self.cy + self.ry
+
+    def contains(self, x, y):
+        if self.rx <= 0 or self.ry <= 0:
+            return False
+        dx = (x - self.cx) / self.rx
+        dy = (y - self.cy) / self.ry
+        return dx * dx + dy * dy <= 1
+
+    def intersects_segment(self, ax, ay, bx, by):
+        """Whether the segment from (ax, ay) to (bx, by) passes through the ellipse"""
+        if self.rx <= 0 or self.ry <= 0:
+            return False
+        # Scale the ellipse to the unit circle and solve |p + t*d|^2 = 1
+        px = (ax - self.cx) / self.rx
+        py = (ay - self.cy) / self.ry
+        dx = (bx - ax) / self.rx
+        dy = (by - ay) / self.ry
+        c = px * px + py * py - 1
+        if c < 0:
+            return True  # Starts inside
+        a = dx * dx + dy * dy
+        if a == 0:
+            return False
+        b = px * dx + py * dy
+        discriminant = b * b - a * c
+        if discriminant <= 0:
+            return False
+        t = (-b - math.sqrt(discriminant)) / a  # Entry point
+        return 0 <= t <= 1
+
+
+class Rect(namedtuple("Rect", ["x0", "y0", "x1", "y1", "color"])):
+    """Axis-aligned rectangle spanning x0..x1 and y0..y1"""
+    __slots__ = ()
+
+    def __new__(cls, x0, y0, x1, y1, color=DEFAULT_COLOR):
+        return super().__new__(cls, x0, y0, x1, y1, color)
+
+    def bounds(self):
+        """(x0, y0, x1, y1) bounding box"""
+        return self.x0, self.y0, self.x1, self.y1
+
+    def contains(self, x, y):
+        return self.x0 <= x <= self.x1 and self.y0 <= y <= self.y1
+
+    def intersects_segment(self, ax, ay, bx, by):
+        """Whether the segment from (ax, ay) to (bx, by) passes through the rectangle"""
+        # Clip the segment's parameter range against both slabs (Liang-Barsky)
+        t_enter, t_exit = 0.0, 1.0
+        for start, delta, low, high in ((ax, bx - ax, self.x0, self.x1), (ay, by - ay, self.y0, self.y1)):
+            if delta == 0:
+                if start <= low or start >= high:
+                    return False
+                continue
+            t0 = (low - start) / delta
+            t1 = (high - start) / delta
+            if t0 > t1:
+                t0, t1 = t1, t0
+            t_enter = max(t_enter, t0)
+            t_exit = min(t_exit, t1)
+            if t_enter >= t_exit:
+                return False
+        return True
+
+
+class Polygon(namedtuple("Polygon", ["points", "color"])):
+    """Simple polygon through points, a tuple of (x, y) vertices in order"""
+    __slots__ = ()
+
+    def __new__(cls, points, color=DEFAULT_COLOR):
+        points = tuple((float(x), float(y)) for x, y in points)
+        if len(points) < 3:
+            raise ValueError("A polygon needs at least three points")
+        return super().__new__(cls, points, color)
+
+    def bounds(self):
+        """(x0, y0, x1, y1) bounding box"""
+        xs = [x for x, _ in self.points]
+        ys = [y for _, y in self.points]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def edges(self):
+        """Yield each edge as (x0, y0, x1, y1)"""
+        points = self.points
+        for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]):
+            yield x0, y0, x1, y1
+
+    def contains(self, x, y):
+        # Even-odd rule: count edges crossed by a ray towards +x
+        inside = False
+        for x0, y0, x1, y1 in self.edges():
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+                inside = not inside
+        return inside
+
+    def intersects_segment(self, ax, ay, bx, by):
+        """Whether the segment from (ax, ay) to (bx, by) passes through the polygon"""
+        dx, dy = bx - ax, by - ay
+        # Split the segment where it meets the boundary; it passes through the
+        # polygon if the middle of any piece is inside
+        cuts = [0.0, 1.0]
+        for x0, y0, x1, y1 in self.edges():
+            ex, ey = x1 - x0, y1 - y0
+            denominator = dx * ey - dy * ex
+            if denominator == 0:
+                continue  # Parallel, at most grazing along the edge
+            t = ((x0 - ax) * ey - (y0 - ay) * ex) / denominator
+            u = ((x0 - ax) * dy - (y0 - ay) * dx) / denominator
+            if 0 < t < 1 and 0 <= u <= 1:
+                cuts.append(t)
+        cuts.sort()
+        for t0, t1 in zip(cuts, cuts[1:]):
+            if t1 > t0:
+                middle = (t0 + t1) / 2
+                if self.contains(ax + dx * middle, ay + dy * middle):
+                    return True
+        return False
+
+
+def shape_cells(shape, width, height):
+    """Flat indices of the grid cells whose centers lie inside shape"""
+    x0, y0, x1, y1 = shape.bounds()
+    cells = []
+    for y in range(max(0, math.ceil(y0)), min(height, math.floor(y1) + 1)):
+        for x in range(max(0, math.ceil(x0)), min(width, math.floor(x1) + 1)):
+            if shape.contains(x, y):
+                cells.append(y * width + x)
+    return tuple(cells)
+
+
+class ShapeIndex:
+    def __init__(self, shapes=(), bucket_size=DEFAULT_BUCKET_SIZE):
+        if bucket_size <= 0:
+            raise ValueError("Buckets must have a positive size")
+        self.bucket_size = bucket_size
+        self.shapes = []
+        self.buckets = {}  # (bucket x, bucket y): indices into shapes
+        for shape in shapes:
+            self.add(shape)
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def add(self, shape):
+        """File a shape under every bucket its bounding box touches"""
+        size = self.bucket_size
+        index = len(self.shapes)
+        self.shapes.append(shape)
+        x0, y0, x1, y1 = shape.bounds()
+        for by in range(math.floor(y0 / size), math.floor(y1 / size) + 1):
+            for bx in range(math.floor(x0 / size), math.floor(x1 / size) + 1):
+                self.buckets.setdefault((bx, by), []).append(index)
+
+    def buckets_along(self, ax, ay, bx, by):
+        """Yield the buckets the segment crosses, from (ax, ay) to (bx, by)"""
+        size = self.bucket_size
+        x, y = math.floor(ax / size), math.floor(ay / size)
+        end_x, end_y = math.floor(bx / size), math.floor(by / size)
+        dx, dy = bx - ax, by - ay
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        # Segment parameter at the next bucket boundary on each axis, and per bucket
+        if dx:
+            next_x = ((x + (step_x > 0)) * size - ax) / dx
+            delta_x = size / abs(dx)
+        else:
+            next_x = delta_x = math.inf
+        if dy:
+            next_y = ((y + (step_y > 0)) * size - ay) / dy
+            delta_y = size / abs(dy)
+        else:
+            next_y = delta_y = math.inf
+
+        yield x, y
+        for _ in range(abs(end_x - x) + abs(end_y - y)):
+            if next_x < next_y:
+                x += step_x
+                next_x += delta_x
+            else:
+                y += step_y
+                next_y += delta_y
+            yield x, y
+
+    def candidates(self, ax, ay, bx, by):
+        """Yield each shape filed in a bucket along the segment once, nearest buckets first"""
+        seen = set()
+        buckets = self.buckets
+        for bucket in self.buckets_along(ax, ay, bx, by):
+            for index in buckets.get(bucket, ()):
+                if index not in seen:
+                    seen.add(index)
+                    yield self.shapes[index]
+
+    def blocked(self, ax, ay, bx, by):
+        """Whether any shape intersects the segment from (ax, ay) to (bx, by)"""
+        # candidates() inlined: this runs once per cell per frame
+        seen = set()
+        buckets = self.buckets
+        shapes = self.shapes
+        for bucket in self.buckets_along(ax, ay, bx, by):
+            for index in buckets.get(bucket, ()):
+                if index not in seen:
+                    seen.add(index)
+                    if shapes[index].intersects_segment(ax, ay, bx, by):
+                        return True
+        return False
+
+    def lit_flags(self, occupied, cols, rows, light_pos):
+        """
+        Return a bytearray of rows*cols flags (index y*cols + x), 1 where lit.
+
+        occupied is a flat per-cell sequence of 0/1 flags; occupied cells
+        are left at 0, as in RayTable.lit_flags.
+        """
+        lx, ly = light_pos
+        lit = bytearray(rows * cols)
+        if not self.shapes:
+            for index in range(rows * cols):
+                lit[index] = not occupied[index]
+            return lit
+
+        blocked = self.blocked
+        for y in range(rows):
+            for x in range(cols):
+                index = y * cols + x
+                if occupied[index]:
+                    continue
+                if (x == lx and y == ly) or not blocked(lx, ly, x, y):
+                    lit[index] = 1
+        return lit
@@ -0,0 +1,249 @@
+"""
+Tiled rendering for very large grids.
+
+Full-frame rendering keeps rows x cols Python lists for the character
+matrix or the intensity and color buffers, which runs out of memory
+long before tens of millions of cells. Here the occluders are stored
+once in an OccupancyGrid (two bytes per cell) shared by every tile, and
+the lighting is computed one fixed-size tile at a time. Each finished
+tile is handed to a sink, either any callable or one of the file sinks
+below, and then dropped, so the buffers in memory at any moment are
+proportional to the tile size rather than the grid size.
+
+Tiles are computed with the per-cell shadow march (the ray-path table
+and NumPy engines need whole-grid buffers) and match the "python"
+engine exactly; disc lights sample the same points as
+SoftShadows.area_light_field, so their soft shadows match too. Reflected rays can land in any tile, so their samples
+are computed once up front, with the frame's seeded generator, and
+blended into each tile in their original order; there are at most 39
+per reflective edge cell and light.
+"""
+import math
+import random
+from array import array
+from collections import namedtuple
+
+import RayTable
+import RenderCore
+import SoftShadows
+from ColorPalette import hex_to_int
+from OccupancyGrid import OccupancyGrid
+
+DEFAULT_TILE_SIZE = 256
+
+# intensity and color are lists of rows covering the tile only
+Tile = namedtuple("Tile", ["x", "y", "width", "height", "intensity", "color"])
+# rows are the tile's lines of createMatrix characters
+TextTile = namedtuple("TextTile", ["x", "y", "width", "height", "rows"])
+
+
+def tile_bounds(width, height, tile_size=DEFAULT_TILE_SIZE):
+    """Yield (x0, y0, x1, y1) for each tile, in row-major order"""
+    if tile_size < 1:
+        raise ValueError("Tiles must be at least one cell wide")
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            yield x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height)
+
+
+def scene_occupancy(scene):
+    """OccupancyGrid and reflective edge cells of a scene's occluders"""
+    circle_cells, circle_reflective = RenderCore.rasterize_circle(scene)
+    square_cells, square_reflective = RenderCore.rasterize_square(scene)
+    occupancy = OccupancyGrid(scene.grid_width, scene.grid_height)
+    occupancy.fill_indices(circle_cells, occupancy.material(scene.circle_color))
+    occupancy.fill_indices(square_cells, occupancy.material(scene.square_color))
+    for shape, cells in zip(scene.shapes, RenderCore.rasterize_shapes(scene)):
+        occupancy.fill_indices(cells, occupancy.material(shape.color))
+    return occupancy, circle_reflective | square_reflective
+
+
+def light_value(occupied, width, height, light_pos, intensity, x, y, samples=None):
+    """
+    Direct intensity of one free cell from one light, 0 when shadowed.
+
+    samples is (probes, extra) from SoftShadows for a disc light, scaling
+    the intensity by the visible fraction of the disc.
+    """
+    lx, ly = light_pos
+    # Mark light source
+    if x == lx and y == ly:
+        return intensity * 2
+    if samples is None:
+        fraction = 0 if RayTable.march_blocked(occupied, height, width, lx, ly, x, y) else 1
+    else:
+        def blocked(px, py, x, y):
+            return RayTable.march_blocked(occupied, height, width, px, py, x, y)
+
+        fraction, _ = SoftShadows.visible_fraction(blocked, *samples, x, y)
+    if fraction == 0:
+        return 0
+    distance = max(math.sqrt((x - lx) ** 2 + (y - ly) ** 2), 1)
+    return min(intensity / (distance * 0.5), intensity) * fraction
+
+
+def lighting_tiles(scene, tile_size=DEFAULT_TILE_SIZE):
+    """Yield the lit Tiles of a scene, in row-major order"""
+    width, height = scene.grid_width, scene.grid_height
+    occupancy, reflective = scene_occupancy(scene)
+    occupied = occupancy.cells
+    lights = []
+    for light in scene.lights:
+        samples = None
+        if light.radius:
+            samples = (SoftShadows.probe_points(light.pos, light.radius),
+                       SoftShadows.disc_points(light.pos, light.radius, max(scene.shadow_samples - SoftShadows.PROBE_RAYS, 0)))
+        lights.append((light.pos, light.intensity, hex_to_int(light.color), samples))
+
+    # Reflection samples, bucketed by the tile they land in
+    buckets = {}
+    if scene.enable_reflections:
+        rng = random.Random(scene.reflection_seed)
+        for light in scene.lights:
+            for sample in RenderCore.reflection_samples(scene, occupancy, reflective, light, rng):
+                buckets.setdefault((sample[0] // tile_size, sample[1] // tile_size), []).append(sample)
+
+    for x0, y0, x1, y1 in tile_bounds(width, height, tile_size):
+        intensity_matrix = []
+        color_matrix = []
+        for y in range(y0, y1):
+            intensity_row = []
+            color_row = []
+            for x in range(x0, x1):
+                total = red = green = blue = 0
+                if not occupied[y * width + x]:
+                    for pos, intensity, rgb, samples in lights:
+                        value = light_value(occupied, width, height, pos, intensity, x, y, samples)
+                        if value > 0:
+                            total += value
+                            red += value * (rgb >> 16)
+                            green += value * (rgb >> 8 & 0xFF)
+                            blue += value * (rgb & 0xFF)
+                if total > 0:
+                    # Light colors weighted by intensity, as RenderCore.accumulate_lights
+                    color = int(red / total + 0.5) << 16 | int(green / total + 0.5) << 8 | int(blue / total + 0.5)
+                else:
+                    color = 0
+                intensity_row.append(total)
+                color_row.append(color)
+            intensity_matrix.append(intensity_row)
+            color_matrix.append(color_row)
+
+        RenderCore.blend_reflections(intensity_matrix, color_matrix, buckets.pop((x0 // tile_size, y0 // tile_size), ()),
+                                     x0, y0)
+
+        yield Tile(x0, y0, x1 - x0, y1 - y0, intensity_matrix, color_matrix)
+
+
+def matrix_occupancy(r, c, circle_center=None, circle_radius=6, square_pos=None, square_size=5):
+    """OccupancyGrid of createMatrix's circle and square, visiting only their bounding boxes"""
+    rows, cols = r, c
+    objects = OccupancyGrid(cols, rows)
+    if circle_center:
+        cx, cy = circle_center
+        h_stretch = 2.0  # Horizontal stretch factor
+        for y in range(max(0, int(cy - circle_radius) - 1), min(rows, int(cy + circle_radius) + 2)):
+            for x in range(max(0, int(cx - circle_radius * h_stretch) - 1),
+                           min(cols, int(cx + circle_radius * h_stretch) + 2)):
+                if math.sqrt(((x - cx) / h_stretch) ** 2 + (y - cy) ** 2) <= circle_radius:
+                    objects.fill(x, y)
+    if square_pos:
+        sx, sy = square_pos
+        objects.fill_rect(sx, sy, square_size * 2, square_size)
+    return objects
+
+
+def matrix_tiles(r, c, circle_center=None, circle_radius=6, square_pos=None, square_size=5, light_pos=(1, 1),
+                 tile_size=DEFAULT_TILE_SIZE):
+    """Yield TextTiles of the createMatrix view, in row-major order"""
+    rows, cols = r, c
+    occupied = matrix_occupancy(r, c, circle_center, circle_radius, square_pos, square_size).cells
+    lx, ly = light_pos
+
+    for x0, y0, x1, y1 in tile_bounds(cols, rows, tile_size):
+        lines = []
+        for y in range(y0, y1):
+            line = []
+            for x in range(x0, x1):
+                if occupied[y * cols + x]:
+                    line.append('.')
+                elif x == lx and y == ly:
+                    line.append('*')
+                elif RayTable.march_blocked(occupied, rows, cols, lx, ly, x, y):
+                    line.append('▒')
+                else:
+                    line.append('█')
+            lines.append(''.join(line))
+        yield TextTile(x0, y0, x1 - x0, y1 - y0, lines)
+
+
+def render_tiled(tiles, sink):
+    """Pass every tile to sink as it is finished; returns the number of tiles"""
+    count = 0
+    for tile in tiles:
+        sink(tile)
+        count += 1
+    return count
+
+
+class IntensityFile:
+    """Sink writing tiles into a raw row-major float32 intensity file of the whole grid"""
+
+    def __init__(self, path, width, height):
+        self.width = width
+        self.height = height
+        self.file = open(path, "wb+")
+        self.file.truncate(4 * width * height)
+
+    def __call__(self, tile):
+        for row_offset, row in enumerate(tile.intensity):
+            self.file.seek(4 * ((tile.y + row_offset) * self.width + tile.x))
+            self.file.write(array('f', row).tobytes())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TextFile:
+    """
+    Sink writing TextTiles into a text file laid out like createMatrix's string.
+
+    Characters have different UTF-8 widths, so lines cannot be patched in
+    place; one band of tile rows is kept until its last tile arrives.
+    Tiles must come in row-major order.
+    """
+
+    def __init__(self, path, width, height):
+        self.width = width
+        self.height = height
+        self.file = open(path, "w", encoding="utf-8")
+        self.band = []
+        self.lines_written = 0
+
+    def __call__(self, tile):
+        if tile.x == 0:
+            self.band = [[] for _ in range(tile.height)]
+        for line, row in zip(self.band, tile.rows):
+            line.append(row)
+        if tile.x + tile.width == self.width:
+            for line in self.band:
+                if self.lines_written:
+                    self.file.write('\n')
+                self.file.write(''.join(line))
+                self.lines_written += 1
+            self.band = []
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
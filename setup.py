@@ -51,6 +51,9 @@ setup(
     python_requires=">=3.8",
     install_requires=read_requirements(),
     extras_require={
+        "numpy": [
+            "numpy>=1.20",
+        ],
         "dev": [
             "pytest>=7.4.0",
             "pytest-cov>=4.1.0",
@@ -64,6 +67,8 @@ setup(
         "console_scripts": [
             "raycast=Main:displayOut",
             "raycast-canvas=CanvasRayTracer:main",
+            "raycast-bench=Benchmark:main",
+            "raycast-batch=BatchRender:main",
         ],
     },
     include_package_data=True,
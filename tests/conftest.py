@@ -31,3 +31,57 @@ def large_grid_config():
         'square_size': 5,
         'light_pos': [5, 5]
     }
+
+
+@pytest.fixture
+def headless_renderer():
+    """RaycastRenderer with scene state only, so lighting can run without a display"""
+    from CanvasRayTracer import RaycastRenderer
+    from ColorPalette import ColorPalette
+    import FrameTiming
+    import RenderCore
+
+    renderer = RaycastRenderer.__new__(RaycastRenderer)
+    renderer.backend = "rectangles"
+    renderer.grid_width = 100
+    renderer.grid_height = 70
+    renderer.cell_width = 1000 / renderer.grid_width
+    renderer.cell_height = 800 / renderer.grid_height
+    renderer.circle_center = [40, 15]
+    renderer.square_pos = [70, 10]
+    renderer.light_pos = [20, 15]
+    renderer.extra_lights = []
+    renderer.enable_reflections = False
+    renderer.light_intensity = 100
+    renderer.light_radius = 0
+    renderer.diffusion_amount = 0.1
+    renderer.lighting_engine = "auto"
+    renderer.follow_mouse = False
+    renderer.continuous_diffusion = False
+    renderer.reflection_seed = 0
+    renderer.mouse_x = 0
+    renderer.mouse_y = 0
+    renderer.current_object = "circle"
+    renderer.scene_revision = 0
+    renderer.incremental_shadows = True
+    renderer.progressive = False
+    renderer.preview_levels = RenderCore.PREVIEW_LEVELS
+    renderer.refine_levels = []
+    renderer.timer = FrameTiming.FrameTimer()
+    renderer.show_timings = False
+    renderer.timing_overlay = None
+    renderer.core = RenderCore.Renderer()
+    renderer.render_thread = None
+    renderer.rendered_revision = None
+    renderer.circle_color = "#00B000"
+    renderer.square_color = "#B00000"
+    renderer.light_color = "#FFF0C8"
+    renderer.color_palette = ColorPalette()
+    renderer.cells = {}
+    renderer.painted_colors = {}
+    renderer.cells_repainted = 0
+    renderer.total_repainted = 0
+    renderer.frame_image = None
+    renderer.display_image = None
+    renderer.last_frame_data = None
+    return renderer
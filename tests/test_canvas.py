@@ -0,0 +1,547 @@
+"""
+Unit tests for the canvas renderer lighting
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def _lighting(renderer, engine):
+    renderer.lighting_engine = engine
+    return renderer.calculate_lighting()
+
+
+class TestLightingEngines:
+    """Test that the array lighting engine matches the Python loops"""
+
+    @pytest.mark.parametrize("light_pos", [[20, 15], [0, 0], [99, 69], [55, 30], [72, 12]])
+    def test_direct_lighting_matches(self, headless_renderer, light_pos):
+        """Test that direct intensities and colors match within tolerance"""
+        pytest.importorskip("numpy")
+        headless_renderer.light_pos = light_pos
+        occupancy, expected_intensity, expected_color = _lighting(headless_renderer, "python")
+        occupancy_np, intensity, color = _lighting(headless_renderer, "numpy")
+
+        assert occupancy_np.cells == occupancy.cells
+        assert color == expected_color
+        for row, expected_row in zip(intensity, expected_intensity):
+            assert row == pytest.approx(expected_row, rel=1e-5, abs=1e-4)
+
+    @pytest.mark.parametrize("light_pos", [[20, 15], [99, 69]])
+    def test_table_lighting_matches(self, headless_renderer, light_pos):
+        """Test that the ray-path table gives the same direct lighting"""
+        headless_renderer.light_pos = light_pos
+        expected = _lighting(headless_renderer, "python")
+        assert _lighting(headless_renderer, "table") == expected
+
+    def test_reflections_use_direct_pass(self, headless_renderer):
+        """Test that reflections still run on top of the array engine"""
+        pytest.importorskip("numpy")
+        headless_renderer.enable_reflections = True
+        headless_renderer.diffusion_amount = 0
+        _, expected_intensity, _ = _lighting(headless_renderer, "python")
+        _, intensity, _ = _lighting(headless_renderer, "numpy")
+        for row, expected_row in zip(intensity, expected_intensity):
+            assert row == pytest.approx(expected_row, rel=1e-5, abs=1e-4)
+
+    def test_python_engine_without_numpy(self, headless_renderer):
+        """Test that the Python engine returns full-size matrices"""
+        _, intensity, color = _lighting(headless_renderer, "python")
+        assert len(intensity) == headless_renderer.grid_height
+        assert len(color[0]) == headless_renderer.grid_width
+
+
+class TestIncrementalShadows:
+    """Test that moving one occluder only recomputes its shadow wedge"""
+
+    def _full(self, renderer):
+        renderer.incremental_shadows = False
+        renderer.core.direct_cache = None
+        try:
+            return renderer.calculate_lighting()
+        finally:
+            renderer.incremental_shadows = True
+
+    @pytest.mark.parametrize("engine", ["python", "table"])
+    @pytest.mark.parametrize("moves", [
+        [("circle_center", [60, 40])],
+        [("square_pos", [30, 50]), ("circle_center", [10, 60])],
+        [("square_pos", [22, 17])],
+    ])
+    def test_incremental_matches_full(self, headless_renderer, engine, moves):
+        """Test that the incremental update equals a full recompute"""
+        headless_renderer.lighting_engine = engine
+        headless_renderer.calculate_lighting()
+        for name, position in moves:
+            setattr(headless_renderer, name, position)
+            incremental = headless_renderer.calculate_lighting()
+            full = self._full(headless_renderer)
+            assert incremental == full
+
+    def test_incremental_touches_fewer_cells(self, headless_renderer):
+        """Test that moving the square recomputes only part of the grid"""
+        headless_renderer.lighting_engine = "python"
+        headless_renderer.calculate_lighting()
+        headless_renderer.square_pos = [75, 12]
+        headless_renderer.calculate_lighting()
+        mode, cells = headless_renderer.core.direct_update
+        assert mode == "incremental"
+        assert 0 < cells < headless_renderer.grid_width * headless_renderer.grid_height // 4
+
+    def test_light_move_forces_full_pass(self, headless_renderer):
+        """Test that moving the light recomputes everything"""
+        headless_renderer.calculate_lighting()
+        headless_renderer.light_pos = [21, 15]
+        headless_renderer.calculate_lighting()
+        assert headless_renderer.core.direct_update[0] == "full"
+
+    def test_wedge_covers_changed_cells(self):
+        """Test that the wedge includes the changed cells and skips the light side"""
+        import ShadowWedge
+
+        changed = {(10, 5), (11, 5)}
+        cells = ShadowWedge.affected_cells(changed, (0, 5), 20, 10)
+        assert changed <= set(cells)
+        assert (5, 5) not in cells
+        assert (19, 5) in cells
+        assert ShadowWedge.affected_cells(changed, (10, 6), 20, 10) is None
+
+
+class RecordingCanvas:
+    """Canvas stand-in that records itemconfig calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def itemconfig(self, item, **options):
+        self.calls.append((item, options))
+
+    def create_text(self, x, y, **options):
+        return "text"
+
+    def delete(self, item):
+        pass
+
+
+@pytest.fixture
+def painting_renderer(headless_renderer):
+    """Headless renderer with a recording canvas and one item per cell"""
+    headless_renderer.canvas = RecordingCanvas()
+    for y in range(headless_renderer.grid_height):
+        for x in range(headless_renderer.grid_width):
+            headless_renderer.cells[(x, y)] = y * headless_renderer.grid_width + x + 1
+            headless_renderer.painted_colors[(x, y)] = "black"
+    return headless_renderer
+
+
+class TestDirtyPainting:
+    """Test that only changed cells are sent to Tk"""
+
+    def _paint(self, renderer):
+        renderer.canvas.calls.clear()
+        return renderer.paint_frame(*renderer.calculate_lighting())
+
+    def test_first_frame_paints_every_cell(self, painting_renderer):
+        """Test that the first frame repaints the whole grid"""
+        repainted = self._paint(painting_renderer)
+        assert repainted == len(painting_renderer.cells)
+        assert len(painting_renderer.canvas.calls) == repainted
+
+    def test_stationary_frame_paints_nothing(self, painting_renderer):
+        """Test that an unchanged scene makes no itemconfig calls"""
+        self._paint(painting_renderer)
+        assert self._paint(painting_renderer) == 0
+        assert painting_renderer.canvas.calls == []
+        assert painting_renderer.cells_repainted == 0
+
+    def test_moving_light_paints_changed_cells(self, painting_renderer):
+        """Test that moving the light repaints only cells that changed"""
+        self._paint(painting_renderer)
+        before = dict(painting_renderer.painted_colors)
+        painting_renderer.light_pos = [21, 15]
+        repainted = self._paint(painting_renderer)
+
+        changed = [key for key, color in painting_renderer.painted_colors.items() if before[key] != color]
+        assert 0 < repainted < len(painting_renderer.cells)
+        assert repainted == len(changed)
+        assert painting_renderer.total_repainted == len(painting_renderer.cells) + repainted
+
+
+class RecordingImage:
+    """PhotoImage stand-in that records put and Tcl calls"""
+
+    def __init__(self, name):
+        self.name = name
+        self.tk = self
+        self.puts = []
+        self.calls = []
+
+    def put(self, data, to=None):
+        self.puts.append((data, to))
+
+    def call(self, *args):
+        self.calls.append(args)
+
+
+class TestImageBackend:
+    """Test the single-PhotoImage framebuffer backend"""
+
+    @pytest.fixture
+    def image_renderer(self, headless_renderer):
+        headless_renderer.backend = "image"
+        headless_renderer.cell_width, headless_renderer.cell_height = 10, 11
+        headless_renderer.frame_image = RecordingImage("frame")
+        headless_renderer.display_image = RecordingImage("display")
+        return headless_renderer
+
+    def test_frame_is_one_put(self, image_renderer):
+        """Test that a frame is written with a single put and zoomed copy"""
+        image_renderer.paint_frame(*image_renderer.calculate_lighting())
+        assert len(image_renderer.frame_image.puts) == 1
+        data, to = image_renderer.frame_image.puts[0]
+        assert to == (0, 0)
+        assert data.count("{") == image_renderer.grid_height
+        assert image_renderer.display_image.calls == [("display", "copy", "frame", "-zoom", 10, 11)]
+
+    def test_image_matches_rectangle_colors(self, image_renderer):
+        """Test that the image data carries the same colors as the rectangles"""
+        frame = image_renderer.calculate_lighting()
+        image_renderer.paint_frame(*frame)
+        colors = image_renderer.frame_colors(*frame)
+        first_row = image_renderer.frame_image.puts[0][0].split("} {")[0].lstrip("{").split()
+        assert first_row == colors[0]
+
+    def test_unchanged_frame_skips_put(self, image_renderer):
+        """Test that an identical frame is not sent to Tk again"""
+        image_renderer.paint_frame(*image_renderer.calculate_lighting())
+        assert image_renderer.paint_frame(*image_renderer.calculate_lighting()) == 0
+        assert len(image_renderer.frame_image.puts) == 1
+
+
+class RecordingLabel:
+    """Label stand-in that keeps the last configured text"""
+
+    text = ""
+
+    def config(self, **options):
+        self.text = options.get("text", self.text)
+
+
+class Event:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class TestSceneRevision:
+    """Test that frames are only recomputed after a scene change"""
+
+    @pytest.fixture
+    def renderer(self, headless_renderer):
+        for name in ("mouse_pos_label", "selection_label", "light_label", "reflection_label", "follow_label"):
+            setattr(headless_renderer, name, RecordingLabel())
+        headless_renderer.rendered_revision = headless_renderer.scene_revision
+        return headless_renderer
+
+    def test_idle_scene_needs_no_render(self, renderer):
+        """Test that an unchanged scene is not recomputed"""
+        assert not renderer.needs_render()
+
+    @pytest.mark.parametrize("action", [
+        lambda r: r.on_click(Event(55, 55)),
+        lambda r: r.move_light_key("right"),
+        lambda r: r.adjust_light_intensity(10),
+        lambda r: r.toggle_reflections(),
+        lambda r: r.add_light(),
+        lambda r: r.adjust_light_radius(1),
+    ])
+    def test_input_invalidates(self, renderer, action):
+        """Test that scene-changing input bumps the revision"""
+        action(renderer)
+        assert renderer.needs_render()
+
+    def test_mouse_move_only_invalidates_when_following(self, renderer):
+        """Test that plain mouse motion does not trigger a render"""
+        renderer.on_mouse_move(Event(300, 300))
+        assert not renderer.needs_render()
+
+        renderer.follow_mouse = True
+        renderer.on_mouse_move(Event(400, 300))
+        assert renderer.needs_render()
+        assert renderer.light_pos == [40, 26]
+
+    def test_continuous_diffusion_opt_in(self, renderer):
+        """Test that diffuse reflections only re-render continuously when enabled"""
+        renderer.enable_reflections = True
+        assert not renderer.needs_render()
+        renderer.continuous_diffusion = True
+        assert renderer.needs_render()
+        renderer.diffusion_amount = 0
+        assert not renderer.needs_render()
+
+    def test_diffusion_seed_per_frame(self, renderer):
+        """Test that snapshots reuse the reflection seed unless diffusion is animated"""
+        assert renderer.snapshot_scene().reflection_seed == renderer.snapshot_scene().reflection_seed
+        renderer.continuous_diffusion = True
+        assert renderer.snapshot_scene().reflection_seed != renderer.snapshot_scene().reflection_seed
+
+
+class TestProgressive:
+    """Test coarse previews refined to the full frame"""
+
+    @pytest.fixture
+    def renderer(self, painting_renderer):
+        painting_renderer.root = RecordingRoot()
+        painting_renderer.fps_label = RecordingLabel()
+        painting_renderer.light_label = RecordingLabel()
+        painting_renderer.mouse_pos_label = RecordingLabel()
+        painting_renderer.frame_count = 0
+        painting_renderer.last_time = float("inf")
+        painting_renderer.progressive = True
+
+        # Record the downsample factor of every frame lit
+        render = painting_renderer.core.render
+        painting_renderer.factors = []
+
+        def recording_render(scene):
+            painting_renderer.factors.append(scene.downsample)
+            return render(scene)
+
+        painting_renderer.core.render = recording_render
+        return painting_renderer
+
+    def test_refines_to_full_frame(self, renderer):
+        """Test that a change paints a preview first and settles on the full frame"""
+        for _ in range(5):
+            renderer.update_display()
+        assert renderer.factors == [4, 2, 1]
+
+        expected = renderer.frame_colors(*renderer.calculate_lighting())
+        assert all(renderer.painted_colors[(x, y)] == color
+                   for y, row in enumerate(expected) for x, color in enumerate(row))
+
+    def test_change_restarts_refinement(self, renderer):
+        """Test that input during refinement goes back to the coarsest preview"""
+        renderer.update_display()
+        renderer.move_light_key("right")
+        renderer.update_display()
+        renderer.update_display()
+        assert renderer.factors == [4, 4, 2]
+
+    def test_off_renders_full_frames(self, renderer):
+        """Test that without progressive mode every frame is full resolution"""
+        renderer.toggle_progressive()
+        renderer.update_display()
+        renderer.update_display()
+        assert renderer.factors == [1]
+
+
+class TestTimingOverlay:
+    """Test per-stage timings collected by the canvas"""
+
+    def test_disabled_by_default(self, painting_renderer):
+        """Test that no timings are collected until asked for"""
+        scene = painting_renderer.snapshot_scene()
+        assert scene.timing is None
+        painting_renderer.paint_frame(*painting_renderer.core.render(scene), scene=scene)
+        assert painting_renderer.timer.frames_recorded == 0
+
+    def test_overlay_shows_every_stage(self, painting_renderer):
+        """Test that painted frames record all stages and refresh the overlay"""
+        import FrameTiming
+
+        renderer = painting_renderer
+        renderer.toggle_timings()
+        scene = renderer.snapshot_scene()
+        renderer.paint_frame(*renderer.core.render(scene), scene=scene)
+
+        timing = renderer.timer.frames[-1]
+        # No frame cache here, so no lookup time
+        assert all(timing.stages[stage] > 0 for stage in FrameTiming.STAGES if stage != "cache")
+        assert not timing.cached
+        item, options = renderer.canvas.calls[-1]
+        assert item == "text" and "(1 frames, 0 cached)" in options["text"]
+
+        renderer.toggle_timings()
+        assert renderer.timing_overlay is None and renderer.snapshot_scene().timing is None
+
+
+class TestFrameCache:
+    """Test that the canvas reuses frames of recurring scenes"""
+
+    def test_light_sweep_hits_cache(self, headless_renderer):
+        """Test that moving the light back to where it was needs no lighting pass"""
+        import RenderCore
+        from FrameCache import FrameCache
+
+        renderer = headless_renderer
+        renderer.mouse_pos_label = RecordingLabel()
+        renderer.core = RenderCore.Renderer(frame_cache=FrameCache())
+        first = renderer.calculate_lighting()
+        renderer.move_light_key("right")
+        renderer.calculate_lighting()
+        renderer.move_light_key("left")
+        assert renderer.calculate_lighting() == first
+        assert renderer.core.frame_cache.stats["hits"] == 1
+
+    def test_hit_keeps_soft_shadow_label(self, headless_renderer):
+        """Test that a disc-light frame from the cache still reports its rays per cell"""
+        import RenderCore
+        from FrameCache import FrameCache
+
+        renderer = headless_renderer
+        renderer.light_label = RecordingLabel()
+        renderer.core = RenderCore.Renderer(frame_cache=FrameCache())
+        renderer.light_radius = 2
+        renderer.calculate_lighting()
+        renderer.update_light_label()
+        label = renderer.light_label.text
+        renderer.calculate_lighting()
+        renderer.update_light_label()
+        assert renderer.core.frame_cache.hits == 1
+        assert "rays/cell" in label and renderer.light_label.text == label
+
+
+class RecordingRoot:
+    """Tk root stand-in that records scheduled callbacks without running them"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback):
+        self.scheduled.append((delay, callback))
+
+
+class TestRenderThread:
+    """Test background rendering and the front/back buffer hand-off"""
+
+    def test_renders_submitted_job(self):
+        """Test that a submitted job comes back with its revision"""
+        from RenderThread import RenderThread
+
+        worker = RenderThread(lambda job: job * 2).start()
+        try:
+            worker.submit(1, 21)
+            assert worker.take(timeout=5) == (1, 21, 42)
+            assert worker.take() is None
+        finally:
+            worker.stop()
+
+    def test_stale_jobs_are_dropped(self):
+        """Test that only the newest queued job is rendered while the worker is busy"""
+        import threading
+        from RenderThread import RenderThread
+
+        started = threading.Event()
+        release = threading.Semaphore(0)
+        rendered = []
+
+        def render(job):
+            rendered.append(job)
+            started.set()
+            release.acquire(timeout=5)
+            return job
+
+        worker = RenderThread(render).start()
+        try:
+            worker.submit(1, "first")
+            started.wait(5)
+            for revision in range(2, 6):
+                worker.submit(revision, f"job {revision}")
+            release.release()
+            assert worker.take(timeout=5) == (1, "first", "first")
+            release.release()
+            assert worker.take(timeout=5) == (5, "job 5", "job 5")
+            assert rendered == ["first", "job 5"]
+            assert worker.frames_dropped == 3
+        finally:
+            worker.stop()
+
+    def test_render_errors_reach_taker(self):
+        """Test that an exception in the worker is raised by take"""
+        from RenderThread import RenderThread
+
+        worker = RenderThread(lambda job: 1 / job).start()
+        try:
+            worker.submit(1, 0)
+            with pytest.raises(ZeroDivisionError):
+                worker.take(timeout=5)
+            worker.submit(2, 4)
+            assert worker.take(timeout=5) == (2, 4, 0.25)
+        finally:
+            worker.stop()
+
+    def test_canvas_paints_snapshot_frames(self, painting_renderer):
+        """Test that update_display submits a snapshot and paints the finished frame"""
+        from RenderThread import RenderThread
+
+        renderer = painting_renderer
+        renderer.root = RecordingRoot()
+        renderer.fps_label = RecordingLabel()
+        renderer.frame_count = 0
+        renderer.last_time = float("inf")
+        renderer.render_thread = RenderThread(renderer.core.render).start()
+        try:
+            renderer.update_display()
+            # Input after the snapshot does not leak into the frame being rendered
+            renderer.light_pos[0] = 60
+            finished = renderer.render_thread.take(timeout=10)
+            _, scene, frame = finished
+            assert scene.light_pos == (20, 15)
+            renderer.paint_frame(*frame, scene=scene)
+            assert renderer.cells_repainted == len(renderer.cells)
+            assert len(renderer.root.scheduled) == 1
+
+            # The next tick sees the new revision only after invalidate
+            renderer.invalidate()
+            renderer.update_display()
+            _, scene, _ = renderer.render_thread.take(timeout=10)
+            assert scene.light_pos == (60, 15)
+        finally:
+            renderer.render_thread.stop()
+
+
+class TestColorPalette:
+    """Test the integer RGB pipeline and the LRU palette"""
+
+    def test_mix_matches_hex_mix(self, headless_renderer):
+        """Test that packed mixing equals the hex string mixing"""
+        from ColorPalette import hex_to_int, int_to_hex, mix_rgb
+
+        for c1, c2, weight in [("#FFF0C8", "#00B000", 0.7), ("#123456", "#FEDCBA", 0.25), ("#000000", "#B00000", 1)]:
+            expected = headless_renderer.mix_colors(c1, c2, weight)
+            assert int_to_hex(mix_rgb(hex_to_int(c1), hex_to_int(c2), weight)) == expected.lower()
+
+    def test_palette_close_to_exact_brightness(self, headless_renderer):
+        """Test that quantized palette colors stay within one step of the exact color"""
+        from ColorPalette import hex_to_int
+
+        palette = headless_renderer.color_palette
+        for brightness in (0.01, 0.33, 0.5, 0.87, 1.0):
+            exact = headless_renderer.hex_to_rgb(headless_renderer.adjust_color_brightness("#FFF0C8", brightness))
+            quantized = headless_renderer.hex_to_rgb(palette.color(hex_to_int("#FFF0C8"), brightness))
+            assert all(abs(a - b) <= 2 for a, b in zip(exact, quantized))
+
+    def test_palette_lru_limit(self):
+        """Test that the palette evicts beyond its size limit and counts hits"""
+        from ColorPalette import ColorPalette
+
+        palette = ColorPalette(max_size=4)
+        for level in range(6):
+            palette.lookup(0xFFFFFF, level)
+        palette.lookup(0xFFFFFF, 5)
+        stats = palette.stats
+        assert stats["size"] == 4
+        assert stats["misses"] == 6
+        assert stats["hits"] == 1
+
+    def test_frames_reuse_palette(self, headless_renderer):
+        """Test that a repeated frame is served from the palette"""
+        frame = headless_renderer.calculate_lighting()
+        headless_renderer.frame_colors(*frame)
+        misses = headless_renderer.color_palette.stats["misses"]
+        headless_renderer.frame_colors(*frame)
+        assert headless_renderer.color_palette.stats["misses"] == misses
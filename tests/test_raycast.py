@@ -11,6 +11,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from RayCastTest import cast
 from Main import createMatrix
+import RayTable
+import Benchmark
+from OccupancyGrid import OccupancyGrid
 
 
 class TestRayCasting:
@@ -163,6 +166,323 @@ class TestCreateMatrix:
         assert '.' in result
 
 
+class TestNumpyEngine:
+    """Test that the NumPy engine matches the Python ray caster"""
+
+    def test_numpy_matches_python(self):
+        """Test that both engines produce identical matrices"""
+        pytest.importorskip("numpy")
+        configs = [
+            dict(circle_center=[40, 15], square_pos=[70, 10], light_pos=[1, 1]),
+            dict(circle_center=[10, 30], square_pos=[50, 5], light_pos=[60, 20]),
+            dict(circle_center=[-3, 2], square_pos=[95, 38], light_pos=[99, 0]),
+            dict(circle_center=None, square_pos=[20, 20], light_pos=[20, 20]),
+        ]
+        for config in configs:
+            expected = createMatrix(40, 100, engine="python", **config)
+            assert createMatrix(40, 100, engine="numpy", **config) == expected
+
+    def test_numpy_large_grid(self):
+        """Test the NumPy engine on a grid larger than the default"""
+        pytest.importorskip("numpy")
+        result = createMatrix(200, 400, circle_center=[100, 80], square_pos=[300, 50], light_pos=[5, 5],
+                              engine="numpy")
+        lines = result.split('\n')
+        assert len(lines) == 200
+        assert all(len(line) == 400 for line in lines)
+        assert '▒' in result
+
+    def test_unknown_engine(self):
+        """Test that an unknown engine name is rejected"""
+        with pytest.raises(ValueError):
+            createMatrix(10, 10, light_pos=[1, 1], engine="gpu")
+
+
+class TestShadowcasting:
+    """Test cases for the shadowcasting visibility method"""
+
+    def test_cast_shadowcast(self):
+        """Test that shadowcasting marks the cell behind the square"""
+        result = cast(r=6, c=6, square_pos=[2, 2], square_size=1, light_pos=[0, 0], method="shadowcast")
+        lines = result.split('\n')
+        assert lines[0][0] == '*'
+        assert lines[2][2] == '.'
+        assert lines[4][4] == '▒'
+        assert lines[0][5] == '█'
+
+    def test_shadowcast_agrees_with_raycast(self):
+        """Test that both methods agree away from shadow edges"""
+        config = dict(circle_center=[40, 15], square_pos=[70, 10], light_pos=[1, 1])
+        raycast = createMatrix(40, 100, engine="python", **config)
+        shadowcast = createMatrix(40, 100, method="shadowcast", **config)
+        assert len(shadowcast) == len(raycast)
+        agree = sum(a == b for a, b in zip(raycast, shadowcast))
+        assert agree / len(raycast) > 0.95
+        # Objects and the light are placed identically
+        assert [i for i, ch in enumerate(raycast) if ch in '.*'] == \
+            [i for i, ch in enumerate(shadowcast) if ch in '.*']
+
+    def test_shadowcast_light_outside_grid(self):
+        """Test shadowcasting with the light placed off the grid"""
+        result = createMatrix(10, 20, square_pos=[5, 5], square_size=2, light_pos=[-3, -3], method="shadowcast")
+        assert '*' not in result
+        assert '▒' in result
+
+    def test_unknown_method(self):
+        """Test that an unknown method name is rejected"""
+        with pytest.raises(ValueError):
+            cast(r=5, c=5, method="bvh")
+
+
+class TestRayTable:
+    """Test cases for the precomputed ray-path table"""
+
+    def test_table_matches_python(self):
+        """Test that the table engine produces identical matrices"""
+        configs = [
+            dict(circle_center=[40, 15], square_pos=[70, 10], light_pos=[1, 1]),
+            dict(circle_center=[10, 30], square_pos=[50, 5], light_pos=[60, 20]),
+            dict(circle_center=[20, 20], square_pos=None, light_pos=[-2, 45]),
+        ]
+        for config in configs:
+            expected = createMatrix(40, 100, engine="python", **config)
+            assert createMatrix(40, 100, engine="table", **config) == expected
+
+    def test_cast_table(self):
+        """Test that cast gives the same result with the table engine"""
+        expected = cast(r=12, c=12, square_pos=[4, 5], square_size=2, light_pos=[1, 2])
+        assert cast(r=12, c=12, square_pos=[4, 5], square_size=2, light_pos=[1, 2], engine="table") == expected
+
+    def test_matches_march_on_large_grid(self):
+        """Test that samples rounding onto an integer are marched, on a grid beyond 40x100"""
+        rows, cols = 200, 180
+        table = RayTable.RayPathTable(rows, cols)
+        occupied = bytearray(rows * cols)
+        occupied[175 * cols + 163] = 1
+        lx, ly = 171, 199
+        # Along (-7, -24) steps, ux * t comes out just below -7 where the march samples x = 164
+        assert table.path(-35, -120) is None
+
+        lit = table.lit_flags(occupied, (lx, ly))
+        for y in range(rows):
+            for x in range(cols):
+                if not occupied[y * cols + x]:
+                    assert lit[y * cols + x] != RayTable.march_blocked(occupied, rows, cols, lx, ly, x, y), (x, y)
+        assert all(lit[y * cols + x] for x, y in [(136, 79), (143, 103), (150, 127), (157, 151)])
+
+    def test_radius_cap_bounds_memory(self):
+        """Test that capping the radius shrinks the table and keeps results"""
+        full = RayTable.RayPathTable(30, 30, max_radius=None)
+        capped = RayTable.RayPathTable(30, 30, max_radius=10)
+        assert capped.nbytes < full.nbytes
+        assert capped.path(15, 0) is None
+        assert list(capped.path(3, 0)) == [1, 2]
+
+        occupied = bytearray(30 * 30)
+        occupied[10 * 30 + 12] = 1
+        assert capped.lit_flags(occupied, (2, 10)) == full.lit_flags(occupied, (2, 10))
+
+
+class TestDistanceField:
+    """Test cases for distance fields and sphere-traced shadow rays"""
+
+    @pytest.mark.parametrize("use_numpy", [False, True])
+    def test_field_is_chebyshev_distance(self, monkeypatch, use_numpy):
+        """Test both transforms against a brute-force distance"""
+        import random
+        import DistanceField
+        import ShadowKernels
+
+        if use_numpy:
+            pytest.importorskip("numpy")
+        monkeypatch.setattr(ShadowKernels, "HAS_NUMPY", use_numpy)
+        rng = random.Random(5)
+        cols, rows = 23, 17
+        occupied = bytearray(1 if rng.random() < 0.04 else 0 for _ in range(cols * rows))
+        occupied_cells = [(i % cols, i // cols) for i in range(cols * rows) if occupied[i]]
+        expected = [min(max(abs(x - ox), abs(y - oy)) for ox, oy in occupied_cells)
+                    for y in range(rows) for x in range(cols)]
+        assert list(DistanceField.distance_field(occupied, cols, rows)) == expected
+        assert set(DistanceField.distance_field(bytearray(12), 4, 3)) == {7}
+
+    def test_sdf_matches_python(self):
+        """Test that sphere tracing gives the march's matrices"""
+        configs = [
+            dict(circle_center=[40, 15], square_pos=[70, 10], light_pos=[1, 1]),
+            dict(circle_center=[10, 30], square_pos=[50, 5], light_pos=[60, 20]),
+            dict(circle_center=[20, 20], square_pos=None, light_pos=[-2, 45]),
+        ]
+        for config in configs:
+            expected = createMatrix(40, 100, engine="python", **config)
+            assert createMatrix(40, 100, engine="sdf", **config) == expected
+
+    def test_trace_skips_empty_space(self):
+        """Test that a long ray through empty space reads few field cells"""
+        import DistanceField
+
+        cols, rows = 200, 10
+        occupied = bytearray(cols * rows)
+        occupied[5 * cols + 150] = 1
+        field = DistanceField.distance_field(occupied, cols, rows)
+
+        class CountingField(list):
+            reads = 0
+
+            def __getitem__(self, index):
+                CountingField.reads += 1
+                return list.__getitem__(self, index)
+
+        counting = CountingField(field)
+        assert DistanceField.traced_blocked(counting, rows, cols, 0, 5, 199, 5)
+        assert CountingField.reads < 20
+        assert not DistanceField.traced_blocked(counting, rows, cols, 0, 5, 140, 5)
+
+
+class TestShapeIndex:
+    """Test cases for analytic occluders and their spatial index"""
+
+    def test_segment_intersections(self):
+        """Test exact segment tests, including grazing segments"""
+        from ShapeIndex import Ellipse, Rect
+
+        circle = Ellipse(10, 10, 3, 3)
+        assert circle.intersects_segment(0, 10, 20, 10)
+        assert not circle.intersects_segment(0, 13, 20, 13)  # Tangent
+        assert not circle.intersects_segment(0, 10, 6, 10)  # Stops short
+        assert circle.intersects_segment(10, 10, 30, 30)  # Starts inside
+
+        box = Rect(2, 2, 4, 6)
+        assert box.intersects_segment(0, 0, 6, 8)
+        assert box.intersects_segment(3, 0, 3, 10)
+        assert not box.intersects_segment(2, 0, 2, 10)  # Along an edge
+        assert not box.intersects_segment(0, 4, 1.5, 4)
+
+    def test_polygon(self):
+        """Test polygon containment and segments through its vertices"""
+        from ShapeIndex import Polygon, shape_cells
+
+        square = Polygon([(0, 0), (4, 0), (4, 4), (0, 4)])
+        assert square.contains(2, 2) and not square.contains(5, 2)
+        assert square.intersects_segment(-1, 5, 5, -1)  # Enters and leaves through corners
+        assert not square.intersects_segment(-1, 4, 5, 4)  # Along an edge
+        assert not square.intersects_segment(-1, 1, 1, -1)  # Through a corner only
+        triangle = Polygon([(0, 0), (8, 0), (4, 6)], "#123456")
+        assert triangle.intersects_segment(4, -2, 4, 10)
+        assert shape_cells(triangle, 5, 5) == tuple(
+            y * 5 + x for y in range(5) for x in range(5) if triangle.contains(x, y))
+
+    def test_index_matches_brute_force(self):
+        """Test that the index finds every hit among hundreds of shapes"""
+        import random
+        from ShapeIndex import Ellipse, Rect, ShapeIndex
+
+        rng = random.Random(7)
+        shapes = []
+        for _ in range(300):
+            x, y = rng.uniform(-5, 205), rng.uniform(-5, 145)
+            if rng.random() < 0.5:
+                shapes.append(Ellipse(x, y, rng.uniform(0.5, 3), rng.uniform(0.5, 3)))
+            else:
+                shapes.append(Rect(x, y, x + rng.uniform(0.5, 6), y + rng.uniform(0.5, 6)))
+        index = ShapeIndex(shapes)
+        for _ in range(500):
+            ax, ay, bx, by = (rng.uniform(0, 200) for _ in range(4))
+            assert index.blocked(ax, ay, bx, by) == any(
+                shape.intersects_segment(ax, ay, bx, by) for shape in shapes)
+
+        # A short segment only looks at the shapes next to it
+        assert len(list(index.candidates(100, 70, 103, 70))) < 20
+
+    def test_create_matrix_analytic(self):
+        """Test the analytic engine against the cell march"""
+        config = dict(circle_center=[40, 15], square_pos=[70, 10], light_pos=[1, 1])
+        marched = createMatrix(40, 100, engine="python", **config)
+        exact = createMatrix(40, 100, engine="analytic", **config)
+        assert [i for i, char in enumerate(exact) if char in '.*\n'] == \
+            [i for i, char in enumerate(marched) if char in '.*\n']
+        # Only cells along shadow edges may differ
+        assert sum(a != b for a, b in zip(exact, marched)) < 0.02 * len(exact)
+
+    def test_create_matrix_extra_shapes(self):
+        """Test that extra shapes occlude with every engine"""
+        from ShapeIndex import Rect
+
+        wall = [Rect(9.5, 0, 10.5, 6)]
+        for engine in ("python", "table", "analytic"):
+            result = createMatrix(20, 30, light_pos=[2, 5], engine=engine, shapes=wall).split('\n')
+            assert result[5][10] == '.'
+            assert result[5][25] == '▒'
+            assert result[15][25] == '█'
+
+
+class TestOccupancyGrid:
+    """Test cases for the flat occupancy bitmap"""
+
+    def test_fill_and_contains(self):
+        """Test filling cells and rectangles, clipped to the grid"""
+        grid = OccupancyGrid(8, 4)
+        grid.fill(1, 1)
+        grid.fill(20, 1)
+        grid.fill_rect(6, 2, 5, 5, grid.material("#B00000"))
+        assert (1, 1) in grid
+        assert (20, 1) not in grid
+        assert list(grid) == [(1, 1), (6, 2), (7, 2), (6, 3), (7, 3)]
+        assert len(grid) == 5
+        assert grid.color_at(7, 3) == "#B00000"
+        assert grid.color_at(1, 1, "#FFFFFF") == "#FFFFFF"
+        assert grid.nbytes == 2 * 8 * 4
+
+    def test_changed_cells(self):
+        """Test diffing against a previous snapshot"""
+        grid = OccupancyGrid(6, 6)
+        grid.fill_rect(1, 1, 2, 2)
+        previous = bytes(grid.cells)
+        grid.cells[1 * 6 + 1] = 0
+        grid.fill(4, 5)
+        assert grid.changed_cells(previous) == {(1, 1), (4, 5)}
+
+    def test_benchmark_shows_smaller_store(self):
+        """Test that the bitmap needs less memory and no tuple keys"""
+        results = Benchmark.compare_occupancy(20, 40)
+        assert results["grid"]["bytes_per_cell"] < results["set"]["bytes_per_cell"]
+        assert results["grid"]["tuple_keys"] == 0 < results["set"]["tuple_keys"]
+        assert results["grid"]["shadowed"] == results["set"]["shadowed"]
+
+
+class TestBenchmarkSuite:
+    """Test the benchmark sweep on tiny grids"""
+
+    def test_suite_covers_every_caster(self):
+        """Test that each caster is timed, with reflections only for the lighting pass"""
+        results = Benchmark.run_suite(sizes=((8, 12),), lights=("corner",), repeat=2)
+        assert [(r["caster"], r["reflections"]) for r in results] == [
+            ("cast", False), ("createMatrix", False),
+            ("calculate_lighting", False), ("calculate_lighting", True),
+        ]
+        for result in results:
+            assert 0 < result["median_ms"] <= result["p95_ms"]
+            assert result["peak_bytes"] > 0
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        samples = list(range(1, 21))
+        assert Benchmark.percentile(samples, 0.95) == 19
+        assert Benchmark.percentile(samples, 0.5) == 10
+        assert Benchmark.percentile([3], 0.95) == 3
+
+    def test_json_output(self, tmp_path, capsys):
+        """Test that --output writes machine-readable results"""
+        import json
+
+        path = tmp_path / "bench.json"
+        Benchmark.main(["--sizes", "6x10", "--lights", "center", "--casters", "createMatrix",
+                        "--repeat", "1", "--output", str(path)])
+        report = json.loads(path.read_text())
+        assert report["results"][0]["caster"] == "createMatrix"
+        assert report["results"][0]["light_pos"] == [5, 3]
+        assert "createMatrix" in capsys.readouterr().out
+
+
 class TestRayGeometry:
     """Test geometric calculations used in ray casting"""
 
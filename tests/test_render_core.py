@@ -0,0 +1,749 @@
+"""
+Unit tests for the headless rendering core
+"""
+import pytest
+import subprocess
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import RenderCore
+from RenderCore import Scene, Renderer, render
+
+
+class TestRenderCore:
+    """Test rendering scenes without a display"""
+
+    def test_frame_buffers_match_grid(self):
+        """Test that render returns grid-sized intensity and color buffers"""
+        frame = render(Scene(grid_width=30, grid_height=20, circle_center=(10, 10), square_pos=(20, 5),
+                             light_pos=(2, 2), lighting_engine="python"))
+        assert len(frame.intensity) == 20
+        assert len(frame.color[0]) == 30
+        assert frame.occupancy.width == 30
+        assert frame.intensity[2][2] == 200  # Light source cell is doubled
+
+    def test_objects_cast_shadows(self):
+        """Test that cells behind the square get no direct light"""
+        frame = render(Scene(grid_width=30, grid_height=20, circle_center=(-20, -20), square_pos=(10, 8),
+                             light_pos=(2, 10), enable_reflections=False, lighting_engine="python"))
+        assert (10, 10) in frame.occupancy
+        assert frame.intensity[10][25] == 0
+        assert frame.intensity[10][5] > 0
+
+    def test_canvas_renderer_uses_core(self, headless_renderer):
+        """Test that the canvas renderer's frames come from the core"""
+        headless_renderer.lighting_engine = "python"
+        expected = Renderer().render(headless_renderer.snapshot_scene())
+        assert headless_renderer.calculate_lighting() == expected
+
+    def test_snapshot_is_independent(self, headless_renderer):
+        """Test that moving objects after a snapshot leaves the scene unchanged"""
+        scene = headless_renderer.snapshot_scene()
+        headless_renderer.light_pos[0] += 5
+        assert scene.light_pos == (20, 15)
+
+    def test_renderers_keep_separate_caches(self):
+        """Test that each Renderer has its own incremental state"""
+        scene = Scene(lighting_engine="python")
+        first, second = Renderer(), Renderer()
+        first.render(scene)
+        assert first.direct_cache is not None
+        assert second.direct_cache is None
+
+    def test_imports_without_tkinter(self):
+        """Test that the core and Main load without importing tkinter"""
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        code = "import sys, RenderCore, Main; sys.exit('tkinter' in sys.modules)"
+        assert subprocess.run([sys.executable, "-c", code], cwd=root).returncode == 0
+
+    def test_create_matrix_reexported(self):
+        """Test that Main still exposes the ASCII renderer"""
+        import Main
+        assert Main.createMatrix is RenderCore.createMatrix
+
+
+def _small_scene(**settings):
+    settings.setdefault("lighting_engine", "python")
+    settings.setdefault("enable_reflections", False)
+    settings.setdefault("square_pos", (28, 6))
+    return Scene(grid_width=40, grid_height=24, circle_center=(14, 10), circle_radius=4, **settings)
+
+
+class TestMultipleLights:
+    """Test that several lights are lit independently and summed"""
+
+    LIGHTS = [((3, 3), 100, "#FFF0C8"), ((36, 20), 60, "#4060FF"), ((20, 22), 80, "#FF4000")]
+
+    def test_intensity_is_sum_of_lights(self):
+        """Test that each cell gets the sum of the single-light intensities"""
+        frame = Renderer().render(_small_scene(lights=self.LIGHTS))
+        singles = [Renderer().render(_small_scene(lights=[light])) for light in self.LIGHTS]
+        for y in range(24):
+            for x in range(40):
+                expected = sum(single.intensity[y][x] for single in singles)
+                assert frame.intensity[y][x] == pytest.approx(expected)
+
+    def test_colors_weighted_by_intensity(self):
+        """Test that a cell lit by one light keeps its color and mixed cells blend"""
+        lights = [((3, 3), 100, "#FF0000"), ((35, 3), 100, "#0000FF")]
+        frame = Renderer().render(_small_scene(lights=lights, square_pos=(60, 60)))
+        assert frame.color[3][3] != 0
+        # Equidistant from both lights: an even mix
+        assert frame.color[3][19] in (0x7F007F, 0x800080, 0x7F0080, 0x80007F)
+        assert frame.color[3][3] >> 16 > frame.color[3][3] & 0xFF
+
+    @pytest.mark.parametrize("engine", ["table", "numpy"])
+    def test_engines_match_python_fields(self, engine):
+        """Test that every engine gives the same per-light fields"""
+        if engine == "numpy":
+            pytest.importorskip("numpy")
+        expected = Renderer().render(_small_scene(lights=self.LIGHTS))
+        frame = Renderer().render(_small_scene(lights=self.LIGHTS, lighting_engine=engine))
+        assert frame.color == expected.color
+        for row, expected_row in zip(frame.intensity, expected.intensity):
+            assert row == pytest.approx(expected_row, rel=1e-5, abs=1e-4)
+
+    def test_pool_matches_serial(self):
+        """Test that worker processes over shared memory give the serial result"""
+        scene = _small_scene(lights=self.LIGHTS)
+        expected = Renderer().render(scene)
+        renderer = Renderer(workers=2)
+        try:
+            assert renderer.render(scene) == expected
+            block = renderer.light_pool._shared.name
+            # The next frame reuses the block, with the new occupancy copied in
+            moved = _small_scene(lights=self.LIGHTS, square_pos=(10, 16))
+            assert renderer.render(moved) == Renderer().render(moved)
+            assert renderer.light_pool._shared.name == block
+        finally:
+            renderer.close()
+        assert renderer.light_pool._shared is None
+
+    def test_invalid_worker_count(self):
+        """Test that zero workers is rejected"""
+        from LightPool import LightPool
+        with pytest.raises(ValueError):
+            LightPool(0)
+
+    def test_canvas_fixed_lights(self, headless_renderer):
+        """Test that lights dropped on the canvas join the scene"""
+        headless_renderer.extra_lights = [((50, 40), 100, "#FFFFFF")]
+        scene = headless_renderer.snapshot_scene()
+        assert [light.pos for light in scene.lights] == [(20, 15), (50, 40)]
+        assert scene.light_pos == (20, 15)
+
+
+class TestDistanceFieldEngine:
+    """Test the sphere-traced lighting engine"""
+
+    @pytest.mark.parametrize("lights", [None, TestMultipleLights.LIGHTS])
+    def test_matches_python(self, lights):
+        """Test that sphere-traced frames equal marched frames"""
+        expected = Renderer().render(_small_scene(lights=lights, enable_reflections=True))
+        frame = Renderer().render(_small_scene(lights=lights, enable_reflections=True, lighting_engine="sdf"))
+        assert frame.intensity == expected.intensity
+        assert frame.color == expected.color
+
+    def test_field_rebuilt_only_when_occluders_move(self):
+        """Test that the distance field is cached by occupancy"""
+        import DistanceField
+
+        occupied = bytearray(40 * 24)
+        occupied[100] = 1
+        field = DistanceField.get_field(occupied, 40, 24)
+        assert DistanceField.get_field(bytearray(occupied), 40, 24) is field
+        occupied[101] = 1
+        assert DistanceField.get_field(occupied, 40, 24) is not field
+
+
+class TestSoftShadows:
+    """Test disc lights with adaptively sampled soft shadows"""
+
+    def test_radius_zero_is_a_point_light(self):
+        """Test that a disc of radius 0 renders like the point light"""
+        expected = Renderer().render(_small_scene(light_pos=(6, 6)))
+        frame = Renderer().render(_small_scene(lights=[((6, 6), 100, "#FFF0C8", 0)]))
+        assert frame.intensity == expected.intensity
+
+    def test_penumbra_is_partly_lit(self):
+        """Test that shadow edges get fractional visibility, never more than the point light's falloff"""
+        point = Renderer().render(_small_scene(light_pos=(6, 6))).intensity
+        soft = Renderer().render(_small_scene(light_pos=(6, 6), light_radius=2)).intensity
+        pairs = [(a, b) for row_a, row_b in zip(point, soft) for a, b in zip(row_a, row_b)]
+        assert any(a > 0 and 0 < b < a for a, b in pairs)  # Lit by the point, partly hidden disc
+        assert any(a == 0 and b > 0 for a, b in pairs)  # Shadowed from the center, not the rim
+
+    def test_only_penumbra_cells_are_supersampled(self):
+        """Test that fully lit and umbra cells stop after the probe rays"""
+        import SoftShadows
+
+        renderer = Renderer()
+        renderer.render(_small_scene(light_pos=(6, 6), light_radius=2, shadow_samples=16))
+        stats = renderer.soft_shadow_stats
+        assert stats.penumbra_cells > 0
+        # The light's own cell casts no rays
+        probed = stats.cells - 1
+        assert stats.rays == probed * SoftShadows.PROBE_RAYS + stats.penumbra_cells * (16 - SoftShadows.PROBE_RAYS)
+        assert stats.samples_per_cell < 16 / 2
+
+    def test_stats_reset_for_point_lights(self):
+        """Test that a frame without disc lights reports no soft-shadow rays"""
+        renderer = Renderer()
+        renderer.render(_small_scene(light_radius=2))
+        renderer.render(_small_scene())
+        assert renderer.soft_shadow_stats.cells == 0
+
+
+class TestPreview:
+    """Test coarse preview frames"""
+
+    def test_coarse_scene(self):
+        """Test that the coarse scene covers the grid with factor-sized blocks"""
+        from ShapeIndex import Rect
+
+        scene = RenderCore.coarse_scene(_small_scene(light_pos=(6, 7), shapes=[Rect(9.5, 1.5, 13.5, 5.5)]), 4)
+        assert (scene.grid_width, scene.grid_height) == (10, 6)
+        assert scene.light_pos == (1, 1) and scene.light_intensity == 25
+        # Full cells 10 .. 13 fall in coarse cells 2 and 3, whose centers it now covers
+        assert scene.shapes[0][:4] == (2, 0, 3, 1)
+
+    def test_preview_keeps_full_size_and_sharp_occluders(self):
+        """Test that a preview frame has the full grid size and occupancy"""
+        expected = Renderer().render(_small_scene(enable_reflections=True))
+        frame = Renderer().render(_small_scene(enable_reflections=True, downsample=4))
+        assert frame.occupancy == expected.occupancy
+        assert [len(row) for row in frame.intensity] == [40] * 24
+        assert [len(row) for row in frame.color] == [40] * 24
+
+    @pytest.mark.parametrize("factor", [2, 4])
+    def test_preview_falloff_follows_full_frame(self, factor):
+        """Test that coarse intensities stay close to the full frame's away from the light"""
+        settings = dict(grid_width=40, grid_height=24, circle_center=None, square_pos=None, light_pos=(6, 6),
+                        enable_reflections=False, lighting_engine="python")
+        expected = Renderer().render(Scene(**settings)).intensity
+        preview = Renderer().render(Scene(downsample=factor, **settings)).intensity
+        for y in range(24):
+            for x in range(40):
+                if (x - 6) ** 2 + (y - 6) ** 2 >= 64:
+                    assert preview[y][x] == pytest.approx(expected[y][x], rel=0.3)
+
+
+class TestFrameTiming:
+    """Test per-stage frame timings"""
+
+    @pytest.mark.parametrize("downsample", [1, 4])
+    def test_renderer_times_its_stages(self, downsample):
+        """Test that a timed scene records rasterization, shadows and reflections"""
+        from FrameTiming import FrameTiming
+
+        timing = FrameTiming()
+        Renderer().render(_small_scene(enable_reflections=True, downsample=downsample, timing=timing))
+        assert all(timing.stages[stage] > 0 for stage in ("rasterize", "shadows", "reflections"))
+        assert timing.stages["colors"] == timing.stages["paint"] == 0
+
+    def test_ring_buffer_and_csv(self, tmp_path):
+        """Test that the ring keeps the newest frames and the CSV file gets every frame"""
+        import csv
+        from FrameTiming import FrameTimer, STAGES
+
+        timer = FrameTimer(capacity=3, enabled=True)
+        path = tmp_path / "timings.csv"
+        timer.open_csv(str(path))
+        for index in range(5):
+            timing = timer.frame()
+            timing.stages["shadows"] = index / 1000
+            timer.record(timing)
+        timer.close()
+
+        assert [timing.stages["shadows"] for timing in timer.frames] == [0.002, 0.003, 0.004]
+        assert timer.averages()["shadows"] == pytest.approx(0.003)
+        with open(path, newline="") as fh:
+            rows = list(csv.reader(fh))
+        assert rows[0] == ["frame", "cached"] + [f"{stage}_ms" for stage in STAGES] + ["total_ms"]
+        assert [row[:2] for row in rows[1:]] == [[str(index), "0"] for index in range(1, 6)]
+        assert float(rows[-1][-1]) == pytest.approx(4)
+
+    def test_cache_hits_are_marked(self):
+        """Test that a cached frame times its lookup and stays out of the lighting averages"""
+        from FrameCache import FrameCache
+        from FrameTiming import FrameTimer, LIGHTING_STAGES
+
+        renderer = Renderer(frame_cache=FrameCache())
+        timer = FrameTimer(enabled=True)
+        for _ in range(2):
+            timing = timer.frame()
+            renderer.render(_small_scene(enable_reflections=True, timing=timing))
+            timer.record(timing)
+
+        lit, cached = timer.frames
+        assert not lit.cached and cached.cached
+        assert lit.stages["cache"] > 0 and cached.stages["cache"] > 0
+        assert all(cached.stages[stage] == 0 for stage in LIGHTING_STAGES)
+        averages = timer.averages()
+        assert all(averages[stage] == lit.stages[stage] for stage in LIGHTING_STAGES)
+        assert "(2 frames, 1 cached)" in timer.summary()
+
+    def test_disabled_timer_makes_no_records(self):
+        """Test that a disabled timer hands out no records"""
+        from FrameTiming import FrameTimer
+
+        assert FrameTimer().frame() is None
+
+
+class TestFrameCache:
+    """Test frames cached by scene state"""
+
+    def test_recurring_scene_is_a_hit(self):
+        """Test that a scene lit before comes back from the cache, equal to a fresh render"""
+        from FrameCache import FrameCache
+
+        renderer = Renderer(frame_cache=FrameCache())
+        first = renderer.render(_small_scene(enable_reflections=True))
+        renderer.render(_small_scene(enable_reflections=True, light_pos=(5, 5)))
+        again = renderer.render(_small_scene(enable_reflections=True))
+        assert again == first == Renderer().render(_small_scene(enable_reflections=True))
+        assert (renderer.frame_cache.stats["hits"], renderer.frame_cache.stats["misses"]) == (1, 2)
+
+        # A hit reports the soft-shadow rays its frame took
+        renderer.render(_small_scene(light_radius=2))
+        stats = renderer.soft_shadow_stats
+        renderer.render(_small_scene())
+        renderer.render(_small_scene(light_radius=2))
+        assert stats.rays > 0 and renderer.soft_shadow_stats == stats
+
+        # Hits hand out fresh rows
+        again.intensity[0][0] = -1
+        assert renderer.render(_small_scene(enable_reflections=True)).intensity == first.intensity
+
+    def test_key_follows_scene_state(self):
+        """Test that the key changes with what changes the frame, and ignores the rest"""
+        from FrameCache import scene_key
+        from FrameTiming import FrameTiming
+
+        key = scene_key(_small_scene())
+        assert scene_key(_small_scene(timing=FrameTiming(), incremental_shadows=False)) == key
+        for settings in [dict(light_pos=(5, 5)), dict(light_intensity=50), dict(enable_reflections=True),
+                         dict(reflection_seed=1), dict(square_pos=(20, 6)), dict(downsample=2)]:
+            assert scene_key(_small_scene(**settings)) != key
+
+    def test_lru_eviction_within_budget(self):
+        """Test that the least recently used frame is evicted to stay within the byte budget"""
+        from FrameCache import FrameCache
+
+        # Intensity, color and occupancy bytes of one 40x24 frame
+        frame_bytes = 40 * 24 * (8 + 4 + 2)
+        cache = FrameCache(max_bytes=2 * frame_bytes)
+        renderer = Renderer(frame_cache=cache)
+        for pos in [(1, 1), (2, 2), (1, 1), (3, 3)]:
+            renderer.render(_small_scene(light_pos=pos))
+        assert cache.stats == {"hits": 1, "misses": 3, "evictions": 1, "size": 2, "bytes": 2 * frame_bytes,
+                               "max_bytes": 2 * frame_bytes}
+        # (2, 2) was the least recently used
+        renderer.render(_small_scene(light_pos=(1, 1)))
+        renderer.render(_small_scene(light_pos=(2, 2)))
+        assert (cache.hits, cache.misses) == (2, 4)
+
+    def test_frame_over_budget_is_not_cached(self):
+        """Test that a frame larger than the whole budget is skipped"""
+        from FrameCache import FrameCache
+
+        cache = FrameCache(max_bytes=100)
+        Renderer(frame_cache=cache).render(_small_scene())
+        assert len(cache) == 0 and cache.nbytes == 0
+
+
+class TestAnalyticShadows:
+    """Test the analytic lighting engine"""
+
+    def test_lit_cells_follow_exact_segments(self):
+        """Test that a cell is lit exactly when no shape crosses its ray"""
+        from ShapeIndex import Ellipse, Rect
+
+        shapes = [Ellipse(12, 6, 1.5, 1), Rect(25.5, 14.5, 27.5, 19.5, "#0000FF")]
+        scene = _small_scene(lighting_engine="analytic", enable_reflections=False, shapes=shapes)
+        frame = Renderer().render(scene)
+        every_shape = RenderCore.scene_shapes(scene)
+        lx, ly = scene.light_pos
+        for y in range(scene.grid_height):
+            for x in range(scene.grid_width):
+                if (x, y) in frame.occupancy or (x, y) == (lx, ly):
+                    continue
+                blocked = any(shape.intersects_segment(lx, ly, x, y) for shape in every_shape)
+                assert (frame.intensity[y][x] == 0) == blocked
+        assert frame.occupancy.color_at(26, 17, None) == "#0000FF"
+
+    def test_pool_matches_serial(self):
+        """Test analytic fields in worker processes"""
+        from ShapeIndex import Rect
+
+        scene = _small_scene(lighting_engine="analytic", enable_reflections=False, lights=TestMultipleLights.LIGHTS,
+                             shapes=[Rect(30, 2, 31, 8)])
+        serial = Renderer().render(scene)
+        pooled_renderer = Renderer(workers=2)
+        try:
+            pooled = pooled_renderer.render(scene)
+        finally:
+            pooled_renderer.close()
+        assert pooled.intensity == serial.intensity
+        assert pooled.color == serial.color
+
+
+class TestReflections:
+    """Test the batched, seeded reflection pass"""
+
+    def _scene(self, **settings):
+        settings.setdefault("enable_reflections", True)
+        settings.setdefault("diffusion_amount", 0.5)
+        settings.setdefault("square_pos", (26, 4))
+        return _small_scene(square_size=6, **settings)
+
+    def test_frames_are_reproducible(self):
+        """Test that a seed fixes the diffusion jitter of a frame"""
+        scene = self._scene(reflection_seed=3)
+        first = Renderer().render(scene)
+        assert Renderer().render(scene).intensity == first.intensity
+        assert Renderer().render(scene).color == first.color
+        assert Renderer().render(self._scene(reflection_seed=4)).intensity != first.intensity
+
+    def test_numpy_matches_python(self, monkeypatch):
+        """Test that the batched NumPy march gives the same samples as the loops"""
+        pytest.importorskip("numpy")
+        import random
+        import ShadowKernels
+
+        scene = self._scene(lights=TestMultipleLights.LIGHTS)
+        circle_cells, circle_reflective = RenderCore.rasterize_circle(scene)
+        square_cells, square_reflective = RenderCore.rasterize_square(scene)
+        frame = Renderer().render(scene)
+        reflective = circle_reflective | square_reflective
+
+        def samples():
+            rng = random.Random(scene.reflection_seed)
+            return [RenderCore.reflection_samples(scene, frame.occupancy, reflective, light, rng)
+                    for light in scene.lights]
+
+        batched = samples()
+        monkeypatch.setattr(ShadowKernels, "HAS_NUMPY", False)
+        assert samples() == batched
+        assert sum(len(light_samples) for light_samples in batched) > 100
+
+    def test_blend_is_weighted_average(self):
+        """Test that reflected colors are averaged by intensity per channel"""
+        intensity = [[0, 30.0]]
+        color = [[0, 0xFF0000]]
+        RenderCore.blend_reflections(intensity, color, [(1, 0, 10.0, 0x0000FF), (1, 0, 20.0, 0x00FF00),
+                                                        (0, 0, 5.0, 0x102030)])
+        assert intensity == [[5.0, 60.0]]
+        assert color == [[0x102030, int(30 * 255 / 60 + 0.5) << 16 | int(20 * 255 / 60 + 0.5) << 8 |
+                          int(10 * 255 / 60 + 0.5)]]
+
+
+class TestSceneFile:
+    """Test loading scenes with any number of shapes"""
+
+    SCENE = {
+        "grid": [40, 24],
+        "lights": [{"pos": [2, 2], "intensity": 100, "color": "#FFF0C8"}, [[37, 20], 50, "#4060FF", 2]],
+        "lighting_engine": "python",
+        "enable_reflections": False,
+        "shapes": [
+            {"type": "circle", "center": [10, 10], "radius": 3, "color": "#00B000"},
+            {"type": "ellipse", "center": [30, 5], "radii": [4, 2]},
+            {"type": "rect", "pos": [20, 15], "size": [3, 2], "color": "#B00000"},
+            {"type": "polygon", "points": [[5, 18], [12, 18], [8, 23]], "color": "#0000FF"},
+        ],
+    }
+
+    def test_load_scene(self, tmp_path):
+        """Test that every shape type is placed and the built-in objects are left out"""
+        import json
+        import SceneFile
+
+        path = tmp_path / "scene.json"
+        path.write_text(json.dumps(self.SCENE))
+        scene = SceneFile.load_scene(str(path))
+        assert (scene.grid_width, scene.grid_height, len(scene.lights), len(scene.shapes)) == (40, 24, 2, 4)
+        assert scene.circle_center is None and scene.square_pos is None
+        assert [light.radius for light in scene.lights] == [0, 2]
+
+        occupancy = Renderer().render(scene).occupancy
+        assert occupancy.color_at(10, 10) == "#00B000"
+        assert occupancy.color_at(30, 5) == "#808080"
+        assert {cell for cell in occupancy if occupancy.color_at(*cell) == "#B00000"} == {
+            (x, y) for x in range(20, 23) for y in range(15, 17)}
+        assert occupancy.color_at(8, 20) == "#0000FF"
+        assert (40, 15) not in occupancy
+
+    @pytest.mark.parametrize("shape", [{"type": "star"}, {"type": "rect", "pos": [1, 1]}])
+    def test_invalid_shapes(self, shape):
+        """Test that bad shape entries raise ValueError"""
+        import SceneFile
+
+        with pytest.raises(ValueError):
+            SceneFile.scene_settings({"shapes": [shape]})
+
+    def test_rasterizes_bounding_box_only(self, monkeypatch):
+        """Test that a small shape on a large grid only tests its own box"""
+        import ShapeIndex
+
+        tested = []
+        original = ShapeIndex.Polygon.contains
+        monkeypatch.setattr(ShapeIndex.Polygon, "contains",
+                            lambda shape, x, y: tested.append((x, y)) or original(shape, x, y))
+        cells = ShapeIndex.shape_cells(ShapeIndex.Polygon([(-3, 2), (4, 2), (4, 9)]), 2000, 2000)
+        assert len(cells) > 0
+        assert len(tested) == 5 * 8  # Columns 0-4 of rows 2-9, clipped to the grid
+
+    def test_batch_render_scene_file(self, tmp_path):
+        """Test the batch renderer with a scene file of shapes"""
+        import json
+        import BatchRender
+
+        path = tmp_path / "scene.json"
+        path.write_text(json.dumps(self.SCENE))
+        BatchRender.main(["--scene", str(path), "--path", "2,2:37,2", "--frames", "2", "--workers", "1",
+                          "--output", str(tmp_path / "out")])
+        assert len(list((tmp_path / "out").iterdir())) == 2
+
+
+class TestBatchRender:
+    """Test the offline batch renderer"""
+
+    SETTINGS = {"grid_width": 30, "grid_height": 20, "circle_center": [10, 10], "circle_radius": 3,
+                "square_pos": [20, 5], "enable_reflections": False, "lighting_engine": "python"}
+
+    def test_trajectory_constant_speed(self):
+        """Test that positions follow the polyline and hit both ends"""
+        import BatchRender
+
+        positions = BatchRender.trajectory([(0, 0), (10, 0), (10, 10)], 5)
+        assert positions == [(0, 0), (5, 0), (10, 0), (10, 5), (10, 10)]
+        assert BatchRender.trajectory([(0, 0), (8, 0)], 4, loop=True) == [(0, 0), (4, 0), (8, 0), (4, 0)]
+        assert BatchRender.trajectory([(3, 4)], 2) == [(3, 4), (3, 4)]
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_frames_written_in_order(self, tmp_path, workers):
+        """Test that pooled rendering writes the same frames as a serial loop"""
+        import BatchRender
+
+        positions = [(2, 2), (5, 3), (8, 4), (11, 5), (14, 6)]
+        count, _ = BatchRender.render_sequence(self.SETTINGS, positions, str(tmp_path), "ppm", workers, in_flight=2)
+        assert count == 5
+        for index, light_pos in enumerate(positions):
+            scene = BatchRender.scene_for(self.SETTINGS, light_pos)
+            expected = BatchRender.encode_frame(scene, Renderer().render(scene), "ppm")
+            assert (tmp_path / f"frame_{index:05d}.ppm").read_bytes() == expected
+
+    def test_ppm_shading(self):
+        """Test that the light, objects and shadows are shaded like the canvas"""
+        scene = Scene(light_pos=(2, 2), **self.SETTINGS)
+        frame = Renderer().render(scene)
+        rgb = RenderCore.shade_rgb(scene, frame)
+        assert len(rgb) == 3 * 30 * 20
+        assert rgb[3 * (2 * 30 + 2):3 * (2 * 30 + 3)] == bytes.fromhex("FFF0C8")
+        assert rgb[3 * (10 * 30 + 10):3 * (10 * 30 + 11)] == bytes.fromhex("00B000")
+
+    def test_cli_reports_fps(self, tmp_path, capsys):
+        """Test the console entry point end to end"""
+        import json
+        import BatchRender
+
+        scene_file = tmp_path / "scene.json"
+        scene_file.write_text(json.dumps(self.SETTINGS))
+        BatchRender.main(["--scene", str(scene_file), "--path", "1,1:28,18", "--frames", "3",
+                          "--format", "intensity", "--workers", "1", "--output", str(tmp_path / "out")])
+        assert sorted(p.name for p in (tmp_path / "out").iterdir()) == [
+            "frame_00000.f32", "frame_00001.f32", "frame_00002.f32"]
+        assert (tmp_path / "out" / "frame_00000.f32").stat().st_size == 4 * 30 * 20
+        assert "frames/sec" in capsys.readouterr().out
+
+    def test_shading_matches_canvas(self, headless_renderer):
+        """Test that shade_rgb gives the colors the canvas paints"""
+        scene = headless_renderer.snapshot_scene()
+        frame = headless_renderer.calculate_lighting()
+        rgb = RenderCore.shade_rgb(scene, frame)
+        colors = headless_renderer.frame_colors(*frame)
+        painted = bytes.fromhex("".join(color.lstrip("#") for row in colors for color in row))
+        assert rgb == painted
+
+
+class TestTiledRender:
+    """Test that tiles reassemble into the full-frame output"""
+
+    def _assemble(self, tiles, width, height):
+        intensity = [[None] * width for _ in range(height)]
+        color = [[None] * width for _ in range(height)]
+        for tile in tiles:
+            for row in range(tile.height):
+                intensity[tile.y + row][tile.x:tile.x + tile.width] = tile.intensity[row]
+                color[tile.y + row][tile.x:tile.x + tile.width] = tile.color[row]
+        return intensity, color
+
+    @pytest.mark.parametrize("lights", [None, TestMultipleLights.LIGHTS, [((6, 6), 100, "#FFF0C8", 2)]])
+    def test_lighting_tiles_match_full_frame(self, lights):
+        """Test that tiled lighting, reflections included, equals a full render"""
+        import TiledRender
+
+        scene = _small_scene(lights=lights, enable_reflections=True, diffusion_amount=0, light_pos=(2, 20))
+        frame = Renderer().render(scene)
+        tiles = list(TiledRender.lighting_tiles(scene, tile_size=7))
+        assert len(tiles) == 6 * 4
+        assert self._assemble(tiles, 40, 24) == (frame.intensity, frame.color)
+
+    @pytest.mark.parametrize("light_pos", [(1, 1), (50, 20), (99, 39), (-3, 5)])
+    def test_text_file_matches_create_matrix(self, tmp_path, light_pos):
+        """Test that the tiled ASCII view written to a file equals createMatrix"""
+        import TiledRender
+        from Main import createMatrix
+
+        path = tmp_path / "matrix.txt"
+        with TiledRender.TextFile(str(path), 100, 40) as sink:
+            count = TiledRender.render_tiled(
+                TiledRender.matrix_tiles(40, 100, (40, 15), 6, (70, 10), 5, light_pos, tile_size=16), sink)
+        assert count == 7 * 3
+        expected = createMatrix(40, 100, (40, 15), 6, (70, 10), 5, light_pos, engine="python")
+        assert path.read_text(encoding="utf-8") == expected
+
+    def test_intensity_file(self, tmp_path):
+        """Test that tiles land at their place in the raw intensity file"""
+        from array import array
+        import TiledRender
+
+        scene = _small_scene()
+        path = tmp_path / "intensity.f32"
+        with TiledRender.IntensityFile(str(path), 40, 24) as sink:
+            TiledRender.render_tiled(TiledRender.lighting_tiles(scene, tile_size=9), sink)
+        stored = array('f', path.read_bytes())
+        expected = array('f', [value for row in Renderer().render(scene).intensity for value in row])
+        assert stored == expected
+
+    def test_memory_follows_tile_size(self):
+        """Test that tiled rendering peaks far below a full frame"""
+        import tracemalloc
+        import TiledRender
+
+        scene = Scene(grid_width=120, grid_height=100, circle_center=(50, 50), square_pos=(90, 30),
+                      light_pos=(5, 30), lighting_engine="python")
+        peaks = []
+        for run in (lambda: Renderer().render(scene),
+                    lambda: TiledRender.render_tiled(TiledRender.lighting_tiles(scene, tile_size=16), lambda tile: None)):
+            tracemalloc.start()
+            try:
+                run()
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        full, tiled = peaks
+        assert tiled * 4 < full
+
+
+class TestFrameSequence:
+    """Test the memory-mapped frame-sequence format"""
+
+    def test_random_access_round_trip(self, tmp_path):
+        """Test that every frame reads back as written, in any order"""
+        import FrameSequence
+
+        planes = [bytes((index * 7 + cell) % 256 for cell in range(12)) for index in range(5)]
+        path = str(tmp_path / "frames.rcfs")
+        with FrameSequence.FrameWriter(path, 4, 3) as writer:
+            for plane in planes:
+                writer.write(plane)
+        assert os.path.getsize(path) == FrameSequence.HEADER_SIZE + 5 * 12
+
+        with FrameSequence.FrameReader(path) as reader:
+            assert (len(reader), reader.width, reader.height, reader.dtype) == (5, 4, 3, FrameSequence.SHADE)
+            for index in (3, 0, 4, -1):
+                view = reader.frame_bytes(index)
+                assert isinstance(view, memoryview) and view.readonly
+                assert bytes(view) == planes[index]
+                view.release()
+            row = reader.frame(2)[1]
+            assert [int(value) for value in row] == list(planes[2][4:8])
+            del row
+            with pytest.raises(IndexError):
+                reader.frame_bytes(5)
+
+    def test_views_outlive_reader(self, tmp_path):
+        """Test that frames held past the with block stay readable and the file is still closed"""
+        import FrameSequence
+
+        planes = [bytes(range(index, index + 12)) for index in range(3)]
+        path = str(tmp_path / "frames.rcfs")
+        with FrameSequence.FrameWriter(path, 4, 3) as writer:
+            for plane in planes:
+                writer.write(plane)
+
+        with FrameSequence.FrameReader(path) as reader:
+            plane = reader[1]
+            raw = reader.frame_bytes(2)
+        assert reader.file.closed
+        assert [int(value) for value in plane[2]] == list(planes[1][8:12])
+        assert bytes(raw) == planes[2]
+        reader.close()
+
+    def test_intensity_frames(self, tmp_path):
+        """Test that rendered intensities survive as float16"""
+        import FrameSequence
+
+        scene = _small_scene()
+        frame = Renderer().render(scene)
+        path = str(tmp_path / "frames.rcfs")
+        with FrameSequence.FrameWriter(path, 40, 24, FrameSequence.INTENSITY) as writer:
+            writer.write(FrameSequence.intensity_plane(frame))
+            with pytest.raises(ValueError):
+                writer.write(b"short")
+
+        with FrameSequence.FrameReader(path) as reader:
+            stored = reader.frame(0)
+            for y in range(24):
+                for x in range(40):
+                    assert float(stored[y][x]) == pytest.approx(frame.intensity[y][x], rel=1e-3, abs=1e-3)
+            del stored
+
+    def test_ascii_frames(self, tmp_path):
+        """Test that createMatrix strings are stored and restored exactly"""
+        import FrameSequence
+        from RenderCore import createMatrix
+
+        matrices = [createMatrix(12, 30, (10, 6), 3, (20, 2), 2, light_pos) for light_pos in [(1, 1), (28, 10)]]
+        path = str(tmp_path / "frames.rcfs")
+        with FrameSequence.FrameWriter(path, 30, 12) as writer:
+            for matrix in matrices:
+                writer.write(FrameSequence.matrix_shades(matrix))
+        with FrameSequence.FrameReader(path) as reader:
+            restored = [FrameSequence.shades_to_matrix(bytes(reader.frame_bytes(k)), 30) for k in range(len(reader))]
+        assert restored == matrices
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test that empty, foreign and truncated files raise ValueError"""
+        import FrameSequence
+
+        path = tmp_path / "frames.rcfs"
+        for data in (b"", b"P6\n2 2\n255\n" + bytes(40)):
+            path.write_bytes(data)
+            with pytest.raises(ValueError):
+                FrameSequence.FrameReader(str(path))
+        with FrameSequence.FrameWriter(str(path), 4, 4) as writer:
+            writer.write(bytes(16))
+        path.write_bytes(path.read_bytes()[:-1])
+        with pytest.raises(ValueError):
+            FrameSequence.FrameReader(str(path))
+
+    @pytest.mark.parametrize("fmt", ["shade-sequence", "intensity-sequence"])
+    def test_batch_sequence_output(self, tmp_path, fmt):
+        """Test that the batch renderer writes one sequence file in frame order"""
+        import BatchRender
+        import FrameSequence
+
+        positions = [(2, 2), (8, 4), (14, 6)]
+        BatchRender.render_sequence(TestBatchRender.SETTINGS, positions, str(tmp_path), fmt, workers=1)
+        with FrameSequence.FrameReader(str(tmp_path / BatchRender.SEQUENCE_FILE)) as reader:
+            assert len(reader) == 3
+            for index, light_pos in enumerate(positions):
+                scene = BatchRender.scene_for(TestBatchRender.SETTINGS, light_pos)
+                expected = BatchRender.encode_frame(scene, Renderer().render(scene), fmt)
+                assert bytes(reader.frame_bytes(index)) == expected